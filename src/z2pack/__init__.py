@@ -7,6 +7,18 @@ import importlib.metadata
 __version__ = importlib.metadata.version(__name__.replace(".", "-"))
 
 from . import _logging_format  # sets default logging levels / format
-from . import fp, hm, invariant, io, line, plot, shape, surface, tb
+from . import cache, fp, hm, invariant, io, line, plot, shape, surface, tb
 
-__all__ = ["__version__", "line", "surface", "shape", "fp", "invariant", "plot", "hm", "io", "tb"]
+__all__ = [
+    "__version__",
+    "line",
+    "surface",
+    "shape",
+    "fp",
+    "invariant",
+    "plot",
+    "hm",
+    "io",
+    "tb",
+    "cache",
+]
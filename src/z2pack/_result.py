@@ -1,6 +1,7 @@
 """Defines the base class for Z2Pack results (data + convergence information)."""
 
 import abc
+import copy
 
 __all__ = ["Result"]
 
@@ -29,6 +30,15 @@ class Result(metaclass=abc.ABCMeta):
             ctrl_convergence[c_ctrl.__class__.__name__] = c_ctrl.converged
         self.ctrl_convergence = ctrl_convergence
 
+    def __copy__(self):
+        """
+        Returns a copy of the result, with a copy of the data and of the control states / convergence. Surface and volume data share the results of their lines or surfaces with the original.
+        """
+        res = type(self)(copy.copy(self.data), [], [])
+        res.ctrl_states = copy.deepcopy(self.ctrl_states)
+        res.ctrl_convergence = copy.deepcopy(self.ctrl_convergence)
+        return res
+
     def __getattr__(self, name):
         """Forwards the attribute access to the ``.data`` attribute if attribute lookup fails on this instance (except for the ``data`` and ``convergence_report`` attributes)."""
         if name not in ["data", "convergence_report"]:
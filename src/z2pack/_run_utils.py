@@ -2,11 +2,14 @@
 Helper functions to create common tasks in different run methods (line, surface, volume).
 """
 
+import copy
 import os
 import time
 
 from decorator import decorator
 
+from ._async_handler import AsyncHandler
+
 __all__ = []
 
 
@@ -30,7 +33,9 @@ def _log_run(logger):
     return decorator(inner)
 
 
-def _load_init_result(*, init_result, save_file, load, load_quiet, serializer, valid_type):
+def _load_init_result(
+    *, init_result, save_file, load, load_quiet, serializer, valid_type, journal=False
+):
     """
     Load the initial result from a given save file.
 
@@ -43,15 +48,19 @@ def _load_init_result(*, init_result, save_file, load, load_quiet, serializer, v
     :param load_quiet:  Determines whether errors / inexistent files are ignored when loading from ``save_file``
     :type load_quiet:   bool
 
-    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json` and :py:mod:`pickle`. By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, ``msgpack`` is used.
+    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json`, :py:mod:`pickle` and ``'npz'`` (see :func:`z2pack.io.save`). By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, ``msgpack`` is used.
     :type serializer:   module
 
     :param valid_type: Valid type for the init_result.
     :type valid_type: type
 
+    :param journal: Determines whether the ``save_file`` is a journal, which is loaded with :func:`.io.load_journal`. If the file is not a journal (for example because it was saved without ``journal=True``), it is loaded with :func:`.io.load` instead.
+    :type journal: bool
+
     :returns: :class:`Result` instance.
     """
     from . import io  # pylint: disable=import-outside-toplevel
+    from .io import _journal  # pylint: disable=import-outside-toplevel
 
     if init_result is not None:
         if load:
@@ -64,7 +73,10 @@ def _load_init_result(*, init_result, save_file, load, load_quiet, serializer, v
                 'Cannot load result from file: No filename given in the "save_file" parameter.'
             )
         try:
-            init_result = io.load(save_file, serializer=serializer)
+            if journal and _journal.is_journal(save_file):
+                init_result = io.load_journal(save_file)
+            else:
+                init_result = io.load(save_file, serializer=serializer)
         except OSError as exception:
             if not load_quiet:
                 raise exception
@@ -88,3 +100,53 @@ def _check_save_dir(*, save_file):
         dirname = os.path.dirname(os.path.abspath(save_file))
         if not os.path.isdir(dirname):
             raise ValueError(f"Directory {dirname} does not exist.")
+
+
+def _check_keep_data(*, keep_data, reduced_precision):
+    """
+    Checks that the ``keep_data`` and ``reduced_precision`` inputs are valid.
+    """
+    if keep_data not in ["all", "wilson", "wcc"]:
+        raise ValueError(
+            f"Invalid value '{keep_data}' for 'keep_data', must be one of 'all', 'wilson' or 'wcc'."
+        )
+    if reduced_precision and keep_data != "wilson":
+        raise ValueError("The 'reduced_precision' option can only be used with keep_data='wilson'.")
+
+
+def _get_saver(*, save_file, serializer, journal, result_type, init_result, logger, name):
+    """
+    Creates the journal, or the async handler which saves the whole result, used as a context manager during the run.
+
+    :param result_type: Type of the result which is saved.
+    :type result_type: type
+
+    :param name: Name of the calculation (``'surface'`` or ``'volume'``), used in the log message.
+    :type name: str
+
+    The other parameters are the same as for the surface's and volume's run.
+    """
+    from .io import _journal, save  # pylint: disable=import-outside-toplevel
+
+    if save_file is not None and journal:
+        return _journal.JournalWriter(save_file, result_type, init_result=init_result)
+    if save_file is None:
+        return AsyncHandler(None)
+
+    def handler(res):
+        logger.info(f"Saving {name} result to file {save_file} (ASYNC)")
+        save(res, save_file, serializer=serializer)
+
+    return AsyncHandler(handler)
+
+
+def _save_result(saver, position, result):
+    """
+    Saves the result with the saver created by :func:`_get_saver`. With a journal, only the given line or surface (``position``) which was added or updated is saved.
+    """
+    if isinstance(saver, AsyncHandler):
+        # the copy shares the computed results, and only copies the
+        # sorted list of positions
+        saver.send(copy.copy(result))
+    else:
+        saver.write(position, result)
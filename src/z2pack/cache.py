@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+This module contains a wrapper for :class:`.EigenstateSystem` instances which caches the computed eigenstates, such that they can be re-used between lines, surfaces and volumes.
+"""
+
+from collections import OrderedDict
+import threading
+
+import numpy as np
+
+from .system import EigenstateSystem
+
+__all__ = ["EigenstateCache"]
+
+
+class EigenstateCache(EigenstateSystem):
+    r"""
+    Wraps an :class:`.EigenstateSystem` and caches the eigenstates it computes. K-points which are equivalent up to an inverse lattice vector :math:`\mathbf{G}` share the same cache entry. When re-using the eigenstates at an equivalent k-point, the phase :math:`e^{-2 \pi i \mathbf{G} \cdot \mathbf{r}}` due to the orbital positions is applied.
+
+    :param system: The system whose eigenstates should be cached.
+    :type system: :class:`.EigenstateSystem`
+
+    :param pos: Positions of the orbitals w.r.t the reduced unit cell, which determine the phase of eigenstates at equivalent k-points. By default, the positions of the wrapped system are used if they are available, and all orbitals are put at the origin otherwise.
+    :type pos: list
+
+    :param max_size: Maximum number of k-points which are kept in the cache. When this size is exceeded, the least recently used k-points are removed. Use ``max_size=None`` for an unbounded cache.
+    :type max_size: int
+
+    :param decimals: Number of decimals to which the k-points are rounded when comparing them.
+    :type decimals: int
+
+    The cache can be shared between lines which are computed concurrently in different threads. The eigenstates of missing k-points are computed outside the lock, such that the wrapped system can still run concurrently.
+
+    Example usage:
+
+    .. code :: python
+
+        system = z2pack.cache.EigenstateCache(z2pack.hm.System(...))
+        result = z2pack.surface.run(system=system, surface=...)
+        print(system.hits, system.misses)
+    """
+
+    def __init__(self, system, *, pos=None, max_size=100000, decimals=10):
+        self._system = system
+        if pos is None:
+            pos = getattr(system, "pos", None)
+        self._pos = None if pos is None else np.array(pos, dtype=float)
+        if max_size is not None and max_size < 1:
+            raise ValueError(f"Invalid value '{max_size}' for 'max_size', must be positive.")
+        self._max_size = max_size
+        self._decimals = decimals
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._cache)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def clear(self):
+        """
+        Removes all entries from the cache, and resets the hit / miss statistics.
+        """
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _reduce(self, k):
+        """
+        Returns the cache key of the reduced k-point, and the inverse lattice vector by which the given k-point differs from it.
+        """
+        k = np.array(k, dtype=float)
+        shift = np.floor(np.round(k, self._decimals))
+        # adding 0. gets rid of negative zeros in the key
+        return tuple(np.round(k - shift, self._decimals) + 0.0), shift
+
+    def _phase(self, shift):
+        """
+        Returns the phase factor for each orbital when moving the eigenstates by the inverse lattice vector ``shift``.
+        """
+        if self._pos is None or not shift.any():
+            return 1.0
+        return np.exp(-2j * np.pi * np.dot(self._pos, shift))
+
+    def _insert(self, key, eig):
+        """
+        Adds a new entry to the cache, removing the least recently used entry if the cache is full. Must be called while holding the lock.
+        """
+        self._cache[key] = eig
+        if self._max_size is not None and len(self._cache) > self._max_size:
+            self._cache.popitem(last=False)
+
+    @property
+    def supports_batch(self):
+        """Whether several lines are computed together, which is the case if the wrapped system supports it."""
+        return getattr(self._system, "supports_batch", False)
+
+    @property
+    def independent_kpoints(self):
+        """Whether the wrapped system computes the eigenstates at each k-point independently."""
+        return getattr(self._system, "independent_kpoints", False)
+
+    def _compute_missing(self, missing, kpt_list, reduced_list):
+        """
+        Computes the eigenstates of the ``missing`` k-points with the wrapped system, and returns them by their cache key. If the wrapped system computes the k-points independently, only the missing k-points are computed, in a single call. Otherwise, the full strings which contain missing k-points are computed.
+        """
+        if self.independent_kpoints:
+            new_kpt = list(missing.values())
+            # close the line trivially, since the last k-point is not computed explicitly
+            new_eigs = self._system.get_eig(new_kpt + new_kpt[:1])
+            return {key: np.array(eig) for key, eig in zip(missing, new_eigs)}
+        res = {}
+        for kpt, reduced in zip(kpt_list, reduced_list):
+            if all(key not in missing or key in res for key, _ in reduced):
+                continue
+            for eig, (key, shift) in zip(self._system.get_eig(kpt), reduced):
+                if key in missing and key not in res:
+                    res[key] = np.array(eig) / self._phase(shift)
+        return res
+
+    def get_eig(self, kpt):
+        __doc__ = (  # pylint: disable=unused-variable,redefined-builtin
+            super().__doc__  # pylint: disable=no-member
+        )
+        return self.get_eig_batch([kpt])[0]
+
+    def get_eig_batch(self, kpt_list):
+        """
+        Returns the eigenstates for each of the given k-point strings. If the wrapped system computes the k-points independently (``independent_kpoints``), the k-points of all strings which are not in the cache are computed in a single call to the wrapped system. Otherwise, each string which contains k-points that are not in the cache is computed as a whole.
+
+        :param kpt_list: List of k-point strings, each of which has the same form as the ``kpt`` input of :meth:`get_eig`.
+        :type kpt_list:  list
+        """
+        reduced_list = [[self._reduce(k) for k in kpt] for kpt in kpt_list]
+
+        eigs = {}
+        missing = {}
+        with self._lock:
+            for key, _ in (r for reduced in reduced_list for r in reduced):
+                if key in eigs or key in missing:
+                    self.hits += 1
+                elif key in self._cache:
+                    self.hits += 1
+                    self._cache.move_to_end(key)
+                    eigs[key] = self._cache[key]
+                else:
+                    self.misses += 1
+                    missing[key] = np.array(key)
+
+        if missing:
+            new_eigs = self._compute_missing(missing, kpt_list, reduced_list)
+            with self._lock:
+                for key, eig in new_eigs.items():
+                    eigs[key] = eig
+                    self._insert(key, eig)
+
+        return [
+            [list(eigs[key] * self._phase(shift)) for key, shift in reduced]
+            for reduced in reduced_list
+        ]
@@ -7,7 +7,9 @@ codes interfacing to Wannier90.
     consult the :ref:`Tutorial<setup_first_principles>` for details.
 """
 
-from . import kpoint
+from . import kpoint, stand_in
 from ._first_principles import *
+from ._stage import *
 
-__all__ = ["kpoint"] + _first_principles.__all__  # pylint: disable=undefined-variable
+# pylint: disable=undefined-variable
+__all__ = ["kpoint", "stand_in"] + _first_principles.__all__ + _stage.__all__
@@ -3,11 +3,14 @@
 import collections.abc
 import contextlib
 import os
+import queue
 import shutil
 import subprocess
 
 from . import _read_mmn as mmn
 from ..system import OverlapSystem
+from ._overlap_cache import _file_digest, _OverlapCache
+from ._stage import _StageStore
 
 __all__ = ["System"]
 
@@ -21,6 +24,8 @@ class System(OverlapSystem):
 
     :param kpt_fct:    Function that creates a ``str`` specifying the k-points (in the language of the first-principles code used), given a ``starting_point``, ``last_point``, ``end point`` and number of k-points ``N``. Can also be a :py:class:`list` of functions if k-points need to be written to more than one file.
 
+    :param kpt_fct_batch:   Function (or :py:class:`list` of functions, matching ``kpt_path``) that creates the k-points ``str`` for a list of several k-point strings, such as :func:`.fp.kpoint.qe_explicit_batch` and :func:`.fp.kpoint.wannier90_full_batch`. If it is given, :meth:`get_mmn_batch` computes all strings in a single call to the first-principles code, and the lines of each iteration in a surface run are computed together through it. This is only possible for codes which accept an explicit list of k-points. Each line is added to the result (and saved) once it and the lines before it have converged.
+
     :param kpt_path:   Name of the file where the k-points ``str`` belongs. Will append to a file if it matches one of the ``file_names``, and create a separate file else. If ``kpt_fct`` is a :py:class:`list`, ``kpt_path`` should also be a list, specifying the path for each of the functions.
     :type kpt_path:    :py:class:`str`, or :py:class:`list` thereof
 
@@ -42,6 +47,32 @@ class System(OverlapSystem):
     :param num_wcc:     Number of WCC which should be produced by the system. This parameter can be used to check the consistency of the calculation. By default, no such check is done.
     :type num_wcc:      int
 
+    :param num_build_folders:   Number of independent build folders, which determines how many calculations can run concurrently. If more than one build folder is used, they are created as the sub-folders ``0``, ``1``, ... of ``build_folder``. Concurrent calculations are started by passing a :py:class:`concurrent.futures.ThreadPoolExecutor` as ``executor`` to :func:`.surface.run` or :func:`.volume.run`.
+    :type num_build_folders:    int
+
+    :param num_cores:   Number of cores each calculation should use. The value is passed to the ``command`` as the environment variable ``Z2PACK_NUM_CORES``, such that it can be used for example as ``mpirun -np $Z2PACK_NUM_CORES ...``.
+    :type num_cores:    int
+
+    :param link_inputs: If given, the build folder is re-used between calculations instead of being re-created for each of them. The input files are then linked into the build folder once, using hard links (``'hard'``) or symbolic links (``'symbolic'``), and only the files containing the k-points are re-written for each calculation. Input files to which the k-points are appended are always copied. The ``.mmn`` file of the previous calculation is removed before running the command, while other output files are kept. Hard links fall back to copying the file if they are not supported.
+    :type link_inputs:  str
+
+    .. warning:: A linked input file is the same file as the original input file. If the first-principles code rewrites one of its input files in place (such as the ``CHGCAR`` or ``WAVECAR`` of VASP), the original file is modified as well. Such files must be listed in ``copy_inputs``.
+
+    :param copy_inputs: Names (as given by ``file_names``) of the input files which are copied into the build folder before each calculation instead of being linked, when ``link_inputs`` is used.
+    :type copy_inputs:  :py:class:`list` of :py:class:`str`
+
+    :param cache_folder:    Folder where the computed overlap matrices are stored, such that they can be re-used by later calculations (e.g. when restarting a run, or for lines which are shared between surfaces). The stored overlaps are identified by the content of the input files, the ``command``, the k-points of the string and the k-point input written for them by ``kpt_fct`` to ``kpt_path``. By default, no overlaps are stored.
+    :type cache_folder:     str
+
+    :param cache_max_size:  Maximum size (in bytes) of the files in the ``cache_folder``. When it is exceeded, the least recently used overlaps are removed. Use ``cache_max_size=None`` for an unbounded cache.
+    :type cache_max_size:   int
+
+    :param stages:  Pre-processing stages which run before the ``command``. The outputs of each stage are stored in the ``stage_folder``, and re-used for calculations with the same key (see :class:`.fp.Stage`).
+    :type stages:   :py:class:`list` of :class:`.fp.Stage`
+
+    :param stage_folder:    Folder where the outputs of the ``stages`` are stored.
+    :type stage_folder:     str
+
     .. note:: ``input_files`` and ``build_folder`` can be absolute or relative paths, the rest is relative to ``build_folder``
     """
 
@@ -57,86 +88,243 @@ class System(OverlapSystem):
         file_names=None,
         mmn_path="wannier90.mmn",
         num_wcc=None,
+        num_build_folders=1,
+        num_cores=None,
+        kpt_fct_batch=None,
+        link_inputs=None,
+        copy_inputs=(),
+        cache_folder=None,
+        cache_max_size=10**9,
+        stages=(),
+        stage_folder="stages",
     ):
         # convert to lists (input_files)
         self._input_files = list(input_files)
         self._build_folder = os.path.abspath(build_folder)
+        # build folders which are currently not used by a calculation
+        self._free_build_folders = _build_folder_queue(self._build_folder, num_build_folders)
+        self._num_cores = num_cores
 
         # copy to file_names and split off the name
         if file_names is None:
             self._file_names = [os.path.basename(filename) for filename in self._input_files]
         else:
             self._file_names = list(file_names)
-        self._file_names = self._to_abspath(self._file_names)
-
-        # kpt_fct
-        if isinstance(kpt_fct, collections.abc.Callable):
-            self._kpt_fct = [kpt_fct]
-        else:
-            self._kpt_fct = kpt_fct
 
         # make input_files absolute (check if already absolute)
-        for i, filename in enumerate(self._input_files):
-            self._input_files[i] = os.path.abspath(filename)
+        self._input_files = [os.path.abspath(filename) for filename in self._input_files]
 
         self._command = command
         self._executable = executable
-        if isinstance(kpt_path, str):
-            self._kpt_path = [kpt_path]
-        else:
-            self._kpt_path = kpt_path
-        self._kpt_path = self._to_abspath(self._kpt_path)
+        self._set_kpt_fct(kpt_fct=kpt_fct, kpt_fct_batch=kpt_fct_batch, kpt_path=kpt_path)
+        self._mmn_path = mmn_path
+        self._calling_path = os.getcwd()
+
+        self._set_link_inputs(link_inputs=link_inputs, copy_inputs=copy_inputs)
+
+        self._num_wcc = num_wcc
+        self._stages = list(stages)
+        # the input files are hashed once, for both the cache and the stages
+        setup = self._setup() if cache_folder is not None or self._stages else None
+        self._cache = None
+        if cache_folder is not None:
+            self._cache = _OverlapCache(
+                cache_folder,
+                max_size=cache_max_size,
+                setup=setup + [self._command, self._mmn_path, *self._kpt_path],
+            )
+
+        self._stage_store = None
+        if self._stages:
+            self._stage_store = _StageStore(stage_folder, setup=setup)
+
+    def _set_kpt_fct(self, *, kpt_fct, kpt_fct_batch, kpt_path):
+        """
+        Sets the functions which create the k-points, and the paths where they are written. Each of them can be given as a single value or a list.
+        """
+        self._kpt_fct = _to_list(kpt_fct)
+        self._kpt_fct_batch = None if kpt_fct_batch is None else _to_list(kpt_fct_batch)
+        self._kpt_path = _to_list(kpt_path)
 
         # check whether to append k-points or write separate file
-        self._k_mode = ["a" if path in self._file_names else "w" for path in self._kpt_path]
+        file_paths = self._to_abspath(self._file_names, self._build_folder)
+        self._k_mode = [
+            "a" if path in file_paths else "w"
+            for path in self._to_abspath(self._kpt_path, self._build_folder)
+        ]
 
         # check if the number of functions matches the number of paths
         if len(self._kpt_path) != len(self._kpt_fct):
             raise ValueError(
                 f"kpt_fct ({len(self._kpt_path)}) and kpt_path({len(self._kpt_fct)}) must have the same length"
             )
-        self._mmn_path = self._to_abspath(mmn_path)
-        self._calling_path = os.getcwd()
+        if self._kpt_fct_batch is not None and len(self._kpt_path) != len(self._kpt_fct_batch):
+            raise ValueError(
+                f"kpt_fct_batch ({len(self._kpt_fct_batch)}) and kpt_path({len(self._kpt_path)}) must have the same length"
+            )
 
-        self._num_wcc = num_wcc
+    def _set_link_inputs(self, *, link_inputs, copy_inputs):
+        """
+        Sets how the input files are linked into a re-used build folder, and which of them are copied instead.
+        """
+        if link_inputs not in {None, "hard", "symbolic"}:
+            raise ValueError(
+                f"Invalid value '{link_inputs}' for 'link_inputs', must be either 'hard' or 'symbolic'."
+            )
+        self._link_inputs = link_inputs
+        self._copy_inputs = set(copy_inputs)
+        unknown_names = self._copy_inputs - set(self._file_names)
+        if unknown_names:
+            raise ValueError(
+                f"The 'copy_inputs' {sorted(unknown_names)} are not in the input file names {self._file_names}."
+            )
+        # build folders which have been set up for re-use
+        self._prepared_build_folders = set()
 
-    def _to_abspath(self, path):
+    def _setup(self):
+        """
+        Returns the parts of the calculation setup which stored results depend on, namely the executable and the names and contents of the input files. The contents are given by their SHA-256 digest.
+        """
+        setup = [self._executable or ""]
+        for input_file, file_name in zip(self._input_files, self._file_names):
+            setup.append(file_name)
+            setup.append(_file_digest(input_file))
+        return setup
+
+    @staticmethod
+    def _to_abspath(path, build_folder):
         """
         Returns a list of absolute paths from a list of paths relative to the build folder, or a single absolute path from a single relative path.
         """
         if isinstance(path, str):
-            return os.path.join(self._build_folder, path)
-        return [self._to_abspath(p) for p in path]
+            return os.path.join(build_folder, path)
+        return [System._to_abspath(p, build_folder) for p in path]
 
-    def _create_input(self, kpt):
+    def _create_input(self, kpt, build_folder, kpt_fct):
         """
         Create all input file(s).
         """
-        with contextlib.suppress(FileNotFoundError):
-            shutil.rmtree(self._build_folder)
-        os.mkdir(self._build_folder)
-        _copy(self._input_files, self._file_names)
+        if self._link_inputs is None:
+            with contextlib.suppress(FileNotFoundError):
+                shutil.rmtree(build_folder)
+            os.makedirs(build_folder)
+            _copy(self._input_files, self._to_abspath(self._file_names, build_folder))
+        else:
+            self._update_build_folder(build_folder)
 
-        for i, (k_mode, f_path) in enumerate(zip(self._k_mode, self._kpt_path)):
+        for i, (k_mode, f_path) in enumerate(
+            zip(self._k_mode, self._to_abspath(self._kpt_path, build_folder))
+        ):
             with open(f_path, k_mode, encoding="utf-8") as f:
-                f.write(self._kpt_fct[i](kpt))
+                f.write(kpt_fct[i](kpt))
+
+    def _update_build_folder(self, build_folder):
+        """
+        Prepares a re-used build folder for the next calculation. The input files are linked when the build folder is first used (or if they were removed), and the input files to which the k-points are appended or which are listed in ``copy_inputs`` are copied again. The ``.mmn`` file of the previous calculation is removed.
+        """
+        if build_folder not in self._prepared_build_folders:
+            with contextlib.suppress(FileNotFoundError):
+                shutil.rmtree(build_folder)
+            os.makedirs(build_folder)
+            self._prepared_build_folders.add(build_folder)
+        copied_paths = set(self._to_abspath(sorted(self._copy_inputs), build_folder))
+        copied_paths.update(
+            path
+            for k_mode, path in zip(self._k_mode, self._to_abspath(self._kpt_path, build_folder))
+            if k_mode == "a"
+        )
+        for input_file, path in zip(
+            self._input_files, self._to_abspath(self._file_names, build_folder)
+        ):
+            if path in copied_paths:
+                # never write through a link to the original file
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+                _copy(input_file, path)
+            elif not os.path.lexists(path):
+                _link(input_file, path, hard=self._link_inputs == "hard")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._to_abspath(self._mmn_path, build_folder))
+
+    def _run(self, kpt, kpt_fct, read_mmn):
+        """
+        Runs the calculation for the given k-points in a free build folder, and returns the result of ``read_mmn`` on the path of the ``.mmn`` file.
+        """
+        # wait until a build folder is free
+        build_folder = self._free_build_folders.get()
+        try:
+            # create input
+            self._create_input(kpt, build_folder, kpt_fct)
+
+            if self._num_cores is None:
+                env = None
+            else:
+                env = dict(os.environ, Z2PACK_NUM_CORES=str(self._num_cores))
+
+            self._run_stages(kpt, build_folder, env)
+
+            # execute command
+            subprocess.call(
+                self._command,
+                cwd=build_folder,
+                shell=True,
+                executable=self._executable,
+                env=env,
+            )
+
+            # read mmn file
+            return read_mmn(self._to_abspath(self._mmn_path, build_folder))
+        finally:
+            self._free_build_folders.put(build_folder)
+
+    def _run_stages(self, kpt, build_folder, env):
+        """
+        Runs the stages in the build folder, unless their outputs are stored already. The outputs of a stage are stored only if it succeeded.
+        """
+        for i, stage in enumerate(self._stages):
+            if self._stage_store.restore(i, stage, kpt, build_folder):
+                continue
+            # outputs left over from a previous calculation in the same
+            # build folder must not be stored under the new key
+            self._stage_store.remove_outputs(stage, build_folder)
+            returncode = subprocess.call(
+                stage.command,
+                cwd=build_folder,
+                shell=True,
+                executable=self._executable,
+                env=env,
+            )
+            if returncode == 0:
+                self._stage_store.store(i, stage, kpt, build_folder)
+
+    def _check_shape(self, overlap_matrices):
+        """
+        Checks that the overlap matrices have the shape given by ``num_wcc``.
+        """
+        if self._num_wcc is not None:
+            shape = (self._num_wcc, self._num_wcc)
+            for i, overlaps in enumerate(overlap_matrices):
+                if overlaps.shape != shape:
+                    raise ValueError(
+                        f"The shape of overlap matrix #{i} is {overlaps.shape}, but should be {shape}."
+                    )
+
+    def _cache_key(self, kpt):
+        """
+        Returns the key of a k-point string in the overlap cache, which includes the k-point input created by ``kpt_fct``.
+        """
+        return self._cache.key(kpt, [kpt_fct(kpt) for kpt_fct in self._kpt_fct])
 
     def get_mmn(self, kpt):
         num_kpt = len(kpt) - 1
 
-        # create input
-        self._create_input(kpt)
-
-        # execute command
-        subprocess.call(
-            self._command,
-            cwd=self._build_folder,
-            shell=True,
-            executable=self._executable,
-        )
+        if self._cache is not None:
+            key = self._cache_key(kpt)
+            overlap_matrices = self._cache.get(key)
+            if overlap_matrices is not None:
+                return overlap_matrices
 
-        # read mmn file
-        overlap_matrices = mmn.get_m(self._mmn_path)
+        overlap_matrices = list(self._run(kpt, self._kpt_fct, mmn.get_m))
         if not overlap_matrices:
             raise ValueError(
                 "No overlap matrices were found. Maybe switch from shell_list to search_shells in wannier90.win or add more k-points to the line."
@@ -145,16 +333,101 @@ class System(OverlapSystem):
             raise ValueError(
                 f"The number of overlap matrices found is {len(overlap_matrices)}, but should be {num_kpt}. Maybe check search_shells in wannier90.win"
             )
-        if self._num_wcc is not None:
-            shape = (self._num_wcc, self._num_wcc)
-            for i, overlaps in enumerate(overlap_matrices):
-                if overlaps.shape != shape:
-                    raise ValueError(
-                        f"The shape of overlap matrix #{i} is {overlaps.shape}, but should be {shape}."
-                    )
+        self._check_shape(overlap_matrices)
 
+        if self._cache is not None:
+            self._cache.put(key, overlap_matrices)
         return overlap_matrices
 
+    @property
+    def supports_batch(self):
+        """
+        Whether :meth:`get_mmn_batch` can be used, which is the case if ``kpt_fct_batch`` is given. Otherwise, the lines of a surface are computed one after another.
+        """
+        return self._kpt_fct_batch is not None
+
+    def get_mmn_batch(self, kpt_list):
+        """
+        Returns the overlap matrices for several k-point strings, which are all computed in a single call to the first-principles code, re-using the stored overlaps from the cache. This is only possible if ``kpt_fct_batch`` is given (see :attr:`supports_batch`).
+
+        :param kpt_list: List of k-point strings, each of which has the same form as the ``kpt`` input of :meth:`get_mmn`.
+        :type kpt_list:  list
+        """
+        if not self.supports_batch:
+            raise ValueError("'get_mmn_batch' can only be used if 'kpt_fct_batch' is given.")
+        kpt_list = list(kpt_list)
+        if self._cache is not None:
+            keys = [self._cache_key(kpt) for kpt in kpt_list]
+            result = [self._cache.get(key) for key in keys]
+            missing = [i for i, overlap_matrices in enumerate(result) if overlap_matrices is None]
+            if missing:
+                computed = self._get_mmn_batch_uncached([kpt_list[i] for i in missing])
+                for i, overlap_matrices in zip(missing, computed):
+                    self._cache.put(keys[i], overlap_matrices)
+                    result[i] = overlap_matrices
+            return result
+        return self._get_mmn_batch_uncached(kpt_list)
+
+    def _get_mmn_batch_uncached(self, kpt_list):
+        """
+        Computes the overlap matrices for several k-point strings in a single calculation.
+        """
+        num_kpts_list = [len(kpt) - 1 for kpt in kpt_list]
+        overlap_matrices_list = self._run(
+            kpt_list,
+            self._kpt_fct_batch,
+            lambda mmn_path: mmn.get_m_batch(mmn_path, num_kpts_list),
+        )
+        for i, overlap_matrices in enumerate(overlap_matrices_list):
+            if any(overlaps is None for overlaps in overlap_matrices):
+                num_found = sum(overlaps is not None for overlaps in overlap_matrices)
+                raise ValueError(
+                    f"The number of overlap matrices found for k-point string #{i} is {num_found}, but should be {len(overlap_matrices)}. Check that the nnkpts are set for all strings in wannier90.win."
+                )
+            self._check_shape(overlap_matrices)
+
+        return overlap_matrices_list
+
+
+def _build_folder_queue(build_folder, num_build_folders):
+    """
+    Returns a queue containing the build folders, which are the sub-folders ``0``, ``1``, ... of ``build_folder`` if more than one build folder is used.
+    """
+    if num_build_folders < 1:
+        raise ValueError(
+            f"Invalid value '{num_build_folders}' for 'num_build_folders', must be positive."
+        )
+    build_folders = queue.Queue()
+    if num_build_folders == 1:
+        build_folders.put(build_folder)
+    else:
+        for i in range(num_build_folders):
+            build_folders.put(os.path.join(build_folder, str(i)))
+    return build_folders
+
+
+def _to_list(value):
+    """
+    Returns the given list, or a list containing the single given (callable or ``str``) value.
+    """
+    if isinstance(value, (str, collections.abc.Callable)):
+        return [value]
+    return list(value)
+
+
+def _link(initial_path, final_name, *, hard):
+    """
+    Creates a hard or symbolic link to a file, creating the containing folder if needed. If creating a hard link fails, the file is copied instead.
+    """
+    os.makedirs(os.path.dirname(final_name), exist_ok=True)
+    if hard:
+        try:
+            os.link(initial_path, final_name)
+        except OSError:
+            shutil.copyfile(initial_path, final_name)
+    else:
+        os.symlink(initial_path, final_name)
+
 
 def _copy(initial_paths, final_names):
     """
@@ -0,0 +1,113 @@
+"""Defines an on-disk cache for the overlap matrices computed by first-principles calculations."""
+
+import contextlib
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+def _hash(parts):
+    """
+    Returns a SHA-256 hash object of the given ``str`` or ``bytes`` parts. The length of each part is included, such that the parts can not be shifted against each other.
+    """
+    hash_obj = hashlib.sha256()
+    for part in parts:
+        _hash_update(hash_obj, part)
+    return hash_obj
+
+
+def _file_digest(path, chunk_size=2**20):
+    """
+    Returns the SHA-256 digest of a file, which is read in chunks of ``chunk_size`` bytes.
+    """
+    hash_obj = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            hash_obj.update(chunk)
+    return hash_obj.digest()
+
+
+def _hash_update(hash_obj, part):
+    """
+    Adds a ``str`` or ``bytes`` part to the hash object, including its length.
+    """
+    if isinstance(part, str):
+        part = part.encode("utf-8")
+    hash_obj.update(len(part).to_bytes(8, "little"))
+    hash_obj.update(part)
+
+
+class _OverlapCache:
+    """
+    Stores the overlap matrices of k-point strings in a folder, with one ``.npy`` file per string. The files are named by a hash of the calculation setup, the k-points and the k-point input written for them. When the total size of the files exceeds ``max_size`` (in bytes), the least recently used files are removed.
+    """
+
+    def __init__(self, path, *, max_size, setup):
+        self._path = os.path.abspath(path)
+        os.makedirs(self._path, exist_ok=True)
+        if max_size is not None and max_size < 0:
+            raise ValueError(f"Invalid value '{max_size}' for 'cache_max_size', must be positive.")
+        self._max_size = max_size
+        self._setup_hash = _hash(setup)
+
+    def key(self, kpt, kpt_inputs):
+        """
+        Returns the key of a k-point string, given the ``kpt_inputs`` which are written to the input files for it.
+        """
+        hash_obj = self._setup_hash.copy()
+        _hash_update(hash_obj, np.array(kpt, dtype=float).tobytes())
+        for kpt_input in kpt_inputs:
+            _hash_update(hash_obj, kpt_input)
+        return hash_obj.hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self._path, key + ".npy")
+
+    def get(self, key):
+        """
+        Returns the overlap matrices stored for the given key, or ``None`` if they are not in the cache.
+        """
+        path = self._file(key)
+        try:
+            overlaps = np.load(path)
+        except (OSError, ValueError):
+            return None
+        # mark the file as recently used
+        with contextlib.suppress(OSError):
+            os.utime(path)
+        return list(overlaps)
+
+    def put(self, key, overlap_matrices):
+        """
+        Stores the overlap matrices for the given key, and removes old files if the cache is too large.
+        """
+        # write to a temporary file first, such that concurrent calculations
+        # never read an incomplete file
+        fd, tmp_path = tempfile.mkstemp(dir=self._path, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.array(overlap_matrices, dtype=complex))
+        os.replace(tmp_path, self._file(key))
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used files until the cache fits into ``max_size``.
+        """
+        if self._max_size is None:
+            return
+        entries = []
+        with os.scandir(self._path) as it:
+            for entry in it:
+                if entry.name.endswith(".npy"):
+                    with contextlib.suppress(OSError):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self._max_size:
+                break
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            total_size -= size
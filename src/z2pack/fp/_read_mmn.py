@@ -1,7 +1,5 @@
 """Defines a function to parse the overlap (mmn) matrices from the Wannier90 *.mmn file."""
 
-import re
-
 import numpy as np
 
 
@@ -12,51 +10,88 @@ def get_m(mmn_file):
     args:
     ~~~~
     mmn_file:           path to .mmn file
+
+    returns:
+    ~~~~
+    array of shape (num_kpts, num_bands, num_bands) containing the M-matrices
+    between neighbouring k-points
+    """
+    _, overlap_matrices = _read_blocks(
+        mmn_file, keep=lambda idx, num_kpts: idx[0] % num_kpts - idx[1] == -1
+    )
+    return overlap_matrices
+
+
+def get_m_batch(mmn_file, num_kpts_list):
+    """
+    reads the M-matrices for several k-point strings from a single .mmn file,
+    where the k-points of each string are numbered consecutively
+
+    args:
+    ~~~~
+    mmn_file:           path to .mmn file
+    num_kpts_list:      number of k-points in each of the strings
+
+    returns:
+    ~~~~
+    list containing the M-matrices for each string, where missing matrices
+    are set to None
+    """
+    # maps the (k1, k2) index pairs of neighbouring k-points to the
+    # position of the overlap matrix in the result
+    positions = {}
+    offset = 0
+    for i, num_kpts in enumerate(num_kpts_list):
+        for j in range(num_kpts):
+            positions[(offset + j + 1, offset + (j + 1) % num_kpts + 1)] = (i, j)
+        offset += num_kpts
+
+    overlap_matrices = [[None] * num_kpts for num_kpts in num_kpts_list]
+    idx_list, overlaps_all = _read_blocks(mmn_file, keep=lambda idx, _: tuple(idx[:2]) in positions)
+    for idx, overlaps in zip(idx_list, overlaps_all):
+        i, j = positions[idx]
+        overlap_matrices[i][j] = overlaps
+    return overlap_matrices
+
+
+def _read_blocks(mmn_file, keep):
+    """
+    reads the (k1, k2) indices and M-matrices of all blocks in the .mmn file
+    for which keep(idx, num_kpts) is True. Only the header lines of the
+    other blocks are parsed.
+
+    returns:
+    ~~~~
+    list of (k1, k2) indices, and array of shape (num_blocks, num_bands, num_bands)
+    containing the corresponding M-matrices
     """
     try:
         with open(mmn_file, encoding="utf-8") as f:
             f.readline()
-
-            re_int = re.compile(r"[\d]+")
-
             # read the first line
-            num_bands, num_kpts, _ = (int(i) for i in re.findall(re_int, f.readline()))
-
+            num_bands, num_kpts, _ = (int(i) for i in f.readline().split()[:3])
             # read the rest of the file
-            lines = (line for line in f if line)
-
-            step = num_bands * num_bands + 1
-
-            def grouper(iterable, group_size):
-                """Collect data into fixed-length chunks or blocks"""
-                args = [iter(iterable)] * group_size
-                return zip(*args)
-
-            blocks = grouper(lines, step)
-            overlap_matrices = []
-            re_float = re.compile(r"[0-9.\-E]+")
-            for block in blocks:
-                block = iter(block)
-                idx = [int(el) for el in re.findall(re_int, next(block))]
-                if idx[0] % num_kpts - idx[1] != -1:
-                    continue
-
-                def to_complex(blockline):
-                    real_part, imag_part = re.findall(re_float, blockline)
-                    return float(real_part) + 1j * float(imag_part)
-
-                overlap_matrices.append(
-                    np.array(
-                        [
-                            [to_complex(next(block)) for _ in range(num_bands)]
-                            for _ in range(num_bands)
-                        ]
-                    ).T
-                )
-
+            lines = f.read().splitlines()
     except OSError as err:
         msg = str(err)
         msg += ". Check that the path of the .mmn file is correct (mmn_path input variable). If that is the case, an error occured during the call to the first-principles code and Wannier90. Check the corresponding log/error files."
         raise type(err)(msg) from err
 
-    return overlap_matrices
+    # each block consists of a line with the k-point indices, followed by
+    # one line for each element of the matrix
+    step = num_bands * num_bands + 1
+    idx_list = []
+    kept_lines = []
+    for start in range(0, len(lines) - step + 1, step):
+        idx = [int(el) for el in lines[start].split()]
+        if keep(idx, num_kpts):
+            idx_list.append(tuple(idx[:2]))
+            kept_lines.extend(lines[start + 1 : start + step])
+
+    values = np.fromstring("\n".join(kept_lines), sep=" ") if kept_lines else np.zeros(0)
+    shape = (len(idx_list), num_bands, num_bands, 2)
+    if values.size != np.prod(shape):
+        raise ValueError(f"Could not parse the overlap matrices in the .mmn file {mmn_file}.")
+    values = values.reshape(shape)
+    # the matrix elements are given in column-major order
+    return idx_list, np.ascontiguousarray((values[..., 0] + 1j * values[..., 1]).transpose(0, 2, 1))
@@ -0,0 +1,122 @@
+"""Defines pre-processing stages of first-principles calculations, whose output can be re-used between calculations."""
+
+import contextlib
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from ._overlap_cache import _hash, _hash_update
+
+__all__ = ["Stage"]
+
+
+class Stage:
+    r"""
+    Describes a pre-processing step of the first-principles calculation, which runs before the ``command`` of :class:`.fp.System`. The output files of the stage are stored, and re-used for later calculations with the same key instead of running the stage again.
+
+    :param command: Command which runs the stage. It is executed in the build folder. The outputs are stored only if the command exits with return code zero.
+    :type command:  str
+
+    :param outputs: Paths of the files produced by the stage, relative to the build folder. They are removed from the build folder before the stage runs.
+    :type outputs:  :py:class:`list` of :py:class:`str`
+
+    :param key: Function which takes the k-points (in the same form as the ``kpt_fct`` of :class:`.fp.System`) and returns a ``str`` describing everything the outputs depend on, apart from the input files and the command. For example, ``key=lambda kpt: str(len(kpt))`` declares that the output depends only on the number of k-points. By default, the outputs are re-used only for exactly the same k-points.
+
+    .. note:: The key must capture all the information which the outputs depend on, otherwise outputs from a different calculation are used. For example, the ``.nnkp`` file produced by ``wannier90.x -pp`` contains the k-points themselves, such that it can not in general be re-used between lines with the same number of k-points.
+
+    Example usage:
+
+    .. code:: python
+
+        system = z2pack.fp.System(
+            ...,
+            stages=[
+                z2pack.fp.Stage(
+                    command="./preprocess.sh",
+                    outputs=["preprocess.out"],
+                    key=lambda kpt: str(len(kpt)),
+                )
+            ],
+        )
+    """
+
+    def __init__(self, *, command, outputs, key=None):
+        self.command = command
+        self.outputs = list(outputs)
+        self.key = key
+
+    def _key(self, kpt):
+        """
+        Returns the key of the stage for the given k-points.
+        """
+        if self.key is not None:
+            return self.key(kpt)
+        # default: the exact k-points, including the length of each string
+        # for calculations with several strings
+        kpt_arrays = [np.array(k, dtype=float) for k in kpt]
+        return str([arr.shape for arr in kpt_arrays]) + "".join(
+            arr.tobytes().hex() for arr in kpt_arrays
+        )
+
+
+class _StageStore:
+    """
+    Stores the outputs of the stages in a folder, with one sub-folder for each stage and key.
+    """
+
+    def __init__(self, path, *, setup):
+        self._path = os.path.abspath(path)
+        self._setup_hash = _hash(setup)
+
+    def _folder(self, index, stage, kpt):
+        key = stage._key(kpt)  # pylint: disable=protected-access
+        hash_obj = self._setup_hash.copy()
+        for part in [str(index), stage.command, key]:
+            _hash_update(hash_obj, part)
+        return os.path.join(self._path, hash_obj.hexdigest())
+
+    def restore(self, index, stage, kpt, build_folder):
+        """
+        Copies the stored outputs of the stage to the build folder. Returns whether the outputs were found.
+        """
+        folder = self._folder(index, stage, kpt)
+        if not os.path.isdir(folder):
+            return False
+        for output in stage.outputs:
+            target = os.path.join(build_folder, output)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(folder, output), target)
+        return True
+
+    @staticmethod
+    def remove_outputs(stage, build_folder):
+        """
+        Removes the outputs of the stage from the build folder.
+        """
+        for output in stage.outputs:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(build_folder, output))
+
+    def store(self, index, stage, kpt, build_folder):
+        """
+        Stores the outputs of the stage from the build folder. If an output is missing, nothing is stored.
+        """
+        if not all(os.path.isfile(os.path.join(build_folder, output)) for output in stage.outputs):
+            return
+        folder = self._folder(index, stage, kpt)
+        os.makedirs(self._path, exist_ok=True)
+        # copy to a temporary folder first, such that concurrent calculations
+        # never see incomplete outputs
+        tmp_folder = tempfile.mkdtemp(dir=self._path, suffix=".tmp")
+        for output in stage.outputs:
+            target = os.path.join(tmp_folder, output)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(os.path.join(build_folder, output), target)
+        try:
+            os.rename(tmp_folder, folder)
+        except OSError:
+            # the outputs were stored by a concurrent calculation
+            with contextlib.suppress(OSError):
+                shutil.rmtree(tmp_folder)
@@ -3,7 +3,7 @@ r"""
 A collection of functions for creating k-points input for different
 first-principles codes.
 
-All functions have the same calling structure as :func:`prototype`.
+All functions have the same calling structure as :func:`prototype`. The functions ending in ``_batch`` instead take a list of k-point strings, and create the input for computing all of them in a single first-principles calculation (see :meth:`.fp.System.get_mmn_batch`).
 """
 
 import decorator
@@ -18,6 +18,10 @@ __all__ = [
     "wannier90_nnkpts",
     "wannier90_full",
     "vasp",
+    "qe_explicit_batch",
+    "wannier90_batch",
+    "wannier90_nnkpts_batch",
+    "wannier90_full_batch",
 ]
 
 
@@ -200,6 +204,77 @@ def vasp(kpt):
     return string
 
 
+@_check_dim
+@_check_closed
+def _check_string(kpt):  # pylint: disable=unused-argument
+    """Checks that a k-point string is three-dimensional and forms a closed loop."""
+
+
+def _concatenate_strings(kpt_list):
+    """
+    Checks the given k-point strings, and returns a single list of all k-points, without the last point of each string.
+    """
+    kpt_all = []
+    for kpt in kpt_list:
+        _check_string(kpt)
+        kpt_all.extend(kpt[:-1])
+    return kpt_all
+
+
+def qe_explicit_batch(kpt_list):
+    """
+    Creates a k-point input for **Quantum Espresso** containing several k-point strings, by explicitly specifying the k-points.
+    """
+    kpt_all = _concatenate_strings(kpt_list)
+    string = f"\nK_POINTS crystal\n {len(kpt_all)} \n"
+    for k in kpt_all + [kpt_list[-1][-1]]:
+        string += "{} {} {} 1\n".format(*(str(coord).replace("e", "d") for coord in k))
+    return string
+
+
+def wannier90_batch(kpt_list):
+    """
+    Creates a k-point input for **Wannier90** containing several k-point strings.
+    """
+    kpt_all = _concatenate_strings(kpt_list)
+    string = "mp_grid: " + str(len(kpt_all)) + " 1 1 \nbegin kpoints"
+    for k in kpt_all:
+        string += "\n"
+        for coord in k:
+            string += str(coord).replace("e", "d") + " "
+    string += "\nend kpoints\n"
+    return string
+
+
+def wannier90_nnkpts_batch(kpt_list):
+    """
+    Creates the nnkpts input for several k-point strings, where the k-points of each string are numbered consecutively, in the same order as in :func:`wannier90_batch` and :func:`qe_explicit_batch`. Each k-point is connected only to the next point in its own string.
+    """
+    string = "begin nnkpts\n"
+    offset = 0
+    for kpt in kpt_list:
+        _check_string(kpt)
+        num_kpt = len(kpt) - 1
+        bz_diff = [np.zeros(3, dtype=int) for _ in range(num_kpt - 1)]
+        # check whether the last k-point is in a different UC
+        bz_diff.append(np.array(np.round(kpt[-1] - kpt[0]), dtype=int))
+        for i, k in enumerate(bz_diff):
+            j = (i + 1) % num_kpt
+            string += " {0:>3} {1:>3}    {2[0]: } {2[1]: } {2[2]: }\n".format(
+                offset + i + 1, offset + j + 1, k
+            )
+        offset += num_kpt
+    string += "end nnkpts\n"
+    return string
+
+
+def wannier90_full_batch(kpt_list):
+    """
+    Returns both k-point and nearest neighbour input for wannier90.win, for several k-point strings.
+    """
+    return wannier90_batch(kpt_list) + "\n" + wannier90_nnkpts_batch(kpt_list)
+
+
 def _check_equal_spacing(kpt, run_type):
     """Checks if the k-points are equally spaced, and throws an error if not. run_type is added in the error message."""
     deltas = [(k2 - k1) % 1 for k2, k1 in zip(kpt[1:], kpt[:-1])]
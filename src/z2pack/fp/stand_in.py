@@ -0,0 +1,138 @@
+r"""
+Stand-in for a first-principles calculation, which can be used as the ``command`` of :class:`.fp.System` to test or benchmark first-principles workflows without a first-principles code. It reads the k-points and nearest neighbours from the Wannier90 input file, computes the overlap matrices of a tight-binding model, and writes them to a ``.mmn`` file.
+
+The k-points and neighbours must be given explicitly in the input file, for example with :func:`.fp.kpoint.wannier90_full` or :func:`.fp.kpoint.wannier90_full_batch`. The model has ``2 * num_bands`` orbitals, all located at the origin of the unit cell, and the ``num_bands`` lowest bands are occupied. Its Hamiltonian is given by :func:`create_hamilton`.
+
+Example usage:
+
+.. code:: python
+
+    system = z2pack.fp.System(
+        input_files=[],
+        kpt_fct=z2pack.fp.kpoint.wannier90_full,
+        kpt_path="wannier90.win",
+        command=f"{sys.executable} {z2pack.fp.stand_in.__file__} --num-bands 10 --delay 0.5",
+    )
+
+Running the file directly, instead of ``python -m z2pack.fp.stand_in``, avoids importing the whole ``z2pack`` package for each calculation. The options of the command are listed by ``python -m z2pack.fp.stand_in --help``.
+"""
+
+import argparse
+import re
+import sys
+import time
+
+import numpy as np
+
+__all__ = ["create_hamilton", "main"]
+
+
+def create_hamilton(num_bands=4, seed=0):
+    """
+    Creates the Hamiltonian of the tight-binding model which is used by the stand-in calculation. The model consists of ``num_bands`` orbitals with energy :math:`-2` and ``num_bands`` orbitals with energy :math:`2`, coupled by random hoppings to the neighbouring unit cells. The hoppings are small enough that the ``num_bands`` lowest bands are separated from the others by a gap.
+
+    :param num_bands:   Number of occupied bands.
+    :type num_bands:    int
+
+    :param seed:    Seed of the random hoppings.
+    :type seed:     int
+
+    :returns:   A function which takes the k-point (in reduced coordinates) and returns the Hamiltonian matrix.
+    """
+    rng = np.random.default_rng(seed)
+    size = 2 * num_bands
+    on_site = np.diag([-2.0] * num_bands + [2.0] * num_bands)
+    hoppings = []
+    for _ in range(3):
+        hop = rng.normal(size=(size, size)) + 1j * rng.normal(size=(size, size))
+        hoppings.append(0.3 * hop / np.linalg.norm(hop, ord=2))
+
+    def hamilton(k):
+        ham = on_site.astype(complex)
+        for k_i, hop in zip(k, hoppings):
+            term = hop * np.exp(2j * np.pi * k_i)
+            ham += term + term.conj().T
+        return ham
+
+    return hamilton
+
+
+def _read_block(text, name):
+    """
+    Returns the lines of the ``begin <name>`` ... ``end <name>`` block in the Wannier90 input, or ``None`` if the block does not exist.
+    """
+    match = re.search(
+        rf"^\s*begin\s+{name}\s*$(.*?)^\s*end\s+{name}\s*$",
+        text,
+        flags=re.IGNORECASE | re.MULTILINE | re.DOTALL,
+    )
+    if match is None:
+        return None
+    return [line.split() for line in match.group(1).splitlines() if line.strip()]
+
+
+def _write_mmn(mmn_path, num_bands, num_kpts, blocks):
+    """
+    Writes the overlap matrices in the Wannier90 ``.mmn`` format.
+    """
+    num_neighbours = max(sum(1 for (k1, _), _ in blocks if k1 == k) for k in range(1, num_kpts + 1))
+    with open(mmn_path, "w", encoding="utf-8") as f:
+        f.write("Created by the z2pack first-principles stand-in\n")
+        f.write(f"{num_bands:>12}{num_kpts:>12}{num_neighbours:>12}\n")
+        for (k1, k2), (g_vec, overlaps) in blocks:
+            f.write(f"{k1:>5}{k2:>5}{g_vec[0]:>5}{g_vec[1]:>5}{g_vec[2]:>5}\n")
+            # the matrix elements are written in column-major order
+            values = overlaps.T.reshape(-1)
+            f.write(
+                "".join(f"{value.real:>18.12f}{value.imag:>18.12f}\n" for value in values.tolist())
+            )
+
+
+def main(args=None):
+    """
+    Runs the stand-in calculation with the given command line arguments.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m z2pack.fp.stand_in",
+        description="Computes the overlap matrices of a tight-binding model for the k-points given in a Wannier90 input file.",
+    )
+    parser.add_argument("--win", default="wannier90.win", help="Wannier90 input file.")
+    parser.add_argument("--mmn", default="wannier90.mmn", help="Output .mmn file.")
+    parser.add_argument("--num-bands", type=int, default=4, help="Number of occupied bands.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the random model.")
+    parser.add_argument(
+        "--delay",
+        type=float,
+        default=0.0,
+        help="Time (in seconds) to wait before writing the output, to simulate a calculation.",
+    )
+    args = parser.parse_args(args)
+
+    with open(args.win, encoding="utf-8") as f:
+        text = f.read()
+    kpt_lines = _read_block(text, "kpoints")
+    nnkpts_lines = _read_block(text, "nnkpts")
+    if kpt_lines is None or nnkpts_lines is None:
+        raise ValueError(
+            f"The input file '{args.win}' must explicitly contain the k-points and nearest neighbours."
+        )
+    kpt = [np.array([float(x.replace("d", "e")) for x in line[:3]]) for line in kpt_lines]
+
+    hamilton = create_hamilton(num_bands=args.num_bands, seed=args.seed)
+    eigenstates = np.array([np.linalg.eigh(hamilton(k))[1][:, : args.num_bands] for k in kpt])
+
+    # since all orbitals are at the origin, the states at k + G are the
+    # same as at k
+    blocks = []
+    for line in nnkpts_lines:
+        k1, k2 = int(line[0]), int(line[1])
+        g_vec = [int(x) for x in line[2:5]]
+        overlaps = eigenstates[k1 - 1].conj().T @ eigenstates[k2 - 1]
+        blocks.append(((k1, k2), (g_vec, overlaps)))
+
+    time.sleep(args.delay)
+    _write_mmn(args.mmn, args.num_bands, len(kpt), blocks)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,9 +5,11 @@ This module contains a class for creating Systems which are described by a Hamil
 
 import itertools
 import numbers
+import time
 
 import numpy as np
-import scipy.linalg as la
+import scipy.sparse as sp
+import scipy.sparse.linalg as spla
 
 from .system import EigenstateSystem
 
@@ -18,7 +20,7 @@ class System(EigenstateSystem):
     r"""
     This class is used when the system can be explicitly described as a matrix Hamiltonian :math:`\mathcal{H}(\mathbf{k})`.
 
-    :param hamilton: A function taking the wavevector ``k`` (``list`` of length 3) as an input and returning the matrix Hamiltonian.
+    :param hamilton: A function taking the wavevector ``k`` (``list`` of length 3) as an input and returning the matrix Hamiltonian. The Hamiltonian can also be given as a :py:mod:`scipy.sparse` matrix, in which case only the selected bands are computed with a sparse eigensolver.
     :type hamilton: collections.abc.Callable
 
     :param dim:     Dimension of the system.
@@ -42,8 +44,30 @@ class System(EigenstateSystem):
 
     :param check_periodic: Evaluate the Hamiltonian at :math:`\{0, 1\}^d` as a simple check if it is periodic. Note that this does not work if the Hamiltonian is written such that the eigenstates acquire a phase when being translated by a lattice vector.
     :type check_periodic: bool
+
+    :param hamilton_batch: If ``True``, the ``hamilton`` (and ``basis_overlap``) functions are called with an array of shape ``(N, dim)`` containing all k-points of a line, and must return the stacked matrices with shape ``(N, size, size)``. The eigenstates of all k-points are then computed in a single vectorized call, and surface and volume calculations compute the lines of each iteration together (see :mod:`z2pack.system`).
+    :type hamilton_batch: bool
+
+    :param sparse_min_size: Minimum size of sparse Hamiltonians for which the sparse eigensolver is used. Smaller sparse Hamiltonians are converted to dense matrices, which is faster in that case.
+    :type sparse_min_size: int
+
+    :param sparse_sigma: Energy inside the band gap, used as the shift in the shift-invert mode of the sparse eigensolver. If it is given, only the states with energy directly below ``sparse_sigma`` are computed, and the indices in ``bands`` are counted from the lowest of these states. Otherwise, the sparse eigensolver computes the lowest-energy states.
+    :type sparse_sigma: float
+
+    :param sparse_solver: Eigensolver used for sparse Hamiltonians. With ``'arpack'``, each k-point is solved independently with :func:`scipy.sparse.linalg.eigsh`. With ``'lobpcg'``, the eigenstates along a line are computed with the LOBPCG method, starting from the eigenstates of the previous k-point. The LOBPCG iteration is preconditioned with the sparse LU factorization of the Hamiltonian, shifted to just below the energy of the starting states. This factorization is reused for the following k-points as long as the additional iterations take less time than factorizing again. Two additional states above the selected ones are tracked, such that bands entering the selected subspace from above are captured. This assumes that the k-points are dense enough for such bands to pass through the additional states. A k-point is computed with ``'arpack'`` instead if the iterative solver does not converge, or if the selected states change too much compared to the previous k-point. The ``'lobpcg'`` solver can not be combined with ``sparse_sigma``.
+    :type sparse_solver: str
+
+    :param lobpcg_tol: Tolerance for the residual norm of the selected states in the ``'lobpcg'`` sparse solver, relative to their energy (or absolute, for energies smaller than one).
+    :type lobpcg_tol: float
+
+    :param lobpcg_maxiter: Maximum number of iterations of the ``'lobpcg'`` sparse solver for each k-point, before falling back to ``'arpack'``.
+    :type lobpcg_maxiter: int
     """
 
+    # the eigenstates at each k-point are computed independently, apart from
+    # the starting guess of the 'lobpcg' solver
+    independent_kpoints = True
+
     def __init__(
         self,
         hamilton,
@@ -55,8 +79,21 @@ class System(EigenstateSystem):
         basis_overlap=None,
         convention=2,
         check_periodic=False,
+        hamilton_batch=False,
+        sparse_min_size=200,
+        sparse_sigma=None,
+        sparse_solver="arpack",
+        lobpcg_tol=1e-8,
+        lobpcg_maxiter=40,
     ):
         self._hamilton = hamilton
+        self._hamilton_batch = bool(hamilton_batch)
+        self._sparse_min_size = sparse_min_size
+        self._sparse_sigma = sparse_sigma
+        self._sparse_solver = sparse_solver
+        self._lobpcg_tol = lobpcg_tol
+        self._lobpcg_maxiter = lobpcg_maxiter
+        self._check_sparse_options()
         self._hermitian_tol = hermitian_tol
         self._basis_overlap = basis_overlap
         self._convention = int(convention)
@@ -69,21 +106,12 @@ class System(EigenstateSystem):
         self._hamilton_orthogonal = basis_overlap is None
 
         if check_periodic:
-            k_values = itertools.product([0, 1], repeat=dim)
-            k_first = next(k_values)
-            ham_first = self._hamilton(k_first)
-            for k in k_values:
-                if not np.allclose(ham_first, self._hamilton(k)):
-                    raise ValueError(
-                        "The given Hamiltonian is not periodic: H(k={}) != H(k={})".format(
-                            k_first, k
-                        )
-                    )
+            self._check_periodic(dim)
 
-        size = len(self._hamilton([0] * dim))  # assuming to be square...
+        size = self._get_hamiltonians(np.zeros((1, dim)))[0].shape[0]  # assuming to be square...
         if not self._hamilton_orthogonal:
             size_S = len(  # pylint: disable=invalid-name
-                self._basis_overlap([0] * dim)
+                self._get_basis_overlaps(np.zeros((1, dim)))[0]
             )  # assuming to be square...
             if size_S != size:
                 raise ValueError(
@@ -109,61 +137,389 @@ class System(EigenstateSystem):
             self._bands = list(range(bands))
         else:
             self._bands = bands
+        # band indices in ascending order, with negative indices resolved
+        self._band_idx = np.sort(np.arange(size)[self._bands])
 
-    def get_eig(self, kpt):
-        __doc__ = (  # pylint: disable=unused-variable,redefined-builtin
-            super().__doc__  # pylint: disable=no-member
+    def _check_periodic(self, dim):
+        """
+        Checks that the Hamiltonian is the same at all corners of the unit cube in k-space.
+        """
+        k_values = list(itertools.product([0, 1], repeat=dim))
+        hams = self._get_hamiltonians(np.array(k_values, dtype=float))
+        for k, ham in zip(k_values[1:], hams[1:]):
+            if not np.allclose(_to_dense(hams[0]), _to_dense(ham)):
+                raise ValueError(
+                    "The given Hamiltonian is not periodic: H(k={}) != H(k={})".format(
+                        k_values[0], k
+                    )
+                )
+
+    def _check_sparse_options(self):
+        """
+        Checks that the options of the sparse eigensolver are valid.
+        """
+        if self._sparse_solver not in {"arpack", "lobpcg"}:
+            raise ValueError(
+                "Invalid value '{}' for 'sparse_solver', must be either 'arpack' or 'lobpcg'.".format(
+                    self._sparse_solver
+                )
+            )
+        if self._sparse_solver == "lobpcg" and self._sparse_sigma is not None:
+            raise ValueError("The 'lobpcg' sparse solver can not be used with 'sparse_sigma'.")
+        if self._lobpcg_tol <= 0:
+            raise ValueError(
+                "Invalid value '{}' for 'lobpcg_tol', must be positive.".format(self._lobpcg_tol)
+            )
+        if self._lobpcg_maxiter < 1:
+            raise ValueError(
+                "Invalid value '{}' for 'lobpcg_maxiter', must be positive.".format(
+                    self._lobpcg_maxiter
+                )
+            )
+
+    @property
+    def supports_batch(self):
+        """Whether several lines are computed together, which is the case for a vectorized Hamiltonian (``hamilton_batch=True``)."""
+        return self._hamilton_batch
+
+    @property
+    def pos(self):
+        """Positions of the orbitals w.r.t the reduced unit cell."""
+        return self._pos
+
+    def _get_hamiltonians(self, k_points):
+        """
+        Returns the stacked Hamiltonian matrices for an array of k-points. Sparse Hamiltonians which are large enough for the sparse eigensolver are returned as a list of sparse matrices instead.
+        """
+        if self._hamilton_batch:
+            hams = self._hamilton(k_points)
+        else:
+            hams = [self._hamilton(k) for k in k_points]
+        if any(sp.issparse(ham) for ham in hams):
+            if self._hamilton_orthogonal and hams[0].shape[0] >= self._sparse_min_size:
+                return [sp.csr_matrix(ham) for ham in hams]
+            hams = [_to_dense(ham) for ham in hams]
+        return np.asarray(hams)
+
+    def _get_basis_overlaps(self, k_points):
+        """
+        Returns the stacked basis overlap matrices for an array of k-points.
+        """
+        if self._hamilton_batch:
+            return np.asarray(self._basis_overlap(k_points))
+        return np.array([self._basis_overlap(k) for k in k_points])
+
+    @staticmethod
+    def _max_hermitian_diff(matrices):
+        """
+        Returns the largest (infinity-norm) difference between any of the stacked matrices and its hermitian conjugate.
+        """
+        if isinstance(matrices, list):
+            return max(abs(mat - mat.conjugate().T).sum(axis=1).max() for mat in matrices)
+        diff = matrices - np.conjugate(np.swapaxes(matrices, -1, -2))
+        return np.max(np.sum(np.abs(diff), axis=-1))
+
+    @staticmethod
+    def _orthogonalize(hams, ovls):
+        r"""
+        Transforms the stacked Hamiltonians to the symmetrically orthogonalized basis, :math:`S^{-1/2} \mathcal{H} S^{-1/2}`. The inverse square root of the overlap matrices is computed from their eigendecomposition, for all k-points at once.
+        """
+        ovl_eigval, ovl_eigvec = np.linalg.eigh(ovls)
+        if np.any(ovl_eigval <= 0):
+            raise ValueError(
+                "The overlap matrix is not positive definite, with the smallest eigenvalue being {}.".format(
+                    np.min(ovl_eigval)
+                )
+            )
+        ovls2 = (ovl_eigvec / np.sqrt(ovl_eigval)[..., None, :]) @ np.conjugate(
+            np.swapaxes(ovl_eigvec, -1, -2)
         )
-        # create k-points for string
-        k_points = kpt[:-1]
+        return ovls2 @ hams @ ovls2
 
-        # get eigenvectors corr. to the chosen bands
-        eigs = []
-        for k in k_points:
-            ham = self._hamilton(k)
+    def _get_eigvecs(self, k_points):
+        """
+        Returns the eigenvectors of the selected bands as an array of shape ``(N, size, num_bands)``, where the eigenvectors are given as columns.
+        """
+        hams = self._get_hamiltonians(k_points)
+        if self._hermitian_tol is not None:
+            diff = self._max_hermitian_diff(hams)
+            if diff > self._hermitian_tol:
+                raise ValueError(
+                    "The Hamiltonian you used is not hermitian, with the maximum difference between the Hamiltonian and its adjoint being {}. Use the ``hamilton_tol`` input parameter (in the ``tb.Hamilton`` constructor; currently {}) to set the sensitivity of this test or turn it off completely (``hamilton_tol=None``).".format(
+                        diff, self._hermitian_tol
+                    )
+                )
+        if not self._hamilton_orthogonal:
+            ovls = self._get_basis_overlaps(k_points)
             if self._hermitian_tol is not None:
-                diff = la.norm(ham - ham.conjugate().transpose(), ord=np.inf)
+                diff = self._max_hermitian_diff(ovls)
                 if diff > self._hermitian_tol:
                     raise ValueError(
-                        "The Hamiltonian you used is not hermitian, with the maximum difference between the Hamiltonian and its adjoint being {}. Use the ``hamilton_tol`` input parameter (in the ``tb.Hamilton`` constructor; currently {}) to set the sensitivity of this test or turn it off completely (``hamilton_tol=None``).".format(
+                        "The overlap you used is not hermitian, with the maximum difference between the overlap matrix and its adjoint being {}. Use the ``hermitian_tol`` input parameter (currently {}) to set the sensitivity of this test or turn it off completely (``hermitian_tol=None``).".format(
                             diff, self._hermitian_tol
                         )
                     )
-            if not self._hamilton_orthogonal:
-                ovl = self._basis_overlap(k)
-                if self._hermitian_tol is not None:
-                    diff = la.norm(ovl - ovl.conjugate().transpose(), ord=np.inf)
-                    if diff > self._hermitian_tol:
-                        raise ValueError(
-                            "The overlap you used is not hermitian, with the maximum difference between the overlap matrix and its adjoint being {}. Use the ``hermitian_tol`` input parameter (currently {}) to set the sensitivity of this test or turn it off completely (``hermitian_tol=None``).".format(
-                                diff, self._hermitian_tol
-                            )
-                        )
-                ovl2 = la.inv(la.sqrtm(ovl))
-                ortho_ham = np.dot(ovl2, ham.dot(ovl2))
-                ham = ortho_ham
-
-            eigval, eigvec = la.eigh(ham)
-            eigval = np.real(eigval)
-            idx = eigval.argsort()
-
-            idx = idx[self._bands]
-            idx.sort()
-            # take only the lower - energy eigenstates
-            eigvec = eigvec[:, idx]
-
-            # cast to complex explicitly to avoid casting error when the phase
-            # is complex but the eigenvector itself is not.
-            eigs.append(np.array(eigvec, dtype=complex))
-
-        for i, k in enumerate(kpt[:-1]):
-            if self._convention == 2:
-                # normalize phases to get u instead of phi
-                eigs[i] *= np.exp(-2j * np.pi * np.dot(self._pos, k))[:, None]
-            eigs[i] = list(eigs[i].T)
-
-        # The last bloch state is the same as the first up to a phase factor
-        eigs.append(
-            list(eigs[0] * np.exp(-2j * np.pi * np.dot(self._pos, kpt[-1] - kpt[0]))[None, :])
+            hams = self._orthogonalize(hams, ovls)
+
+        if isinstance(hams, list):
+            return np.array(self._get_eigvecs_sparse(hams), dtype=complex)
+
+        # the eigenvalues are returned in ascending order
+        _, eigvecs = np.linalg.eigh(hams)
+        # take only the chosen (lower - energy) eigenstates, and cast to
+        # complex explicitly to avoid casting error when the phase is
+        # complex but the eigenvector itself is not.
+        return np.array(eigvecs[:, :, self._band_idx], dtype=complex)
+
+    def _get_eigvecs_sparse(self, hams):
+        """
+        Returns the eigenvectors of the selected bands for a list of sparse Hamiltonians, computing only as many states as needed.
+        """
+        num_states = self._band_idx[-1] + 1
+        res = []
+        eigvecs = None
+        # the factorization of the 'lobpcg' preconditioner, which is reused
+        # for the following k-points
+        precondition = None
+        for ham in hams:
+            if num_states >= ham.shape[0]:
+                # ARPACK can not compute all eigenstates
+                _, eigvecs = np.linalg.eigh(ham.toarray())
+                res.append(eigvecs[:, self._band_idx])
+                continue
+            if self._sparse_solver == "lobpcg":
+                # two additional states are kept to capture bands which
+                # enter the selected subspace from above
+                num_solve = min(num_states + 2, ham.shape[0] - 1)
+                new_eigvecs = None
+                if eigvecs is not None:
+                    new_eigvecs, precondition = self._solve_lobpcg_reuse(
+                        ham, eigvecs, num_states=num_states, precondition=precondition
+                    )
+                # only the k-points where the iterative solver fails are
+                # computed with ARPACK
+                if new_eigvecs is None:
+                    _, new_eigvecs = self._solve_arpack(ham, num_states=num_solve)
+                eigvecs = new_eigvecs
+            else:
+                _, eigvecs = self._solve_arpack(ham, num_states=num_states)
+            eigvecs_selected = eigvecs[:, self._band_idx]
+            # ARPACK does not guarantee orthogonal eigenvectors within degenerate
+            # subspaces, so they are orthonormalized with minimal change.
+            u_mat, _, vh_mat = np.linalg.svd(eigvecs_selected, full_matrices=False)
+            res.append(u_mat @ vh_mat)
+        return res
+
+    def _solve_arpack(self, ham, *, num_states):
+        """
+        Computes the ``num_states`` lowest eigenstates (or the ones directly below ``sparse_sigma``) of a sparse Hamiltonian with ARPACK, sorted by their energy.
+        """
+        if self._sparse_sigma is None:
+            eigvals, eigvecs = spla.eigsh(ham, k=num_states, which="SA")
+        else:
+            # in shift-invert mode, 'SA' selects the states directly below sigma
+            eigvals, eigvecs = spla.eigsh(ham, k=num_states, sigma=self._sparse_sigma, which="SA")
+            if np.any(eigvals > self._sparse_sigma):
+                raise ValueError(
+                    "Only {} states were found below sparse_sigma={}, but {} are needed.".format(
+                        np.sum(eigvals <= self._sparse_sigma), self._sparse_sigma, num_states
+                    )
+                )
+        idx = np.argsort(eigvals)
+        return eigvals[idx], eigvecs[:, idx]
+
+    def _solve_lobpcg_reuse(self, ham, guess, *, num_states, precondition):
+        """
+        Computes the lowest eigenstates of a sparse Hamiltonian with the LOBPCG method, reusing the preconditioner of a previous k-point if possible. Returns the eigenstates (or ``None`` if the solver fails) and the preconditioner to use for the next k-point.
+        """
+        if precondition is not None and precondition.is_reusable(ham, guess):
+            eigvecs = self._solve_lobpcg_timed(
+                ham, guess, num_states=num_states, precondition=precondition
+            )
+            if eigvecs is not None:
+                return eigvecs, precondition
+        # the factorization is computed again at the current k-point
+        try:
+            precondition = _ShiftInvertPreconditioner(ham, guess, previous=precondition)
+        except RuntimeError:
+            # the shifted Hamiltonian is (numerically) singular
+            return None, None
+        return (
+            self._solve_lobpcg_timed(ham, guess, num_states=num_states, precondition=precondition),
+            precondition,
+        )
+
+    def _solve_lobpcg_timed(self, ham, guess, *, num_states, precondition):
+        """
+        Computes the lowest eigenstates with the LOBPCG method, and records the number of iterations and their run time in the preconditioner.
+        """
+        start = time.perf_counter()
+        eigvecs, num_iter = self._solve_lobpcg(
+            ham, guess, num_states=num_states, precondition=precondition
+        )
+        precondition.record(
+            num_iter=num_iter, run_time=time.perf_counter() - start, converged=eigvecs is not None
+        )
+        return eigvecs
+
+    def _solve_lobpcg(self, ham, guess, *, num_states, precondition, min_overlap=0.5):
+        """
+        Computes the lowest eigenstates of a sparse Hamiltonian with the LOBPCG method, starting from the eigenstates ``guess`` of the previous k-point. Returns the eigenstates and the number of iterations. The eigenstates are ``None`` if the solver does not converge, or if the selected states have changed too much compared to the starting guess.
+        """
+        num_vec = guess.shape[1]
+        eigvecs = guess
+        residuals = None
+        direction = None
+        for num_iter in range(self._lobpcg_maxiter + 1):
+            # Rayleigh-Ritz step in the space spanned by the current
+            # eigenvectors, and the (preconditioned) residuals and search
+            # directions of the states which have not converged yet
+            basis_parts = [eigvecs]
+            if residuals is not None:
+                basis_parts.append(precondition(residuals[:, active]))
+            if direction is not None:
+                basis_parts.append(direction[:, active])
+            basis = _orthonormalize(np.hstack(basis_parts))
+            ham_basis = ham @ basis
+            ritz_vals, ritz_vecs = np.linalg.eigh(np.conjugate(basis).T @ ham_basis)
+            eigvals = ritz_vals[:num_vec]
+            new_eigvecs = basis @ ritz_vecs[:, :num_vec]
+            # in the first step, the new eigenvectors lie in the span of the
+            # starting states, such that there is no search direction yet
+            if residuals is not None:
+                direction = new_eigvecs - eigvecs @ (np.conjugate(eigvecs).T @ new_eigvecs)
+            eigvecs = new_eigvecs
+
+            residuals = ham_basis @ ritz_vecs[:, :num_vec] - eigvecs * eigvals
+            active = np.linalg.norm(residuals, axis=0) > self._lobpcg_tol * np.maximum(
+                1, np.abs(eigvals)
+            )
+            if not np.any(active[:num_states]):
+                break
+        else:
+            return None, num_iter
+
+        # a small singular value of the overlap means that a state has
+        # entered or left the selected subspace
+        overlap = np.conjugate(guess[:, :num_states]).T @ eigvecs[:, :num_states]
+        if np.min(np.linalg.svd(overlap, compute_uv=False)) < min_overlap:
+            return None, num_iter
+        return eigvecs, num_iter
+
+    def get_eig(self, kpt):
+        __doc__ = (  # pylint: disable=unused-variable,redefined-builtin
+            super().__doc__  # pylint: disable=no-member
         )
-        return eigs
+        return self.get_eig_batch([kpt])[0]
+
+    def get_eig_batch(self, kpt_list):
+        """
+        Returns the eigenstates for each of the given k-point strings. The Hamiltonians of all strings are diagonalized together, such that a vectorized Hamiltonian (``hamilton_batch=True``) is evaluated only once. With the ``'lobpcg'`` sparse solver, each string is diagonalized separately, because the solver starts from the eigenstates of the previous k-point.
+
+        :param kpt_list: List of k-point strings, each of which has the same form as the ``kpt`` input of :meth:`get_eig`.
+        :type kpt_list:  list
+        """
+        kpt_list = list(kpt_list)
+        # create k-points for all strings
+        k_points = np.array([k for kpt in kpt_list for k in kpt[:-1]], dtype=float)
+
+        # get eigenvectors corr. to the chosen bands
+        if self._sparse_solver == "lobpcg":
+            eigvecs = np.concatenate(
+                [self._get_eigvecs(np.array(kpt[:-1], dtype=float)) for kpt in kpt_list]
+            )
+        else:
+            eigvecs = self._get_eigvecs(k_points)
+
+        if self._convention == 2:
+            # normalize phases to get u instead of phi
+            eigvecs *= np.exp(-2j * np.pi * np.dot(k_points, np.transpose(self._pos)))[:, :, None]
+        eigs_all = [list(eigvec.T) for eigvec in eigvecs]
+
+        res = []
+        offset = 0
+        for kpt in kpt_list:
+            eigs = eigs_all[offset : offset + len(kpt) - 1]
+            offset += len(kpt) - 1
+            # The last bloch state is the same as the first up to a phase factor
+            eigs.append(
+                list(eigs[0] * np.exp(-2j * np.pi * np.dot(self._pos, kpt[-1] - kpt[0]))[None, :])
+            )
+            res.append(eigs)
+        return res
+
+
+def _to_dense(matrix):
+    """
+    Converts a (possibly sparse) matrix to a dense array.
+    """
+    if sp.issparse(matrix):
+        return matrix.toarray()
+    return np.asarray(matrix)
+
+
+class _ShiftInvertPreconditioner:
+    r"""
+    Preconditioner :math:`(\mathcal{H} - \sigma)^{-1}` for the LOBPCG method, given by the sparse LU factorization of the Hamiltonian at one k-point. The shift :math:`\sigma` is below the energies of the starting states ``guess`` by a tenth of their energy range.
+
+    Because the Hamiltonian changes only slightly between neighbouring k-points, the factorization can be reused for the following k-points, at the cost of additional iterations. It is reused as long as the time spent on these additional iterations, including the expected time for the next k-point, is less than the time of the factorization. This estimate is carried over from the ``previous`` preconditioner, such that the factorization is not reused at all if that does not pay off.
+    """
+
+    def __init__(self, ham, guess, *, previous=None):
+        start = time.perf_counter()
+        ritz_vals = _ritz_values(ham, guess)
+        margin = 0.1 * max(ritz_vals[-1] - ritz_vals[0], 1e-3 * max(1, abs(ritz_vals[0])))
+        self.shift = ritz_vals[0] - margin
+        shifted = ham - self.shift * sp.identity(ham.shape[0], format="csc")
+        self._solve = spla.splu(sp.csc_matrix(shifted)).solve
+        self._factorization_time = time.perf_counter() - start
+        # iterations needed at the k-point of the factorization
+        self._num_iter = None
+        # time spent on additional iterations at the following k-points
+        self._overhead = 0.0
+        self._expected_overhead = 0.0 if previous is None else previous._expected_overhead
+
+    def __call__(self, vectors):
+        return self._solve(vectors)
+
+    def record(self, *, num_iter, run_time, converged):
+        """
+        Records the number of iterations and the run time of a LOBPCG solve, to estimate the overhead of reusing the factorization. If the solver has failed with the reused factorization, its whole run time is counted as overhead.
+        """
+        if self._num_iter is None:
+            if converged:
+                self._num_iter = num_iter
+            return
+        if converged:
+            overhead = max(num_iter - self._num_iter, 0) * run_time / max(num_iter, 1)
+        else:
+            overhead = run_time
+        self._overhead += overhead
+        self._expected_overhead = overhead
+
+    def is_reusable(self, ham, guess):
+        """
+        Checks if the factorization should be reused for the Hamiltonian ``ham`` with starting states ``guess``. This requires that the shift is still below the energies of the starting states.
+        """
+        if self._num_iter is None:
+            return False
+        if self._overhead + self._expected_overhead >= self._factorization_time:
+            return False
+        return _ritz_values(ham, guess)[0] > self.shift
+
+
+def _ritz_values(ham, guess):
+    """
+    Returns the Ritz values of a Hamiltonian in the space spanned by the (orthonormal) states ``guess``, in ascending order.
+    """
+    return np.linalg.eigvalsh(np.conjugate(guess).T @ (ham @ guess))
+
+
+def _orthonormalize(vectors, rtol=1e-10):
+    """
+    Returns an orthonormal basis of the space spanned by the given column vectors, dropping (almost) linearly dependent directions.
+    """
+    norms = np.linalg.norm(vectors, axis=0)
+    q_mat, r_mat = np.linalg.qr(vectors[:, norms > 0] / norms[norms > 0])
+    r_diag = np.abs(np.diagonal(r_mat))
+    return q_mat[:, r_diag > rtol * np.max(r_diag)]
@@ -1,4 +1,5 @@
 #!/usr/bin/env python
 """This module contains functions for saving and loading Z2Pack objects."""
 
+from ._journal import *
 from ._save_load import *
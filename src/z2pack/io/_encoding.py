@@ -1,5 +1,6 @@
 """Defines functions for encoding and decoding Z2Pack objects."""
 
+import base64
 from collections.abc import Iterable
 import contextlib
 from functools import singledispatch
@@ -9,7 +10,7 @@ import numpy as np
 
 # This can create a circular import if it is imported by name (from ... import ...)
 # If this is ever an issue, consider splitting the encoding by surface / line
-from ..line import EigenstateLineData, LineResult, OverlapLineData, WccLineData
+from ..line import EigenstateLineData, LineResult, OverlapLineData, WccLineData, WilsonLineData
 from ..surface._data import LinePosition, SurfaceData
 from ..surface._result import SurfaceResult
 from ..volume._data import SurfacePosition, VolumeData
@@ -46,14 +47,41 @@ def _(obj):
     return list(obj)
 
 
+@encode.register(np.ndarray)
+def _(obj):
+    # numeric arrays are stored as a single block of raw data, instead of
+    # nested lists with one entry (or dict, for complex numbers) per element
+    if obj.dtype.kind not in "biufc":
+        return list(obj)
+    return dict(
+        __ndarray__=True,
+        dtype=obj.dtype.str,
+        shape=list(obj.shape),
+        data=base64.b64encode(np.ascontiguousarray(obj).tobytes()).decode("ascii"),
+    )
+
+
 @encode.register(EigenstateLineData)
 def _(obj):
-    return dict(__eigenstate_line_data__=True, eigenstates=encode(obj.eigenstates))
+    return dict(
+        __eigenstate_line_data__=True,
+        eigenstates=encode(obj.eigenstates),
+        unitarize=obj.unitarize,
+    )
+
+
+@encode.register(WilsonLineData)
+def _(obj):
+    return dict(__wilson_line_data__=True, wilson=encode(obj.wilson))
 
 
 @encode.register(OverlapLineData)
 def _(obj):
-    return dict(__overlap_line_data__=True, overlaps=encode(obj.overlaps))
+    return dict(
+        __overlap_line_data__=True,
+        overlaps=encode(obj.overlaps),
+        unitarize=obj.unitarize,
+    )
 
 
 @encode.register(WccLineData)
@@ -202,14 +230,30 @@ def decode_overlap_line_data(obj):
     """
     Decodes a dict into a OverlapLineData instance.
     """
-    return OverlapLineData(obj["overlaps"])
+    # 'unitarize' is missing in legacy results
+    return OverlapLineData(obj["overlaps"], unitarize=obj.get("unitarize", False))
+
+
+def decode_wilson_line_data(obj):
+    """
+    Decodes a dict into a WilsonLineData instance.
+    """
+    return WilsonLineData(obj["wilson"])
 
 
 def decode_eigenstate_line_data(obj):
     """
     Decodes a dict into a EigenstateLineData instance.
     """
-    return EigenstateLineData(obj["eigenstates"])
+    return EigenstateLineData(obj["eigenstates"], unitarize=obj.get("unitarize", False))
+
+
+def decode_ndarray(obj):
+    """
+    Decodes a dict into a numpy array.
+    """
+    data = bytearray(base64.b64decode(obj["data"]))
+    return np.frombuffer(data, dtype=np.dtype(obj["dtype"])).reshape(obj["shape"])
 
 
 def decode_complex(obj):
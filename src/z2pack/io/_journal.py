@@ -0,0 +1,159 @@
+"""Defines an append-only journal format for saving the results of surface and volume calculations."""
+
+import contextlib
+import os
+import tempfile
+
+import msgpack
+
+from . import _encoding
+from ..surface._data import SurfaceData
+from ..surface._result import SurfaceResult
+from ..volume._data import VolumeData
+from ..volume._result import VolumeResult
+
+__all__ = ["load_journal"]
+
+_VERSION = 1
+
+# for each result type: the name of the journal kind, the data type, the
+# attribute containing the lines / surfaces, and the attribute giving their
+# position
+_KINDS = {
+    SurfaceResult: ("surface", SurfaceData, "lines", "t"),
+    VolumeResult: ("volume", VolumeData, "surfaces", "s"),
+}
+
+
+def _pack(obj):
+    return msgpack.packb(obj, default=_encoding.encode, use_bin_type=True)
+
+
+class JournalWriter:
+    """
+    Context manager which writes a journal of a surface or volume calculation. Each record contains one line (for a surface) or one surface (for a volume), and the states and convergence of the controls at the time it was written. When the journal is opened, it is replaced by a journal which contains only the initial result.
+
+    :param file_path:   Path to the journal file.
+    :type file_path:    str
+
+    :param result_type: Type of the result, :class:`.SurfaceResult` or :class:`.VolumeResult`.
+    :type result_type:  type
+
+    :param init_result: Initial result of the calculation, which is written to the journal when it is opened.
+    """
+
+    def __init__(self, file_path, result_type, init_result=None):
+        self._file_path = file_path
+        self._kind, _, self._positions_attr, _ = _KINDS[result_type]
+        self._init_result = init_result
+        self._file = None
+
+    def __enter__(self):
+        # write the initial journal to a temporary file first, such that the
+        # previous journal is kept if this fails
+        dirname = os.path.dirname(os.path.abspath(self._file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_pack(dict(journal=self._kind, version=_VERSION)))
+                if self._init_result is not None:
+                    positions = getattr(self._init_result.data, self._positions_attr)
+                    for position in positions:
+                        f.write(self._record(position, self._init_result))
+            os.replace(tmp_path, self._file_path)
+        except Exception as exception:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise exception
+        self._file = open(self._file_path, "ab")  # pylint: disable=consider-using-with
+        return self
+
+    @staticmethod
+    def _record(position, result):
+        return _pack(
+            dict(
+                position=position,
+                ctrl_states=result.ctrl_states,
+                ctrl_convergence=result.ctrl_convergence,
+            )
+        )
+
+    def write(self, position, result):
+        """
+        Appends a record to the journal.
+
+        :param position:    The line (:class:`.LinePosition`) or surface (:class:`.SurfacePosition`) which was added or updated.
+
+        :param result:  The result of the whole calculation, containing the states and convergence of the controls.
+        """
+        self._file.write(self._record(position, result))
+        self._file.flush()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._file.close()
+
+
+def _result_type(header):
+    """
+    Returns the result type of a journal given its header, or ``None`` if it is not a journal header.
+    """
+    if isinstance(header, dict):
+        for result_type, specs in _KINDS.items():
+            if specs[0] == header.get("journal"):
+                return result_type
+    return None
+
+
+def is_journal(file_path):
+    """
+    Checks whether a file is a journal, by reading its header.
+
+    :param file_path:   Path to the file.
+    :type file_path:    str
+    """
+    with open(file_path, "rb") as f:
+        unpacker = msgpack.Unpacker(f, raw=False, strict_map_key=False)
+        try:
+            header = next(unpacker, None)
+        except (ValueError, msgpack.UnpackException):
+            return False
+    return _result_type(header) is not None
+
+
+def load_journal(file_path):
+    """
+    Loads the result of a surface or volume calculation from a journal file, which was written by :func:`z2pack.surface.run` or :func:`z2pack.volume.run` with ``journal=True``. If a line or surface is contained multiple times, the last record is used. An incomplete record at the end of the file (for example from a calculation which was aborted while saving) is ignored.
+
+    :param file_path:   Path to the journal file.
+    :type file_path:    str
+
+    :returns:   :class:`.SurfaceResult` or :class:`.VolumeResult` instance.
+    """
+    with open(file_path, "rb") as f:
+        unpacker = msgpack.Unpacker(
+            f, object_hook=_encoding.decode, raw=False, strict_map_key=False
+        )
+        header = next(unpacker, None)
+        result_type = _result_type(header)
+        if result_type is None:
+            raise ValueError(f"The file '{file_path}' is not a valid journal.")
+        _, data_type, _, key = _KINDS[result_type]
+        if header.get("version", 0) > _VERSION:
+            raise ValueError(
+                f"The journal '{file_path}' has version {header['version']}, but only versions up to {_VERSION} are supported."
+            )
+
+        positions = {}
+        ctrl_states = {}
+        ctrl_convergence = {}
+        for record in unpacker:
+            position = record["position"]
+            positions[getattr(position, key)] = position
+            ctrl_states = record["ctrl_states"]
+            ctrl_convergence = record["ctrl_convergence"]
+
+    # The states / convergence of the controls are set manually
+    result = result_type(data_type(positions.values()), [], [])
+    result.ctrl_states = ctrl_states
+    result.ctrl_convergence = ctrl_convergence
+    return result
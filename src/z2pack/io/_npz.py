@@ -0,0 +1,274 @@
+"""Defines a binary format for Z2Pack results, which stores the data in typed arrays of a ``.npz`` file and loads it lazily."""
+
+import contextlib
+import functools
+import json
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+from . import _encoding
+from ..line import EigenstateLineData, LineResult, OverlapLineData, WccLineData, WilsonLineData
+from ..surface._data import LinePosition, SurfaceData
+from ..surface._result import SurfaceResult
+from ..volume._data import SurfacePosition, VolumeData
+from ..volume._result import VolumeResult
+
+_VERSION = 1
+
+# The name of each line data type in the file, and the attribute containing
+# its bulk array. The subclasses must come before their parent classes.
+_LINE_DATA_TYPES = [
+    (WilsonLineData, "wilson", "wilson"),
+    (EigenstateLineData, "eigenstate", "eigenstates"),
+    (OverlapLineData, "overlap", "overlaps"),
+    (WccLineData, "wcc", None),
+]
+
+
+class _NpzSource:
+    """
+    Reads arrays from a ``.npz`` file. The file is opened when the source is created, such that the arrays are read from the same file even if it is replaced later. It is closed once all arrays returned by :meth:`lazy` have been read, or by :meth:`close`. After that, and when pickled or copied, the file is re-opened from its path for each array which is read. If the file at that path has been replaced or modified in the meantime, a ``ValueError`` is raised instead of mixing arrays from two different files. The source can be used from several threads, such as the thread which saves a result asynchronously.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = os.path.abspath(file_path)
+        self._lock = threading.Lock()
+        self._file = open(self.file_path, "rb")  # pylint: disable=consider-using-with
+        self._identity = _file_identity(self._file)
+        try:
+            self._npz = np.load(self._file, allow_pickle=False)
+        except Exception as exception:
+            self._file.close()
+            raise exception
+        self._pending = set()
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._read(key)
+
+    def _read(self, key):
+        """
+        Reads the array with the given key, re-opening the file if it has been closed. This must be called with the lock held.
+        """
+        if self._npz is not None:
+            return self._npz[key]
+        with open(self.file_path, "rb") as f:
+            if _file_identity(f) != self._identity:
+                raise ValueError(
+                    f"The file '{self.file_path}' has changed since the result was loaded from it."
+                )
+            with np.load(f, allow_pickle=False) as npz:
+                return npz[key]
+
+    def lazy(self, key):
+        """
+        Returns a function which reads the array with the given key as a list. The file is kept open until all such arrays have been read.
+        """
+        with self._lock:
+            self._pending.add(key)
+        return functools.partial(self._read_pending, key)
+
+    def _read_pending(self, key):
+        with self._lock:
+            value = list(self._read(key))
+            self._pending.discard(key)
+            if not self._pending:
+                self._close()
+        return value
+
+    @property
+    def done(self):
+        """
+        Whether all arrays returned by :meth:`lazy` have been read.
+        """
+        with self._lock:
+            return not self._pending
+
+    def close(self):
+        """
+        Closes the file. Arrays which are read later re-open it from its path.
+        """
+        with self._lock:
+            self._close()
+
+    def _close(self):
+        if self._npz is not None:
+            self._npz.close()
+            self._npz = None
+            self._file.close()
+
+    def __getstate__(self):
+        return {"file_path": self.file_path, "identity": self._identity}
+
+    def __setstate__(self, state):
+        self.file_path = state["file_path"]
+        self._identity = state["identity"]
+        self._lock = threading.Lock()
+        self._file = None
+        self._npz = None
+        self._pending = set()
+
+
+def _file_identity(file):
+    """
+    Returns the device, inode, size and modification time of an open file, which identify the file and its content.
+    """
+    stat = os.fstat(file.fileno())
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def save(obj, file_path):
+    """
+    Saves a result to a ``.npz`` file. The WCC of all lines are stored together in a single array, and the eigenstates, overlap matrices or Wilson loop of each line in a separate array. The other data is stored as JSON. The saving is made atomic by first writing to a temporary file.
+
+    :param obj: The result to save.
+    :type obj:  :class:`.LineResult`, :class:`.SurfaceResult` or :class:`.VolumeResult`
+
+    :param file_path:   Path to the file.
+    :type file_path:    str
+    """
+    arrays = {}
+    wcc_list = []
+    structure = dict(version=_VERSION, result=_structure(obj, arrays, wcc_list))
+    arrays["structure"] = np.frombuffer(
+        json.dumps(structure, default=_encoding.encode).encode("utf-8"), dtype=np.uint8
+    )
+    arrays["wcc"] = np.array([wcc for line_wcc in wcc_list for wcc in line_wcc], dtype=float)
+    arrays["wcc_offsets"] = np.cumsum([0] + [len(line_wcc) for line_wcc in wcc_list])
+
+    dirname = os.path.dirname(os.path.abspath(file_path))
+    if not os.path.isdir(dirname):
+        raise ValueError(f"Directory {dirname} does not exist")
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, file_path)
+    except Exception as exception:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise exception
+
+
+def _structure(obj, arrays, wcc_list):
+    """
+    Returns the JSON-compatible structure of a result, and adds the arrays of its lines to ``arrays`` and their WCC to ``wcc_list``.
+    """
+    if not isinstance(obj, (LineResult, SurfaceResult, VolumeResult)):
+        raise TypeError(f"Cannot save object of type {type(obj)} in the 'npz' format.")
+    res = dict(ctrl_states=obj.ctrl_states, ctrl_convergence=obj.ctrl_convergence)
+    if isinstance(obj, LineResult):
+        index = len(wcc_list)
+        wcc_list.append(obj.data.wcc)
+        name, array_attr = next(
+            (name, attr) for cls, name, attr in _LINE_DATA_TYPES if isinstance(obj.data, cls)
+        )
+        res.update(type="line", data=name, unitarize=getattr(obj.data, "unitarize", False))
+        if array_attr is not None:
+            array = np.asarray(getattr(obj.data, array_attr))
+            # arrays in single precision are kept as they are
+            arrays[f"{array_attr}_{index}"] = array.astype(
+                np.result_type(array.dtype, np.complex64)
+            )
+    elif isinstance(obj, SurfaceResult):
+        res.update(
+            type="surface",
+            lines=[
+                dict(t=line.t, result=_structure(line.result, arrays, wcc_list))
+                for line in obj.lines
+            ],
+        )
+    else:
+        res.update(
+            type="volume",
+            surfaces=[
+                dict(s=surface.s, result=_structure(surface.result, arrays, wcc_list))
+                for surface in obj.surfaces
+            ],
+        )
+    return res
+
+
+def load(file_path):
+    """
+    Loads a result from a ``.npz`` file which was written by :func:`save`. The WCC and the other small data are read immediately, while the eigenstates, overlap matrices and Wilson loops are read from the file when they are first accessed.
+
+    :param file_path:   Path to the file.
+    :type file_path:    str
+    """
+    source = _NpzSource(file_path)
+    try:
+        structure = json.loads(
+            bytes(source["structure"]).decode("utf-8"), object_hook=_encoding.decode
+        )
+        if structure["version"] > _VERSION:
+            raise ValueError(
+                f"The file '{file_path}' has version {structure['version']}, but only versions up to {_VERSION} are supported."
+            )
+        wcc = source["wcc"]
+        offsets = source["wcc_offsets"]
+        lines = enumerate(list(wcc[start:end]) for start, end in zip(offsets[:-1], offsets[1:]))
+        result = _from_structure(structure["result"], source, lines)
+    except Exception as exception:
+        source.close()
+        raise exception
+    # the file is kept open only if there are arrays which are loaded lazily
+    if source.done:
+        source.close()
+    return result
+
+
+def _from_structure(structure, source, lines):
+    """
+    Creates the result from its structure. The index and WCC of each line are taken from the ``lines`` iterator, in the order in which the lines were saved.
+    """
+    if structure["type"] == "line":
+        index, wcc = next(lines)
+        data = _line_data(structure, source, wcc, index)
+        res = LineResult(data, [], [])
+    elif structure["type"] == "surface":
+        res = SurfaceResult(
+            SurfaceData(
+                LinePosition(line["t"], _from_structure(line["result"], source, lines))
+                for line in structure["lines"]
+            ),
+            [],
+            [],
+        )
+    else:
+        res = VolumeResult(
+            VolumeData(
+                SurfacePosition(
+                    surface["s"],
+                    _from_structure(surface["result"], source, lines),
+                )
+                for surface in structure["surfaces"]
+            ),
+            [],
+            [],
+        )
+    # The states / convergence of the controls are set manually
+    res.ctrl_states = structure["ctrl_states"]
+    res.ctrl_convergence = structure["ctrl_convergence"]
+    return res
+
+
+def _line_data(structure, source, wcc, index):
+    """
+    Creates the data of a line, where the bulk array is loaded when it is first accessed.
+    """
+    cls, array_attr = next(
+        (cls, attr) for cls, name, attr in _LINE_DATA_TYPES if name == structure["data"]
+    )
+    if cls is WccLineData:
+        return WccLineData(wcc)
+    if cls is WilsonLineData:
+        # the Wilson loop is small, and is needed to compute any derived
+        # quantity other than the WCC
+        return WilsonLineData(source[f"{array_attr}_{index}"])
+    return cls._from_file(  # pylint: disable=protected-access
+        wcc, source.lazy(f"{array_attr}_{index}"), unitarize=structure["unitarize"]
+    )
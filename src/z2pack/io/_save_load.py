@@ -1,13 +1,53 @@
 """Defines functions for saving and loading Z2Pack objects."""
 
+import os
+
 from fsc.iohelper import SerializerDispatch
 
-from . import _encoding
+from . import _encoding, _npz
 
 __all__ = ["save", "load"]
 
 IO_HANDLER = SerializerDispatch(_encoding)
 
-# pylint: disable=invalid-name
-save = IO_HANDLER.save
-load = IO_HANDLER.load
+
+def _is_npz(file_path, serializer):
+    """
+    Determines whether the binary ``npz`` format is used for the given file and serializer.
+    """
+    if serializer == "auto":
+        return os.path.splitext(file_path)[1].lower() == ".npz"
+    return serializer == "npz"
+
+
+def save(obj, file_path, serializer="auto"):
+    """
+    Saves an object to the file given in ``file_path``. The saving is made atomic (on systems where :py:func:`os.replace` is atomic) by first creating a temporary file and then moving to the ``file_path``.
+
+    :param obj:         Object to be saved.
+
+    :param file_path:   Path to the file.
+    :type file_path:    str
+
+    :param serializer:  The serializer to be used. Valid options are :py:mod:`msgpack`, :py:mod:`json`, :py:mod:`pickle` and ``'npz'``. The ``'npz'`` format stores line, surface and volume results as typed arrays in a ``.npz`` file, which can be loaded lazily. By default, the serializer is determined from the file extension. If this does not work, :py:mod:`json` is used to avoid data loss.
+    :type serializer:   module
+    """
+    if _is_npz(file_path, serializer):
+        _npz.save(obj, file_path)
+    else:
+        IO_HANDLER.save(obj, file_path, serializer=serializer)
+
+
+def load(file_path, serializer="auto"):
+    """
+    Loads the object that was saved to ``file_path``. For the ``'npz'`` format, the eigenstates, overlap matrices and Wilson loops of the lines are read from the file only when they are first accessed.
+
+    :param file_path:   Path to the file.
+    :type file_path:    str
+
+    :param serializer:  The serializer which should be used to load the result. By default, is deduced from the file extension. If no serializer is given and it cannot be deduced from the file ending, a :py:class:`ValueError` is raised, to avoid loading corrupted data.
+    :type serializer:   module
+    """
+    if _is_npz(file_path, serializer):
+        return _npz.load(file_path)
+    return IO_HANDLER.load(file_path, serializer=serializer)
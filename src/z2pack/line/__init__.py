@@ -4,8 +4,10 @@ import logging as _logging
 
 _LOGGER = _logging.getLogger(__name__)
 
-from ._data import EigenstateLineData, OverlapLineData, WccLineData
+from ._data import EigenstateLineData, OverlapLineData, WccLineData, WilsonLineData
+from ._iterator import nested_iterator
 from ._result import LineResult
 from ._run import run_line as run
 
-__all__ = ["run"] + _data.__all__ + _result.__all__  # pylint: disable=undefined-variable
+# pylint: disable=undefined-variable
+__all__ = ["run"] + _data.__all__ + _iterator.__all__ + _result.__all__
@@ -1,5 +1,7 @@
 """Control objects for line calculations."""
 
+import numpy as np
+
 from .._control import (
     ControlContainer,
     ConvergenceControl,
@@ -15,6 +17,7 @@ __all__ = [
     "StepCounter",
     "ForceFirstUpdate",
     "PosCheck",
+    "ExtrapolationCheck",
 ]
 
 
@@ -43,6 +46,7 @@ class StepCounter(IterationControl, StatefulControl, LineControl):
         super().__init__()
         self._iterator = iter(iterator)
         self._state = 0
+        self._min_steps = 0
 
     @property
     def state(self):
@@ -52,10 +56,21 @@ class StepCounter(IterationControl, StatefulControl, LineControl):
     def state(self, state):
         self._state = state
 
+    def skip_to(self, num_steps):
+        """
+        Skips the values of the iterator which are smaller than ``num_steps``. If the iterator stops before reaching ``num_steps``, its last value is used instead.
+        """
+        self._min_steps = num_steps
+
     def __next__(self):
         new_val = next(self._iterator)
         while new_val <= self._state:
             new_val = next(self._iterator)
+        while new_val < self._min_steps:
+            try:
+                new_val = next(self._iterator)
+            except StopIteration:
+                break
         self._state = new_val
         return dict(num_steps=self._state)
 
@@ -117,14 +132,82 @@ class PosCheck(
         self.last_wcc = state["last_wcc"]
 
 
-def _create_line_controls(*, pos_tol, iterator):
+class ExtrapolationCheck(
+    DataControl,
+    ConvergenceControl,
+    StatefulControl,
+    LineControl,
+):
+    r"""
+    Check the convergence of the WCC by extrapolating them to an infinite number of k-points. The discretization error of the WCC is assumed to scale as :math:`(N - 1)^{-2}`, where :math:`N` is the number of k-points on the line. From the WCC of the last two calculations, the distance of the current WCC to the Richardson extrapolation :math:`N \rightarrow \infty` is estimated, and the check passes when this error estimate is below ``pos_tol``. If a ``step_counter`` is given, the values of the iterator which are predicted to be too small to reach the tolerance are skipped.
+
+    :param pos_tol: Tolerance in the estimated error of a single WCC position.
+    :type pos_tol: float
+
+    :param step_counter: Control which determines the number of k-points on the line.
+    :type step_counter: StepCounter
+    """
+
+    def __init__(self, *, pos_tol, step_counter):
+        super().__init__()
+        if not 0 < pos_tol <= 1:
+            raise ValueError("pos_tol must be in (0, 1]")
+        self.pos_tol = pos_tol
+        self._step_counter = step_counter
+        self.error_estimate = None
+        self.last_wcc = None
+        self.last_num_steps = None
+
+    def update(self, data):
+        new_wcc = data.wcc
+        num_steps = self._step_counter.state
+        if self.last_wcc is not None and num_steps > self.last_num_steps:
+            h_old = 1 / (self.last_num_steps - 1)
+            h_new = 1 / (num_steps - 1)
+            # distance between the current WCC and the Richardson extrapolation
+            self.error_estimate = (
+                _get_max_move(new_wcc, self.last_wcc) * h_new**2 / (h_old**2 - h_new**2)
+            )
+            if not self.converged:
+                # predict the number of k-points needed to reach the tolerance,
+                # with a safety factor of 10%
+                h_needed = h_new * np.sqrt(0.9 * self.pos_tol / self.error_estimate)
+                self._step_counter.skip_to(int(np.ceil(1 / h_needed)) + 1)
+        self.last_wcc = new_wcc
+        self.last_num_steps = num_steps
+
+    @property
+    def converged(self):
+        if self.error_estimate is None:
+            return False
+        return self.error_estimate < self.pos_tol
+
+    @property
+    def state(self):
+        return dict(
+            error_estimate=self.error_estimate,
+            last_wcc=self.last_wcc,
+            last_num_steps=self.last_num_steps,
+        )
+
+    @state.setter
+    def state(self, state):
+        self.error_estimate = state["error_estimate"]
+        self.last_wcc = state["last_wcc"]
+        self.last_num_steps = state["last_num_steps"]
+
+
+def _create_line_controls(*, pos_tol, iterator, extrapolate=False):
     """
     Helper function to create all controls needed by a Line calculation.
     """
     controls = []
-    controls.append(StepCounter(iterator=iterator))
+    step_counter = StepCounter(iterator=iterator)
+    controls.append(step_counter)
     if pos_tol is None:
         controls.append(ForceFirstUpdate())
+    elif extrapolate:
+        controls.append(ExtrapolationCheck(pos_tol=pos_tol, step_counter=step_counter))
     else:
         controls.append(PosCheck(pos_tol=pos_tol))
     return controls
@@ -12,6 +12,7 @@ __all__ = [
     "WccLineData",
     "OverlapLineData",
     "EigenstateLineData",
+    "WilsonLineData",
 ]
 
 
@@ -32,6 +33,14 @@ class _LazyProperty:
         return value
 
 
+class _Deferred:
+    """Stands in for the eigenstates or overlap matrices passed to the data container, if they are loaded only when they are first accessed, using the ``loader`` function. The WCC are known already. This is used to load results lazily from file."""
+
+    def __init__(self, wcc, loader):
+        self.wcc = wcc
+        self.loader = loader
+
+
 class WccLineData(metaclass=ConstLocker):
     """Data container for a line constructed directly from the WCC. The following attributes and properties can be accessed:
 
@@ -68,7 +77,13 @@ class WccLineData(metaclass=ConstLocker):
             self.gap_pos, self.gap_size = _gapfind(self.wcc)
 
     def __getattr__(self, name):
-        """Forward to parent class unless for the 'eigenstates' attribute, in which case an AttributError is raised."""
+        """Load the attribute if it has a loader, otherwise forward to parent class unless for the 'eigenstates' attribute, in which case an AttributError is raised."""
+        loaders = self.__dict__.get("_loaders", {})
+        if name in loaders:
+            value = loaders[name]()
+            with change_lock(self, "none"):
+                setattr(self, name, value)
+            return value
         if name == "eigenstates":
             raise AttributeError(
                 "This data does not have the 'eigenstates' attribute. This is because the system used does not provide eigenstates, but only overlap matrices. The functionality which resulted in this error can be used only for systems providing eigenstates."
@@ -83,10 +98,27 @@ class OverlapLineData(WccLineData):
     * ``overlaps`` : A list containing the overlap matrix for each step of k-points, as numpy array.
     * ``wilson`` : An array containing the Wilson loop (product of overlap matrices) for the line. The Wilson loop is given in the basis of the eigenstates at the start / end of the line.
     * ``wilson_eigenstates`` : Eigenstates of the Wilson loop, given as a list of 1D - arrays.
+
+    If ``unitarize=True``, each overlap matrix is replaced by the closest unitary matrix (computed from its singular value decomposition) before the Wilson loop is computed, and the product is evaluated pairwise in a tree. This corresponds to the parallel transport of the states along the line, and reduces the discretization error of the WCC for coarse k-point strings.
     """
 
-    def __init__(self, overlaps):  # pylint: disable=super-init-not-called
-        self.overlaps = [np.array(o, dtype=complex) for o in overlaps]
+    # default for (pickled) results created by older versions
+    unitarize = False
+
+    def __init__(self, overlaps, *, unitarize=False):  # pylint: disable=super-init-not-called
+        if isinstance(overlaps, _Deferred):
+            self.wcc = overlaps.wcc
+            self._loaders = {"overlaps": overlaps.loader}
+        else:
+            self.overlaps = [np.array(o, dtype=complex) for o in overlaps]
+        self.unitarize = unitarize
+
+    @classmethod
+    def _from_file(cls, wcc, loader, *, unitarize=False):
+        """
+        Creates the data container from the WCC, where the overlap matrices (or eigenstates) are loaded only when they are first accessed, using the ``loader`` function.
+        """
+        return cls(_Deferred(wcc, loader), unitarize=unitarize)
 
     def _calculate_wannier(self):
         """
@@ -110,6 +142,8 @@ class OverlapLineData(WccLineData):
     @_LazyProperty
     def wilson(self):
         """Wilson loop along the line."""
+        if self.unitarize:
+            return _tree_product(_unitarize(self.overlaps))
         # create overlaps
         return functools.reduce(np.dot, self.overlaps)
 
@@ -130,12 +164,85 @@ class EigenstateLineData(OverlapLineData):
     * ``eigenstates`` : The eigenstates of the Hamiltonian, given as a list of arrays which contain the eigenstates as row vectors.
     """
 
-    def __init__(self, eigenstates):  # pylint: disable=super-init-not-called
-        self.eigenstates = eigenstates
+    def __init__(self, eigenstates, *, unitarize=False):  # pylint: disable=super-init-not-called
+        if isinstance(eigenstates, _Deferred):
+            self.wcc = eigenstates.wcc
+            self._loaders = {"eigenstates": eigenstates.loader}
+        else:
+            self.eigenstates = eigenstates
+        self.unitarize = unitarize
 
     @_LazyProperty
     def overlaps(self):  # pylint: disable=method-hidden,missing-function-docstring
+        return [_overlap(eig1, eig2) for eig1, eig2 in zip(self.eigenstates, self.eigenstates[1:])]
+
+
+class WilsonLineData(OverlapLineData):
+    r"""
+    Data container for a line which keeps only the Wilson loop, instead of the eigenstates or overlap matrices along the line. This has all attributes that :class:`OverlapLineData` has, except for ``overlaps``. It is created by the streaming mode of the line calculation, where the eigenstates of a k-point string are requested in chunks and only their overlap matrices are kept, and for lines which are reduced with ``keep_data='wilson'``. The size of the stored data does not grow with the number of k-points.
+    """
+
+    def __init__(self, wilson):  # pylint: disable=super-init-not-called
+        wilson = np.asarray(wilson)
+        # a Wilson loop in single precision is kept, for compact results
+        self.wilson = wilson.astype(np.result_type(wilson.dtype, np.complex64))
+
+    @classmethod
+    def from_eigenstates(cls, eigenstates, *, unitarize=False):
+        """
+        Creates the data container by consuming the eigenstates (given as an iterable of arrays which contain the eigenstates as row vectors) pairwise, such that only their overlap matrices are kept. The Wilson loop is then computed as in :meth:`from_overlaps`.
+        """
+        eigenstates = iter(eigenstates)
+        eig_prev = np.array(next(eigenstates))
         overlaps = []
-        for eig1, eig2 in zip(self.eigenstates, self.eigenstates[1:]):
-            overlaps.append(np.dot(np.conjugate(eig1), np.array(eig2).T))
-        return overlaps
+        for eig in eigenstates:
+            eig = np.array(eig)
+            overlaps.append(_overlap(eig_prev, eig))
+            eig_prev = eig
+        return cls.from_overlaps(overlaps, unitarize=unitarize)
+
+    @classmethod
+    def from_overlaps(cls, overlaps, *, unitarize=False):
+        """
+        Creates the data container from an iterable of overlap matrices. If ``unitarize=True``, each overlap matrix is replaced by the closest unitary matrix.
+        """
+        overlaps = [np.array(o, dtype=complex) for o in overlaps]
+        if unitarize:
+            return cls(_tree_product(_unitarize(overlaps)))
+        return cls(functools.reduce(np.dot, overlaps))
+
+    def __getattr__(self, name):
+        """Forward to parent class unless for the 'eigenstates' or 'overlaps' attributes, in which case an AttributError is raised."""
+        if name in ["eigenstates", "overlaps"]:
+            raise AttributeError(
+                f"This data does not have the '{name}' attribute, because only the Wilson loop was kept for this line (with 'streaming=True' or keep_data='wilson')."
+            )
+        return super().__getattr__(name)
+
+
+def _overlap(eig1, eig2):
+    """
+    Returns the overlap matrix between two sets of eigenstates, which are given as row vectors.
+    """
+    return np.dot(np.conjugate(eig1), np.array(eig2).T)
+
+
+def _unitarize(matrices):
+    """
+    Returns the closest unitary matrices (w.r.t. the Frobenius norm) to the given square matrices, computed from their singular value decomposition for all matrices at once.
+    """
+    u_mat, _, vh_mat = np.linalg.svd(np.array(matrices, dtype=complex))
+    return u_mat @ vh_mat
+
+
+def _tree_product(matrices):
+    """
+    Computes the ordered product of a stack of matrices by multiplying neighbouring pairs, such that the number of sequential multiplications grows only logarithmically with the number of matrices.
+    """
+    matrices = np.array(matrices)
+    while len(matrices) > 1:
+        paired = matrices[0:-1:2] @ matrices[1::2]
+        if len(matrices) % 2:
+            paired = np.concatenate([paired, matrices[-1:]])
+        matrices = paired
+    return matrices[0]
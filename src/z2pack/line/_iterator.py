@@ -0,0 +1,35 @@
+"""Defines helpers for creating the ``iterator`` input of line calculations."""
+
+__all__ = ["nested_iterator"]
+
+
+def nested_iterator(start=9, stop=65):
+    r"""
+    Creates a sequence of k-point numbers :math:`N, 2N - 1, 4N - 3, \dots` for which each k-point string contains all k-points of the previous one. When it is used as the ``iterator`` of a calculation with a :class:`.EigenstateSystem`, the eigenstates of the previous string are re-used, and only the new midpoints are calculated in each iteration.
+
+    :param start:   Number of k-points in the first string.
+    :type start:    int
+
+    :param stop:    Maximum number of k-points in a string.
+    :type stop:     int
+
+    :returns:   :py:class:`list` of :py:class:`int`
+
+    Example usage:
+
+    .. code:: python
+
+        result = z2pack.line.run(
+            system=system, # Refer to the various ways of creating a System instance.
+            line=lambda t: [t, 0, 0],
+            iterator=z2pack.line.nested_iterator(start=9, stop=65)
+        )
+    """
+    if start < 2:
+        raise ValueError(f"Invalid value '{start}' for 'start', must be at least 2.")
+    res = []
+    num_steps = start
+    while num_steps <= stop:
+        res.append(num_steps)
+        num_steps = 2 * num_steps - 1
+    return res
@@ -2,14 +2,23 @@
 """Defines the functions to run a line calculation."""
 
 import contextlib
+import functools
 
 import numpy as np
 
-from . import _LOGGER, EigenstateLineData, LineResult, OverlapLineData
+from . import (
+    _LOGGER,
+    EigenstateLineData,
+    LineResult,
+    OverlapLineData,
+    WccLineData,
+    WilsonLineData,
+)
 from .. import io
 from .._logging_tools import TagAdapter
-from .._run_utils import _check_save_dir, _load_init_result, _log_run
+from .._run_utils import _check_keep_data, _check_save_dir, _load_init_result, _log_run
 from ._control import LineControlContainer, _create_line_controls
+from ._data import _overlap
 
 __all__ = ["run_line"]
 
@@ -23,6 +32,10 @@ _LINE_ONLY_LOGGER = TagAdapter(
 )
 _LOGGER = TagAdapter(_LOGGER, default_tags=("line",))
 
+# number of k-points for which the eigenstates are requested at once in the
+# streaming mode
+_STREAMING_CHUNK_SIZE = 8
+
 
 @_log_run(_LINE_ONLY_LOGGER)
 def run_line(
@@ -36,6 +49,11 @@ def run_line(
     load=False,
     load_quiet=True,
     serializer="auto",
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+    extrapolate=False,
 ):
     r"""
     Calculates the Wannier charge centers for a given system and line, automatically converging w.r.t. the number of k-points along the line.
@@ -48,6 +66,9 @@ def run_line(
     :param pos_tol:     The maximum movement of a WCC for the iteration w.r.t. the number of k-points in a single string to converge. The iteration can be turned off by setting ``pos_tol=None``.
     :type pos_tol:      float
 
+    :param extrapolate: If ``True``, the convergence of the WCC along each line is checked by extrapolating them to an infinite number of k-points, instead of comparing the WCC of two consecutive iterations. Values of the ``iterator`` which are predicted to be insufficient for reaching ``pos_tol`` are skipped. The discretization error of the WCC is assumed to scale as :math:`(N - 1)^{-2}` with the number of k-points :math:`N`.
+    :type extrapolate:  bool
+
     :param iterator:    Generator for the number of points in a k-point string. The iterator should also take care of the maximum number of iterations. It is needed even when ``pos_tol=None``, to provide a starting value.
 
     :param save_file:   Path to a file where the result should be stored.
@@ -62,9 +83,21 @@ def run_line(
     :param load_quiet:  Determines whether errors / inexistent files are ignored when loading from ``save_file``
     :type load_quiet:   bool
 
-    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json` and :py:mod:`pickle`. By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, ``msgpack`` is used.
+    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json`, :py:mod:`pickle` and ``'npz'`` (see :func:`z2pack.io.save`). By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, ``msgpack`` is used.
     :type serializer:   module
 
+    :param streaming:   If ``True``, only the Wilson loop is kept for each line (as :class:`.WilsonLineData`), and the eigenstates of a k-point string are never held at once. For systems which compute the k-points independently (``independent_kpoints``, such as :class:`.hm.System`), the eigenstates are requested in chunks of a few k-points, and only their overlap matrices are kept. The peak memory is then bounded by the eigenstates of one chunk. Other systems are called with the full k-point strings, such that only the stored result is reduced. The eigenstates are not re-used on nested k-point grids in this mode.
+    :type streaming:    bool
+
+    :param keep_data:   Determines which data is kept for each line once it has converged. With ``'all'``, the full data (eigenstates or overlap matrices) is kept. With ``'wilson'``, only the Wilson loop is kept (as :class:`.WilsonLineData`), from which the WCC and ``wilson_eigenstates`` are computed. With ``'wcc'``, only the WCC are kept (as :class:`.WccLineData`), which gives access to ``wcc``, ``pol``, ``gap_pos`` and ``gap_size``. In contrast to ``streaming``, the full data is still used while the line is being converged. The reduced data makes the result much smaller in memory and on file.
+    :type keep_data:    str
+
+    :param reduced_precision:   If ``True``, the Wilson loop kept with ``keep_data='wilson'`` is stored in single precision. This halves its size, but changes the WCC computed from it at the level of :math:`10^{-7}`.
+    :type reduced_precision:    bool
+
+    :param unitarize:   If ``True``, each overlap matrix is replaced by the closest unitary matrix before computing the Wilson loop, which reduces the discretization error of the WCC for coarse k-point strings. See :class:`.OverlapLineData` for details.
+    :type unitarize:    bool
+
     :returns:   :class:`LineResult` instance.
 
     Example usage:
@@ -81,7 +114,7 @@ def run_line(
     """
 
     # setting up controls
-    controls = _create_line_controls(pos_tol=pos_tol, iterator=iterator)
+    controls = _create_line_controls(pos_tol=pos_tol, iterator=iterator, extrapolate=extrapolate)
 
     # setting up init_result
     init_result = _load_init_result(
@@ -93,6 +126,7 @@ def run_line(
         valid_type=LineResult,
     )
     _check_save_dir(save_file=save_file)
+    _check_keep_data(keep_data=keep_data, reduced_precision=reduced_precision)
 
     return _run_line_impl(
         *controls,
@@ -100,10 +134,25 @@ def run_line(
         line=line,
         save_file=save_file,
         init_result=init_result,
+        streaming=streaming,
+        keep_data=keep_data,
+        reduced_precision=reduced_precision,
+        unitarize=unitarize,
     )
 
 
-def _run_line_impl(*controls, system, line, save_file=None, init_result=None, serializer="auto"):
+def _run_line_impl(
+    *controls,
+    system,
+    line,
+    save_file=None,
+    init_result=None,
+    serializer="auto",
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+):
     """
     Implementation of the line's run.
 
@@ -112,15 +161,94 @@ def _run_line_impl(*controls, system, line, save_file=None, init_result=None, se
 
     The other parameters are the same as for :meth:`.run`.
     """
-    # check if the line function is closed (up to an inverse lattice vector)
-    delta = np.array(line(1)) - np.array(line(0))
-    if not np.isclose(np.round(delta), delta).all():
-        raise ValueError(
-            "Start and end points of the line differ by {}, which is not an inverse lattice vector.".format(
-                delta
-            )
-        )
+    system_fct = system.get_eig if hasattr(system, "get_eig") else system.get_mmn
+    return _evaluate(
+        _line_steps(
+            *controls,
+            system=system,
+            line=line,
+            save_file=save_file,
+            init_result=init_result,
+            serializer=serializer,
+            streaming=streaming,
+            keep_data=keep_data,
+            reduced_precision=reduced_precision,
+            unitarize=unitarize,
+        ),
+        system_fct,
+    )
+
+
+def _get_batch_fct(system):
+    """
+    Returns the method of the system which computes several k-point strings at once, or ``None`` if the system does not support it.
+    """
+    if not getattr(system, "supports_batch", False):
+        return None
+    if hasattr(system, "get_eig"):
+        return system.get_eig_batch
+    return system.get_mmn_batch
+
+
+def _evaluate(steps, system_fct):
+    """
+    Runs the line calculation given by the ``steps`` generator, computing each of the k-point strings it yields with ``system_fct``. Returns the result of the calculation.
+    """
+    try:
+        kpt = next(steps)
+        while True:
+            kpt = steps.send(system_fct(kpt))
+    except StopIteration as stop:
+        return stop.value
+
+
+def _evaluate_batch(steps_list, batch_fct):
+    """
+    Generator which runs several line calculations in lock-step, where the k-point strings yielded by all unfinished ``steps`` generators are computed in a single call to ``batch_fct``. The results of the calculations are yielded in the order of ``steps_list``, each as soon as it and the ones before it have finished.
+    """
+    results = {}
+    pending = {}
+    for i, steps in enumerate(steps_list):
+        try:
+            pending[i] = next(steps)
+        except StopIteration as stop:
+            results[i] = stop.value
+
+    num_done = 0
+    while True:
+        while num_done in results:
+            yield results.pop(num_done)
+            num_done += 1
+        if not pending:
+            return
+        states_list = batch_fct(list(pending.values()))
+        new_pending = {}
+        for i, states in zip(pending, states_list):
+            try:
+                new_pending[i] = steps_list[i].send(states)
+            except StopIteration as stop:
+                results[i] = stop.value
+        pending = new_pending
+
 
+def _line_steps(
+    *controls,
+    system,
+    line,
+    save_file=None,
+    init_result=None,
+    serializer="auto",
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+):
+    """
+    Generator which performs the line calculation. It yields the k-point strings which need to be computed, and expects the corresponding eigenstates or overlaps to be sent back. The result of the calculation is given as the return value of the generator.
+
+    The parameters are the same as for :func:`_run_line_impl`.
+    """
+    _check_closed(line)
     ctrl_container = LineControlContainer(controls)
 
     def save():
@@ -128,51 +256,39 @@ def _run_line_impl(*controls, system, line, save_file=None, init_result=None, se
             _LOGGER.info(f"Saving line result to file {save_file}")
             io.save(result, save_file, serializer=serializer)
 
+    def finish():
+        """
+        Reduces the data of the result according to the ``keep_data`` policy, and returns the result.
+        """
+        nonlocal result
+        if keep_data != "all":
+            result = LineResult(
+                _reduce_data(result.data, keep_data=keep_data, reduced_precision=reduced_precision),
+                ctrl_container.stateful,
+                ctrl_container.convergence,
+            )
+            save()
+        return result
+
     # initialize stateful and data controls from old result
     if init_result is not None:
-        for d_ctrl in ctrl_container.data:
-            # not necessary for StatefulControls
-            if d_ctrl not in ctrl_container.stateful:
-                d_ctrl.update(init_result.data)
-        for s_ctrl in ctrl_container.stateful:
-            with contextlib.suppress(KeyError):
-                s_ctrl.state = init_result.ctrl_states[s_ctrl.__class__.__name__]
+        _init_controls(ctrl_container, init_result)
         result = LineResult(init_result.data, ctrl_container.stateful, ctrl_container.convergence)
         save()
 
-    # Detect which type of System is active
-    if hasattr(system, "get_eig"):
-        data_type = EigenstateLineData
-        system_fct = system.get_eig
-    else:
-        data_type = OverlapLineData
-        system_fct = system.get_mmn
-
-    def collect_convergence():
-        """Collect convergence control results."""
-        res = [c_ctrl.converged for c_ctrl in ctrl_container.convergence]
-        _LINE_ONLY_LOGGER.info(f"{sum(res)} of {len(res)} line convergence criteria fulfilled.")
-        return res
+    compute_data = _get_compute_fct(system, streaming=streaming, unitarize=unitarize)
+
+    # data of the previous iteration, used to re-use eigenstates on nested k-point grids
+    data = None
 
     # main loop
-    while not all(collect_convergence()):
-        run_options = {}
-        for it_ctrl in ctrl_container.iteration:
-            try:
-                run_options.update(next(it_ctrl))
-                _LOGGER.info(
-                    f"Calculating line for N = {run_options['num_steps']}",
-                    tags=("offset",),
-                )
-            except StopIteration:
-                _LOGGER.warning("Iterator stopped before the calculation could converge.")
-                return result
-
-        data = data_type(
-            system_fct(
-                list(np.array(line(k)) for k in np.linspace(0.0, 1.0, run_options["num_steps"]))
-            )
-        )
+    while not all(_collect_convergence(ctrl_container)):
+        num_steps = _next_num_steps(ctrl_container)
+        if num_steps is None:
+            return finish()
+
+        kpt = list(np.array(line(k)) for k in np.linspace(0.0, 1.0, num_steps))
+        data = yield from compute_data(kpt, data)
 
         for d_ctrl in ctrl_container.data:
             d_ctrl.update(data)
@@ -180,4 +296,166 @@ def _run_line_impl(*controls, system, line, save_file=None, init_result=None, se
         result = LineResult(data, ctrl_container.stateful, ctrl_container.convergence)
         save()
 
-    return result
+    return finish()
+
+
+def _check_closed(line):
+    """
+    Checks that the line function is closed, up to an inverse lattice vector.
+    """
+    delta = np.array(line(1)) - np.array(line(0))
+    if not np.isclose(np.round(delta), delta).all():
+        raise ValueError(
+            "Start and end points of the line differ by {}, which is not an inverse lattice vector.".format(
+                delta
+            )
+        )
+
+
+def _init_controls(ctrl_container, init_result):
+    """
+    Initializes the stateful and data controls from the initial result.
+    """
+    for d_ctrl in ctrl_container.data:
+        # not necessary for StatefulControls
+        if d_ctrl not in ctrl_container.stateful:
+            d_ctrl.update(init_result.data)
+    for s_ctrl in ctrl_container.stateful:
+        with contextlib.suppress(KeyError):
+            s_ctrl.state = init_result.ctrl_states[s_ctrl.__class__.__name__]
+
+
+def _get_compute_fct(system, *, streaming, unitarize):
+    """
+    Returns the generator function which computes the line data for a k-point string, given the data of the previous iteration (see :func:`_compute_data`).
+    """
+    # eigenstates are requested for parts of a k-point string only if the
+    # system can compute the k-points without the rest of the string
+    independent = hasattr(system, "get_eig") and getattr(system, "independent_kpoints", False)
+    if streaming:
+        if hasattr(system, "get_eig"):
+            get_overlaps = functools.partial(
+                _stream_overlaps, chunk_size=_STREAMING_CHUNK_SIZE if independent else None
+            )
+        else:
+            get_overlaps = _get_overlaps
+        return functools.partial(_compute_wilson, get_overlaps=get_overlaps, unitarize=unitarize)
+    if hasattr(system, "get_eig"):
+        # the eigenstates are re-used on nested k-point grids
+        return functools.partial(
+            _compute_data, data_type=EigenstateLineData, unitarize=unitarize, refine=independent
+        )
+    return functools.partial(_compute_data, data_type=OverlapLineData, unitarize=unitarize)
+
+
+def _collect_convergence(ctrl_container):
+    """Collect convergence control results."""
+    res = [c_ctrl.converged for c_ctrl in ctrl_container.convergence]
+    _LINE_ONLY_LOGGER.info(f"{sum(res)} of {len(res)} line convergence criteria fulfilled.")
+    return res
+
+
+def _next_num_steps(ctrl_container):
+    """
+    Returns the number of k-points for the next iteration, or ``None`` if an iterator stopped.
+    """
+    run_options = {}
+    for it_ctrl in ctrl_container.iteration:
+        try:
+            run_options.update(next(it_ctrl))
+            _LOGGER.info(
+                f"Calculating line for N = {run_options['num_steps']}",
+                tags=("offset",),
+            )
+        except StopIteration:
+            _LOGGER.warning("Iterator stopped before the calculation could converge.")
+            return None
+    return run_options["num_steps"]
+
+
+def _compute_data(kpt, previous_data, *, data_type, unitarize, refine=False):
+    """
+    Generator which computes the line data for the k-point string ``kpt``, by yielding the k-points which need to be computed. If ``refine=True``, the eigenstates of the previous iteration are re-used on nested k-point grids.
+    """
+    eigenstates = None
+    if refine and previous_data is not None:
+        eigenstates = yield from _refine_eigenstates(kpt, previous_data.eigenstates)
+    if eigenstates is None:
+        return data_type((yield kpt), unitarize=unitarize)
+    return data_type(eigenstates, unitarize=unitarize)
+
+
+def _compute_wilson(kpt, _previous_data, *, get_overlaps, unitarize):
+    """
+    Generator which computes the line data for the k-point string ``kpt`` in the streaming mode, where only the Wilson loop is kept. The overlap matrices are computed by the ``get_overlaps`` generator function.
+    """
+    overlaps = yield from get_overlaps(kpt)
+    return WilsonLineData.from_overlaps(overlaps, unitarize=unitarize)
+
+
+def _get_overlaps(kpt):
+    """
+    Generator which computes the overlap matrices for the k-point string ``kpt``.
+    """
+    return (yield kpt)
+
+
+def _stream_overlaps(kpt, *, chunk_size):
+    """
+    Generator which computes the overlap matrices for the k-point string ``kpt``, by requesting the eigenstates in chunks of ``chunk_size`` k-points. Only the eigenstates of the current chunk are kept. Each chunk is closed trivially, except for the first one which is closed by the end point of the string. If ``chunk_size`` is ``None``, the whole string is requested at once.
+    """
+    num_kpt = len(kpt) - 1
+    chunk_size = chunk_size or num_kpt
+    overlaps = []
+    eig_prev = None
+    eig_end = None
+    for start in range(0, num_kpt, chunk_size):
+        chunk = kpt[start : start + chunk_size]
+        if start == 0:
+            eigenstates = yield chunk + kpt[-1:]
+            eig_end = np.array(eigenstates[-1])
+        else:
+            eigenstates = yield chunk + chunk[:1]
+        for eig in eigenstates[:-1]:
+            eig = np.array(eig)
+            if eig_prev is not None:
+                overlaps.append(_overlap(eig_prev, eig))
+            eig_prev = eig
+        del eigenstates
+    overlaps.append(_overlap(eig_prev, eig_end))
+    return overlaps
+
+
+def _reduce_data(data, *, keep_data, reduced_precision):
+    """
+    Returns the reduced data which is kept for a line, according to the ``keep_data`` policy. Data which is reduced further already, e.g. from an ``init_result`` computed with ``keep_data='wcc'``, is left as it is.
+    """
+    if not isinstance(data, OverlapLineData):
+        return data
+    if keep_data == "wcc":
+        return WccLineData(data.wcc)
+    if keep_data == "wilson":
+        return WilsonLineData(
+            np.array(data.wilson, dtype=np.complex64 if reduced_precision else complex)
+        )
+    return data
+
+
+def _refine_eigenstates(kpt, eigenstates):
+    """
+    Generator which computes the eigenstates for the k-points ``kpt``, re-using the ``eigenstates`` of a coarser k-point string on the same line. Only the eigenstates at the new k-points are requested, by yielding them as a list of k-points which is closed trivially. This requires a system which computes the k-points independently (``independent_kpoints``). The eigenstates are given as the return value, or ``None`` if the coarser string is not contained in the new one.
+    """
+    num_old = len(eigenstates)
+    num_new = len(kpt)
+    if num_old < 2 or num_new <= num_old or (num_new - 1) % (num_old - 1) != 0:
+        return None
+    stride = (num_new - 1) // (num_old - 1)
+    _LOGGER.info(f"Re-using {num_old} eigenstates from the previous iteration.")
+
+    new_kpt = [k for i, k in enumerate(kpt) if i % stride != 0]
+    # close the string trivially, since the last k-point is not computed explicitly
+    new_eigenstates = iter((yield new_kpt + new_kpt[:1])[:-1])
+    return [
+        eigenstates[i // stride] if i % stride == 0 else next(new_eigenstates)
+        for i in range(num_new)
+    ]
@@ -79,11 +79,11 @@ class GapCheck(DataControl, ConvergenceControl, SurfaceControl):
         ]
 
 
-def _create_surface_controls(*, pos_tol, iterator, move_tol, gap_tol):
+def _create_surface_controls(*, pos_tol, iterator, move_tol, gap_tol, extrapolate=False):
     """
     Helper function to create the control objects needed by a surface calculation.
     """
-    controls = _create_line_controls(pos_tol=pos_tol, iterator=iterator)
+    controls = _create_line_controls(pos_tol=pos_tol, iterator=iterator, extrapolate=extrapolate)
     if move_tol is not None:
         controls.append(MoveCheck(move_tol=move_tol))
     if gap_tol is not None:
@@ -36,8 +36,18 @@ class SurfaceData(metaclass=ConstLocker):
 
         :param result:  Result of the line calculation.
         :type result:   :class:`.LineResult`
+
+        :returns:   The :class:`LinePosition` of the new line.
+        """
+        position = LinePosition(t, result)
+        self.lines.add(position)
+        return position
+
+    def __copy__(self):
+        """
+        Returns a copy which has its own list of lines, but shares the line results with this instance. The line results are not changed after they are added, so the copy is not affected by lines which are added to or replaced in this instance.
         """
-        self.lines.add(LinePosition(t, result))
+        return SurfaceData(LinePosition(line.t, line.result) for line in self.lines)
 
     def __getattr__(self, key):
         if key != "lines":
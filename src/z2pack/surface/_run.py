@@ -2,15 +2,21 @@
 
 import contextlib
 import copy
+import functools
 import logging
 
 import numpy as np
 
 from . import _LOGGER, SurfaceData, SurfaceResult
-from .. import io
-from .._async_handler import AsyncHandler
 from .._logging_tools import TagAdapter, TagFilter, filter_manager
-from .._run_utils import _check_save_dir, _load_init_result, _log_run
+from .._run_utils import (
+    _check_keep_data,
+    _check_save_dir,
+    _get_saver,
+    _load_init_result,
+    _log_run,
+    _save_result,
+)
 from ..line import _run as _line_run
 from ._control import SurfaceControlContainer, _create_surface_controls
 
@@ -28,7 +34,7 @@ _LOGGER = TagAdapter(_LOGGER, default_tags=("surface",))
 
 
 @_log_run(_SURFACE_ONLY_LOGGER)
-def run_surface(
+def run_surface(  # pylint: disable=too-many-locals
     *,
     system,
     surface,
@@ -43,6 +49,13 @@ def run_surface(
     load=False,
     load_quiet=True,
     serializer="auto",
+    journal=False,
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+    extrapolate=False,
+    executor=None,
 ):
     r"""
     Calculates the Wannier charge centers for a given system and surface.
@@ -60,6 +73,9 @@ def run_surface(
     :param pos_tol:     The maximum movement of a WCC for the iteration w.r.t. the number of k-points in a single string to converge. The iteration can be turned off by setting ``pos_tol=None``.
     :type pos_tol:      float
 
+    :param extrapolate: If ``True``, the convergence of the WCC along each line is checked by extrapolating them to an infinite number of k-points, instead of comparing the WCC of two consecutive iterations. Values of the ``iterator`` which are predicted to be insufficient for reaching ``pos_tol`` are skipped. The discretization error of the WCC is assumed to scale as :math:`(N - 1)^{-2}` with the number of k-points :math:`N`.
+    :type extrapolate:  bool
+
     :param gap_tol:     Determines the smallest distance between a gap and its neighbouring WCC for the gap check to be satisfied. The distance must be larger than ``gap_tol`` times the size of the gap. This check is performed only for the largest gap in each string of WCC. The check can be turned off by setting ``gap_tol=None``.
     :type gap_tol:      float
 
@@ -86,9 +102,27 @@ def run_surface(
     :param load_quiet:  Determines whether errors / inexistent files are ignored when loading from ``save_file``
     :type load_quiet:   bool
 
-    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json` and :py:mod:`pickle`. By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, :py:mod:`json` is used.
+    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json`, :py:mod:`pickle` and ``'npz'`` (see :func:`z2pack.io.save`). By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, :py:mod:`json` is used.
     :type serializer:   module
 
+    :param journal:     If ``True``, the result is saved to ``save_file`` as an append-only journal: each line is appended to the file once it is computed, instead of re-writing the whole result. The ``serializer`` is not used in this case. The journal is loaded by :func:`z2pack.io.load_journal`, or with ``load=True``. A ``save_file`` which is not a journal is loaded with :func:`z2pack.io.load` instead, and then replaced by a journal.
+    :type journal:      bool
+
+    :param streaming:   If ``True``, only the Wilson loop is kept for each line (as :class:`.WilsonLineData`), and the eigenstates of a k-point string are never held at once. For systems which compute the k-points independently (``independent_kpoints``, such as :class:`.hm.System`), the eigenstates are requested in chunks of a few k-points, and only their overlap matrices are kept. The peak memory is then bounded by the eigenstates of one chunk. Other systems are called with the full k-point strings, such that only the stored result is reduced. The eigenstates are not re-used on nested k-point grids in this mode.
+    :type streaming:    bool
+
+    :param keep_data:   Determines which data is kept for each line once it has converged. With ``'all'``, the full data (eigenstates or overlap matrices) is kept. With ``'wilson'``, only the Wilson loop is kept (as :class:`.WilsonLineData`), from which the WCC and ``wilson_eigenstates`` are computed. With ``'wcc'``, only the WCC are kept (as :class:`.WccLineData`), which gives access to ``wcc``, ``pol``, ``gap_pos`` and ``gap_size``. In contrast to ``streaming``, the full data is still used while the line is being converged. The reduced data makes the result much smaller in memory and on file.
+    :type keep_data:    str
+
+    :param reduced_precision:   If ``True``, the Wilson loop kept with ``keep_data='wilson'`` is stored in single precision. This halves its size, but changes the WCC computed from it at the level of :math:`10^{-7}`.
+    :type reduced_precision:    bool
+
+    :param unitarize:   If ``True``, each overlap matrix is replaced by the closest unitary matrix before computing the Wilson loop, which reduces the discretization error of the WCC for coarse k-point strings. See :class:`.OverlapLineData` for details.
+    :type unitarize:    bool
+
+    :param executor:    Executor (e.g. a :py:class:`concurrent.futures.ProcessPoolExecutor` or :py:class:`concurrent.futures.ThreadPoolExecutor`) which is used to compute the independent lines of each iteration concurrently. The results are added to the surface in the order of their position, such that the outcome does not depend on the executor. With a process pool, the ``system`` and ``surface`` must be picklable (e.g. the surface can not be a lambda function). By default, the lines are computed one after another, or together through the ``get_eig_batch`` / ``get_mmn_batch`` method if the system supports it (see :mod:`z2pack.system`).
+    :type executor:     concurrent.futures.Executor
+
     :returns:   :class:`SurfaceResult` instance.
 
     Example usage:
@@ -105,7 +139,11 @@ def run_surface(
     """
     # setting up controls
     controls = _create_surface_controls(
-        pos_tol=pos_tol, iterator=iterator, gap_tol=gap_tol, move_tol=move_tol
+        pos_tol=pos_tol,
+        iterator=iterator,
+        gap_tol=gap_tol,
+        move_tol=move_tol,
+        extrapolate=extrapolate,
     )
 
     # setting up init_result
@@ -116,8 +154,10 @@ def run_surface(
         load_quiet=load_quiet,
         serializer=serializer,
         valid_type=SurfaceResult,
+        journal=journal,
     )
     _check_save_dir(save_file=save_file)
+    _check_keep_data(keep_data=keep_data, reduced_precision=reduced_precision)
 
     return _run_surface_impl(
         *controls,
@@ -128,6 +168,12 @@ def run_surface(
         save_file=save_file,
         init_result=init_result,
         serializer=serializer,
+        journal=journal,
+        streaming=streaming,
+        keep_data=keep_data,
+        reduced_precision=reduced_precision,
+        unitarize=unitarize,
+        executor=executor,
     )
 
 
@@ -142,6 +188,12 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
     save_file=None,
     init_result=None,
     serializer="auto",
+    journal=False,
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+    executor=None,
 ):
     r"""Implementation of the surface's run.
 
@@ -155,52 +207,47 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
     ctrl_container = SurfaceControlContainer(controls)
 
     # HELPER FUNCTIONS
-    def get_line(t, init_line_result=None):
-        """
-        Runs a line calculation and returns its result.
-        """
-        # pylint: disable=protected-access
-        return _line_run._run_line_impl(
-            *copy.deepcopy(ctrl_container.line),
-            system=system,
-            line=lambda ky: surface(t, ky),
-            init_result=init_line_result,
-        )
-
-    # setting up async handler
-    if save_file is not None:
-
-        def handler(res):
-            _LOGGER.info(f"Saving surface result to file {save_file} (ASYNC)")
-            io.save(res, save_file, serializer=serializer)
-
-    else:
-        handler = None
+    get_lines = functools.partial(
+        _get_lines,
+        surface=surface,
+        line_ctrls=ctrl_container.line,
+        executor=executor,
+        system=system,
+        streaming=streaming,
+        keep_data=keep_data,
+        reduced_precision=reduced_precision,
+        unitarize=unitarize,
+    )
 
-    with AsyncHandler(handler) as save_thread:
+    saver = _get_saver(
+        save_file=save_file,
+        serializer=serializer,
+        journal=journal,
+        result_type=SurfaceResult,
+        init_result=init_result,
+        logger=_LOGGER,
+        name="surface",
+    )
+    with saver:
 
-        def add_line(t):
+        def add_lines(t_values):
             """
-            Adds a line to the Surface, if it is within min_neighbour_dist of
-            the given lines.
+            Adds lines to the Surface, unless they are within min_neighbour_dist of
+            the given lines or of each other. The lines are computed concurrently
+            if an executor is given, and added in the order of t_values.
             """
-            # find whether the line is allowed still
-            dist = data.nearest_neighbour_dist(t)
-            if dist < min_neighbour_dist:
-                if dist == 0:
-                    _LOGGER.info(f"Line at t = {t} exists already.")
-                else:
-                    _LOGGER.warning(f"'min_neighbour_dist' reached: cannot add line at t = {t}")
-                return SurfaceResult(data, ctrl_container.stateful, ctrl_container.convergence)
-
-            _LOGGER.info(f"Adding line at t = {t}")
-            data.add_line(t, get_line(t))
-
-            return update_result()
+            result = SurfaceResult(data, ctrl_container.stateful, ctrl_container.convergence)
+            t_allowed = _allowed_positions(t_values, data, min_neighbour_dist=min_neighbour_dist)
+            line_results = get_lines(t_allowed)
+            for t in t_allowed:
+                _LOGGER.info(f"Adding line at t = {t}")
+                line = data.add_line(t, next(line_results))
+                result = update_result(line)
+            return result
 
-        def update_result():
+        def update_result(line):
             """
-            Updates all data controls, then creates the result object, saves it to file if necessary and returns the result.
+            Updates all data controls, then creates the result object, saves it to file if necessary and returns the result. With a journal, only the given line which was added or updated is saved.
             """
 
             # update data controls
@@ -208,7 +255,7 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
                 d_ctrl.update(data)
 
             result = SurfaceResult(data, ctrl_container.stateful, ctrl_container.convergence)
-            save_thread.send(copy.deepcopy(result))
+            _save_result(saver, line, result)
 
             return result
 
@@ -229,7 +276,7 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
         if init_result is not None:
             _LOGGER.info("Initializing result from 'init_result'.")
             # make sure old result doesn't change
-            init_result = copy.deepcopy(init_result)
+            init_result = copy.copy(init_result)
 
             # get states from pre-existing Controls
             for s_ctrl in ctrl_container.stateful:
@@ -240,10 +287,12 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
 
             # re-run lines with existing result as input
             _LOGGER.info("Re-running existing lines.")
-            for line in data.lines:
+            lines = list(data.lines)
+            line_results = get_lines([line.t for line in lines], [line.result for line in lines])
+            for line in lines:
                 _LOGGER.info(f"Re-running line for t = {line.t}")
-                line.result = get_line(line.t, line.result)
-                update_result()
+                line.result = next(line_results)
+                update_result(line)
 
         else:
             data = SurfaceData()
@@ -251,8 +300,7 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
         # STEP 2 -- PRODUCE REQUIRED STRINGS
         # create lines required by num_lines
         _LOGGER.info("Adding lines required by 'num_lines'.")
-        for t in np.linspace(0, 1, num_lines):
-            result = add_line(t)
+        result = add_lines(list(np.linspace(0, 1, num_lines)))
 
         # STEP 3 -- MAIN LOOP
         num_lines = len(data.lines)
@@ -260,8 +308,7 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
         while not all(conv):
             # add lines for all non-converged values
             new_t = [(t1 + t2) / 2 for (t1, t2), c in zip(zip(data.t, data.t[1:]), conv) if not c]
-            for t in new_t:
-                result = add_line(t)
+            result = add_lines(new_t)
 
             # check if new lines appeared
             num_lines_new = len(data.lines)
@@ -271,3 +318,62 @@ def _run_surface_impl(  # pylint: disable=too-many-locals
             conv = collect_convergence()
 
     return result
+
+
+def _get_lines(t_values, init_line_results=None, *, surface, line_ctrls, executor, **line_kwargs):
+    """
+    Runs the line calculations at the given positions of the surface, and returns an iterator over their results. If an executor is given, all lines are submitted at once. Otherwise, if the system can compute several k-point strings at once, the lines are computed together in lock-step, and each result is available as soon as it and the ones before it have finished. If neither is the case, each line is computed only when its result is requested.
+
+    :param line_ctrls: Line controls, which are copied for each line.
+    :type line_ctrls: list
+
+    The other keyword arguments are passed to the line's run.
+    """
+    if init_line_results is None:
+        init_line_results = [None] * len(t_values)
+    line_args = [
+        dict(
+            line=functools.partial(_surface_line, surface, t),
+            init_result=init_line_result,
+            **line_kwargs,
+        )
+        for t, init_line_result in zip(t_values, init_line_results)
+    ]
+    # pylint: disable=protected-access
+    if executor is not None:
+        futures = [
+            executor.submit(_line_run._run_line_impl, *copy.deepcopy(line_ctrls), **kwargs)
+            for kwargs in line_args
+        ]
+        return (future.result() for future in futures)
+    batch_fct = _line_run._get_batch_fct(line_kwargs["system"])
+    if batch_fct is not None and line_args:
+        return _line_run._evaluate_batch(
+            [_line_run._line_steps(*copy.deepcopy(line_ctrls), **kwargs) for kwargs in line_args],
+            batch_fct,
+        )
+    return (_line_run._run_line_impl(*copy.deepcopy(line_ctrls), **kwargs) for kwargs in line_args)
+
+
+def _allowed_positions(t_values, data, *, min_neighbour_dist):
+    """
+    Returns the positions at which lines can be added, which are those not within ``min_neighbour_dist`` of the existing lines or of each other.
+    """
+    t_allowed = []
+    for t in t_values:
+        dist = min([data.nearest_neighbour_dist(t)] + [abs(t - t2) for t2 in t_allowed])
+        if dist < min_neighbour_dist:
+            if dist == 0:
+                _LOGGER.info(f"Line at t = {t} exists already.")
+            else:
+                _LOGGER.warning(f"'min_neighbour_dist' reached: cannot add line at t = {t}")
+        else:
+            t_allowed.append(t)
+    return t_allowed
+
+
+def _surface_line(surface, t, t_line):
+    """
+    Returns the point at position ``t_line`` on the line at position ``t`` of the surface. This is a module-level function such that the line can be pickled.
+    """
+    return surface(t, t_line)
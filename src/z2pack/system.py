@@ -1,5 +1,8 @@
 #!/usr/bin/env python
-r"""Z2Pack can easily be extended to work with different models / systems. The base classes defined here provide the interface to Z2Pack. Of the two classes, :class:`EigenstateSystem` is the more general one and should be preferred if possible."""
+r"""Z2Pack can easily be extended to work with different models / systems. The base classes defined here provide the interface to Z2Pack. Of the two classes, :class:`EigenstateSystem` is the more general one and should be preferred if possible.
+
+Systems can optionally implement a ``get_eig_batch`` (or ``get_mmn_batch``) method, which takes a list of k-point strings and returns the eigenstates (or overlap matrices) for each of them. If the system also sets ``supports_batch = True``, :func:`.surface.run` and :func:`.volume.run` compute the lines of each iteration in lock-step, passing all k-point strings of a step to a single call. This allows the system to amortize work across strings, for example by evaluating a vectorized Hamiltonian only once or by computing all strings in a single first-principles calculation. Each line is added to the result (and saved) as soon as it and the lines before it have converged. Other systems are called once per line.
+"""
 
 import abc
 
@@ -12,8 +15,15 @@ __all__ = [
 class EigenstateSystem(metaclass=abc.ABCMeta):
     r"""
     Abstract base class for Z2Pack System classes which can provide eigenstates (periodic part :math:`|u_\mathbf{k}\rangle`).
+
+    Subclasses can additionally define ``get_eig_batch(kpt_list)``, which returns a list containing the result of :meth:`get_eig` for each k-point string in ``kpt_list``. It is used for computing several lines together if ``supports_batch`` is ``True``.
+
+    Subclasses which compute the eigenstates at each k-point independently can set ``independent_kpoints = True``. :meth:`get_eig` is then also called with lists of k-points which are not neighbouring, but whose last k-point is still equivalent to the first one. This is used to re-use eigenstates which were computed before, for example on nested k-point strings. By default, :meth:`get_eig` is called only with the closed k-point strings along a line.
     """
 
+    supports_batch = False
+    independent_kpoints = False
+
     @abc.abstractmethod
     def get_eig(self, kpt):
         r"""
@@ -27,8 +37,12 @@ class EigenstateSystem(metaclass=abc.ABCMeta):
 class OverlapSystem(metaclass=abc.ABCMeta):
     r"""
     Abstract base class for Z2Pack System classes which can only provide overlap matrices.
+
+    Subclasses can additionally define ``get_mmn_batch(kpt_list)``, which returns a list containing the result of :meth:`get_mmn` for each k-point string in ``kpt_list``. It is used for computing several lines together if ``supports_batch`` is ``True``.
     """
 
+    supports_batch = False
+
     @abc.abstractmethod
     def get_mmn(self, kpt):
         r"""
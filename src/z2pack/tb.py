@@ -5,6 +5,10 @@ This module contains the class for creating systems based on `TBmodels <https://
 
 from collections import ChainMap
 import copy
+import functools
+
+import numpy as np
+import scipy.sparse as sp
 
 from .hm import System as _HmSystem
 
@@ -18,14 +22,31 @@ class System(_HmSystem):
     :param tb_model: The tight-binding model.
     :type tb_model: Instance of :class:`tbmodels.Model` or one of its subclasses.
 
+    :param sparse: Determines whether the Hamiltonian is constructed as a :py:mod:`scipy.sparse` matrix, such that only the selected bands are computed with a sparse eigensolver. This is useful for large models, in particular when they are created with ``sparse=True`` in TBmodels.
+    :type sparse: bool
+
     :param kwargs:  Keyword arguments passed to :class:`.hm.System`.
 
-    The ``pos``, ``bands`` and ``dim`` keywords of :class:`.hm.System` are determined from the ``tb_model`` unless otherwise specified.
+    The ``pos``, ``bands`` and ``dim`` keywords of :class:`.hm.System` are determined from the ``tb_model`` unless otherwise specified. If the ``tb_model`` can evaluate the Hamiltonian for an array of k-points in a single call (as is the case for recent versions of TBmodels), ``hamilton_batch`` is enabled by default for dense Hamiltonians without ``basis_overlap``. The lines of each iteration in a surface calculation are then computed together.
     """
 
-    def __init__(self, tb_model, **kwargs):
+    def __init__(self, tb_model, *, sparse=False, **kwargs):
+        if (
+            "hamilton_batch" not in kwargs
+            and "basis_overlap" not in kwargs
+            and not sparse
+            and _has_batch_hamilton(tb_model)
+        ):
+            kwargs["hamilton_batch"] = True
+        if sparse:
+            hamilton = functools.partial(
+                _sparse_hamilton,
+                [(np.array(R), sp.csr_matrix(hop)) for R, hop in tb_model.hop.items()],
+            )
+        else:
+            hamilton = tb_model.hamilton
         super().__init__(
-            hamilton=tb_model.hamilton,
+            hamilton=hamilton,
             convention=2,
             **ChainMap(
                 kwargs,
@@ -36,3 +57,22 @@ class System(_HmSystem):
                 ),
             ),
         )
+
+
+def _has_batch_hamilton(tb_model):
+    """
+    Checks whether the Hamiltonian of the tight-binding model can be evaluated for an array of k-points in a single call.
+    """
+    try:
+        hams = np.asarray(tb_model.hamilton(np.zeros((2, tb_model.dim))))
+    except (TypeError, ValueError):
+        return False
+    return hams.shape == (2, tb_model.size, tb_model.size)
+
+
+def _sparse_hamilton(hoppings, k):
+    """
+    Constructs the sparse Hamiltonian (in convention 2) at the k-point ``k`` from a list of lattice vectors and (sparse) hopping matrices, which contain only one of each pair of complex conjugate hoppings.
+    """
+    ham = sum(np.exp(2j * np.pi * np.dot(k, R)) * hop for R, hop in hoppings)
+    return sp.csr_matrix(ham + ham.conjugate().T)
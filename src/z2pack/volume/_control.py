@@ -13,12 +13,16 @@ from .._control import (
 from ..surface._control import _create_surface_controls
 
 
-def _create_volume_controls(*, pos_tol, iterator, move_tol, gap_tol):
+def _create_volume_controls(*, pos_tol, iterator, move_tol, gap_tol, extrapolate=False):
     """
     Create control objects needed for a volume calculation.
     """
     return _create_surface_controls(
-        pos_tol=pos_tol, iterator=iterator, move_tol=move_tol, gap_tol=gap_tol
+        pos_tol=pos_tol,
+        iterator=iterator,
+        move_tol=move_tol,
+        gap_tol=gap_tol,
+        extrapolate=extrapolate,
     )
 
 
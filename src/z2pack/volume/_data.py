@@ -35,8 +35,18 @@ class VolumeData(metaclass=ConstLocker):
 
         :param result:  Result of the surface calculation.
         :type result:   :class:`.SurfaceResult`
+
+        :returns:   The :class:`SurfacePosition` of the new surface.
+        """
+        position = SurfacePosition(s, result)
+        self.surfaces.add(position)
+        return position
+
+    def __copy__(self):
+        """
+        Returns a copy which has its own list of surfaces, but shares the surface results with this instance. The surface results are not changed after they are added, so the copy is not affected by surfaces which are added to or replaced in this instance.
         """
-        self.surfaces.add(SurfacePosition(s, result))
+        return VolumeData(SurfacePosition(surface.s, surface.result) for surface in self.surfaces)
 
     def __getattr__(self, key):
         if key != "surfaces":
@@ -1,27 +1,34 @@
 """Defines functions to run a surface calculation."""
 
+import concurrent.futures
 import contextlib
 import copy
+import functools
 import logging
 
 import numpy as np
 
 from . import _LOGGER, VolumeData, VolumeResult
-from .._async_handler import AsyncHandler
 from .._logging_tools import TagAdapter, TagFilter, filter_manager
-from .._run_utils import _check_save_dir, _load_init_result, _log_run
+from .._run_utils import (
+    _check_keep_data,
+    _check_save_dir,
+    _get_saver,
+    _load_init_result,
+    _log_run,
+    _save_result,
+)
 from ._control import VolumeControlContainer, _create_volume_controls
 
 _LOGGER = TagAdapter(_LOGGER, default_tags=("volume",))
 
-from .. import io
 from ..surface import _run as _surface_run
 
 __all__ = ["run_volume"]
 
 
 @_log_run(_LOGGER)
-def run_volume(
+def run_volume(  # pylint: disable=too-many-locals
     *,
     system,
     volume,
@@ -37,6 +44,13 @@ def run_volume(
     load=False,
     load_quiet=True,
     serializer="auto",
+    journal=False,
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+    extrapolate=False,
+    executor=None,
 ):
     r"""
     Calculates the Wannier charge centers for a given system and volume.
@@ -54,6 +68,9 @@ def run_volume(
     :param pos_tol:     The maximum movement of a WCC for the iteration w.r.t. the number of k-points in a single string to converge. The iteration can be turned off by setting ``pos_tol=None``.
     :type pos_tol:      float
 
+    :param extrapolate: If ``True``, the convergence of the WCC along each line is checked by extrapolating them to an infinite number of k-points, instead of comparing the WCC of two consecutive iterations. Values of the ``iterator`` which are predicted to be insufficient for reaching ``pos_tol`` are skipped. The discretization error of the WCC is assumed to scale as :math:`(N - 1)^{-2}` with the number of k-points :math:`N`.
+    :type extrapolate:  bool
+
     :param gap_tol:     Determines the smallest distance between a gap and its neighbouring WCC for the gap check to be satisfied. The distance must be larger than ``gap_tol`` times the size of the gap. This check is performed only for the largest gap in each string of WCC. The check can be turned off by setting ``gap_tol=None``.
     :type gap_tol:      float
 
@@ -83,9 +100,27 @@ def run_volume(
     :param load_quiet:  Determines whether errors / inexistent files are ignored when loading from ``save_file``
     :type load_quiet:   bool
 
-    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json` and :py:mod:`pickle`. By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, :py:mod:`json` is used.
+    :param serializer:  Serializer which is used to save the result to file. Valid options are ``msgpack``, :py:mod:`json`, :py:mod:`pickle` and ``'npz'`` (see :func:`z2pack.io.save`). By default (``serializer='auto'``), the serializer is inferred from the file ending. If this fails, :py:mod:`json` is used.
     :type serializer:   module
 
+    :param journal:     If ``True``, the result is saved to ``save_file`` as an append-only journal: each surface is appended to the file once it is computed, instead of re-writing the whole result. The ``serializer`` is not used in this case. The journal is loaded by :func:`z2pack.io.load_journal`, or with ``load=True``. A ``save_file`` which is not a journal is loaded with :func:`z2pack.io.load` instead, and then replaced by a journal.
+    :type journal:      bool
+
+    :param streaming:   If ``True``, only the Wilson loop is kept for each line (as :class:`.WilsonLineData`), and the eigenstates of a k-point string are never held at once. For systems which compute the k-points independently (``independent_kpoints``, such as :class:`.hm.System`), the eigenstates are requested in chunks of a few k-points, and only their overlap matrices are kept. The peak memory is then bounded by the eigenstates of one chunk. Other systems are called with the full k-point strings, such that only the stored result is reduced. The eigenstates are not re-used on nested k-point grids in this mode.
+    :type streaming:    bool
+
+    :param keep_data:   Determines which data is kept for each line once it has converged. With ``'all'``, the full data (eigenstates or overlap matrices) is kept. With ``'wilson'``, only the Wilson loop is kept (as :class:`.WilsonLineData`), from which the WCC and ``wilson_eigenstates`` are computed. With ``'wcc'``, only the WCC are kept (as :class:`.WccLineData`), which gives access to ``wcc``, ``pol``, ``gap_pos`` and ``gap_size``. In contrast to ``streaming``, the full data is still used while the line is being converged. The reduced data makes the result much smaller in memory and on file.
+    :type keep_data:    str
+
+    :param reduced_precision:   If ``True``, the Wilson loop kept with ``keep_data='wilson'`` is stored in single precision. This halves its size, but changes the WCC computed from it at the level of :math:`10^{-7}`.
+    :type reduced_precision:    bool
+
+    :param unitarize:   If ``True``, each overlap matrix is replaced by the closest unitary matrix before computing the Wilson loop, which reduces the discretization error of the WCC for coarse k-point strings. See :class:`.OverlapLineData` for details.
+    :type unitarize:    bool
+
+    :param executor:    Executor (e.g. a :py:class:`concurrent.futures.ProcessPoolExecutor` or :py:class:`concurrent.futures.ThreadPoolExecutor`) which is used to compute the lines. The independent surfaces of each iteration run concurrently, and the pending lines of all of them are submitted to this single executor. The results are added to the volume in the order of their position, such that the outcome does not depend on the executor. With a process pool, the ``system`` and ``volume`` must be picklable (e.g. the volume can not be a lambda function). By default, the surfaces and lines are computed one after another, where the lines of each surface are computed together if the system supports it (see :mod:`z2pack.system`).
+    :type executor:     concurrent.futures.Executor
+
     :returns:   :class:`VolumeResult` instance.
 
     Example usage:
@@ -102,7 +137,11 @@ def run_volume(
     """
     # setting up controls
     controls = _create_volume_controls(
-        pos_tol=pos_tol, iterator=iterator, gap_tol=gap_tol, move_tol=move_tol
+        pos_tol=pos_tol,
+        iterator=iterator,
+        gap_tol=gap_tol,
+        move_tol=move_tol,
+        extrapolate=extrapolate,
     )
 
     init_result = _load_init_result(
@@ -112,8 +151,10 @@ def run_volume(
         load_quiet=load_quiet,
         serializer=serializer,
         valid_type=VolumeResult,
+        journal=journal,
     )
     _check_save_dir(save_file=save_file)
+    _check_keep_data(keep_data=keep_data, reduced_precision=reduced_precision)
 
     return _run_volume_impl(
         *controls,
@@ -125,11 +166,21 @@ def run_volume(
         save_file=save_file,
         init_result=init_result,
         serializer=serializer,
+        journal=journal,
+        streaming=streaming,
+        keep_data=keep_data,
+        reduced_precision=reduced_precision,
+        unitarize=unitarize,
+        executor=executor,
     )
 
 
 # filter out LogRecords tagged as 'surface_only' in the surface.
 @filter_manager(logging.getLogger("z2pack.surface"), TagFilter(("surface_only",)))
+# The surfaces filter out LogRecords tagged as 'line_only' themselves. This is
+# repeated here because the filter is removed when the first of several
+# concurrently running surfaces finishes.
+@filter_manager(logging.getLogger("z2pack.line"), TagFilter(("line_only",)))
 def _run_volume_impl(  # pylint: disable=too-many-locals
     *controls,
     system,
@@ -140,6 +191,12 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
     save_file=None,
     init_result=None,
     serializer="auto",
+    journal=False,
+    streaming=False,
+    keep_data="all",
+    reduced_precision=False,
+    unitarize=False,
+    executor=None,
 ):
     r"""Implementation of the volume's run.
 
@@ -151,54 +208,50 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
     ctrl_container = VolumeControlContainer(controls)
 
     # HELPER FUNCTIONS
-    def get_surface(s, init_surface_result=None):
-        """
-        Runs a line calculation and returns its result.
-        """
-        # pylint: disable=protected-access
-        return _surface_run._run_surface_impl(
-            *copy.deepcopy(ctrl_container.surface),
-            system=system,
-            surface=lambda t1, t2: volume(s, t1, t2),
-            num_lines=num_lines,
-            min_neighbour_dist=min_neighbour_dist,
-            init_result=init_surface_result,
-        )
-
-    # setting up async handler
-    if save_file is not None:
-
-        def handler(res):
-            _LOGGER.info(f"Saving volume result to file {save_file} (ASYNC)")
-            io.save(res, save_file, serializer=serializer)
-
-    else:
-        handler = None
+    get_surfaces = functools.partial(
+        _get_surfaces,
+        volume=volume,
+        surface_ctrls=ctrl_container.surface,
+        executor=executor,
+        system=system,
+        num_lines=num_lines,
+        min_neighbour_dist=min_neighbour_dist,
+        streaming=streaming,
+        keep_data=keep_data,
+        reduced_precision=reduced_precision,
+        unitarize=unitarize,
+    )
 
-    with AsyncHandler(handler) as save_thread:
+    saver = _get_saver(
+        save_file=save_file,
+        serializer=serializer,
+        journal=journal,
+        result_type=VolumeResult,
+        init_result=init_result,
+        logger=_LOGGER,
+        name="volume",
+    )
+    with saver:
 
-        def add_surface(s):
+        def add_surfaces(s_values):
             """
-            Adds a surface to the Volume, if it is within min_neighbour_dist of
-            the given surfaces.
+            Adds surfaces to the Volume, unless they are within min_neighbour_dist
+            of the given surfaces or of each other. The surfaces are computed
+            concurrently if an executor is given, and added in the order of s_values.
             """
-            # find whether the line is allowed still
-            dist = data.nearest_neighbour_dist(s)
-            if dist < min_neighbour_dist:
-                if dist == 0:
-                    _LOGGER.info(f"Surface at s = {s} exists already.")
-                else:
-                    _LOGGER.warning(f"'min_neighbour_dist' reached: cannot add surface at s = {s}")
-                return VolumeResult(data, ctrl_container.stateful, ctrl_container.convergence)
-
-            _LOGGER.info(f"Adding surface at s = {s}")
-            data.add_surface(s, get_surface(s))
+            result = VolumeResult(data, ctrl_container.stateful, ctrl_container.convergence)
+            s_allowed = _allowed_positions(s_values, data, min_neighbour_dist=min_neighbour_dist)
 
-            return update_result()
+            surface_results = get_surfaces(s_allowed)
+            for s in s_allowed:
+                _LOGGER.info(f"Adding surface at s = {s}")
+                surface = data.add_surface(s, next(surface_results))
+                result = update_result(surface)
+            return result
 
-        def update_result():
+        def update_result(surface):
             """
-            Updates all data controls, then creates the result object, saves it to file if necessary and returns the result.
+            Updates all data controls, then creates the result object, saves it to file if necessary and returns the result. With a journal, only the given surface which was added or updated is saved.
             """
 
             # update data controls
@@ -206,7 +259,7 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
                 d_ctrl.update(data)
 
             result = VolumeResult(data, ctrl_container.stateful, ctrl_container.convergence)
-            save_thread.send(copy.deepcopy(result))
+            _save_result(saver, surface, result)
 
             return result
 
@@ -229,7 +282,7 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
         if init_result is not None:
             _LOGGER.info("Initializing result from 'init_result'.")
             # make sure old result doesn't change
-            init_result = copy.deepcopy(init_result)
+            init_result = copy.copy(init_result)
 
             # get states from pre-existing Controls
             for s_ctrl in ctrl_container.stateful:
@@ -240,10 +293,14 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
 
             # re-run lines with existing result as input
             _LOGGER.info("Re-running existing surfaces.")
-            for surface in data.surfaces:
+            surfaces = list(data.surfaces)
+            surface_results = get_surfaces(
+                [surface.s for surface in surfaces], [surface.result for surface in surfaces]
+            )
+            for surface in surfaces:
                 _LOGGER.info(f"Re-running surface for s = {surface.s}")
-                surface.result = get_surface(surface.s, surface.result)
-                update_result()
+                surface.result = next(surface_results)
+                update_result(surface)
 
         else:
             data = VolumeData()
@@ -251,8 +308,7 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
         # STEP 2 -- PRODUCE REQUIRED SURFACES
         # create surfaces required by num_surfaces
         _LOGGER.info("Adding surfaces required by 'num_surfaces'.")
-        for s in np.linspace(0, 1, num_surfaces):
-            result = add_surface(s)
+        result = add_surfaces(list(np.linspace(0, 1, num_surfaces)))
 
         # STEP 3 -- MAIN LOOP
         num_surfaces = len(data.surfaces)
@@ -260,8 +316,7 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
         while not all(conv):
             # add lines for all non-converged values
             new_s = [(s1 + s2) / 2 for (s1, s2), c in zip(zip(data.s, data.s[1:]), conv) if not c]
-            for s in new_s:
-                result = add_surface(s)
+            result = add_surfaces(new_s)
 
             # check if new lines appeared
             num_surfaces_new = len(data.surfaces)
@@ -271,3 +326,63 @@ def _run_volume_impl(  # pylint: disable=too-many-locals
             conv = collect_convergence()
 
     return result
+
+
+def _get_surfaces(
+    s_values, init_surface_results=None, *, volume, surface_ctrls, executor, **surface_kwargs
+):
+    """
+    Runs the surface calculations at the given positions of the volume, and returns an iterator over their results. If an executor is given, the surfaces run concurrently, and submit their lines to the executor. Otherwise, each surface is computed only when its result is requested.
+
+    :param surface_ctrls: Surface controls, which are copied for each surface.
+    :type surface_ctrls: list
+
+    The other keyword arguments are passed to the surface's run.
+    """
+    if init_surface_results is None:
+        init_surface_results = [None] * len(s_values)
+    # pylint: disable=protected-access
+    surface_calls = [
+        functools.partial(
+            _surface_run._run_surface_impl,
+            *copy.deepcopy(surface_ctrls),
+            surface=functools.partial(_volume_surface, volume, s),
+            init_result=init_surface_result,
+            executor=executor,
+            **surface_kwargs,
+        )
+        for s, init_surface_result in zip(s_values, init_surface_results)
+    ]
+    if executor is None or not surface_calls:
+        return (surface_call() for surface_call in surface_calls)
+    # The surface runs only dispatch their lines to the executor and wait
+    # for the results, so they can run in threads without using up the
+    # workers of the executor.
+    surface_executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(surface_calls))
+    futures = [surface_executor.submit(surface_call) for surface_call in surface_calls]
+    surface_executor.shutdown(wait=False)
+    return (future.result() for future in futures)
+
+
+def _allowed_positions(s_values, data, *, min_neighbour_dist):
+    """
+    Returns the positions at which surfaces can be added, which are those not within ``min_neighbour_dist`` of the existing surfaces or of each other.
+    """
+    s_allowed = []
+    for s in s_values:
+        dist = min([data.nearest_neighbour_dist(s)] + [abs(s - s2) for s2 in s_allowed])
+        if dist < min_neighbour_dist:
+            if dist == 0:
+                _LOGGER.info(f"Surface at s = {s} exists already.")
+            else:
+                _LOGGER.warning(f"'min_neighbour_dist' reached: cannot add surface at s = {s}")
+        else:
+            s_allowed.append(s)
+    return s_allowed
+
+
+def _volume_surface(volume, s, t1, t2):
+    """
+    Returns the point at position ``(t1, t2)`` on the surface at position ``s`` of the volume. This is a module-level function such that the surface can be pickled.
+    """
+    return volume(s, t1, t2)
@@ -0,0 +1,71 @@
+"""
+Benchmark of the orchestration overhead of first-principles calculations, using the stand-in calculation from :mod:`z2pack.fp.stand_in` instead of a first-principles code.
+
+A surface calculation is run with different options of :class:`z2pack.fp.System`. Run with ``python benchmark_fp.py [--num-bands N] [--delay SECONDS]``.
+"""
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import z2pack
+
+
+def run_surface(build_dir, *, num_bands, delay, executor=None, **kwargs):
+    """
+    Runs a surface calculation with the stand-in, and returns the elapsed time.
+    """
+    system = z2pack.fp.System(
+        input_files=[],
+        kpt_fct=z2pack.fp.kpoint.wannier90_full,
+        kpt_path="wannier90.win",
+        command=f"{sys.executable} {z2pack.fp.stand_in.__file__} --num-bands {num_bands} --delay {delay}",
+        build_folder=os.path.join(build_dir, "build"),
+        **kwargs,
+    )
+    start = time.perf_counter()
+    z2pack.surface.run(
+        system=system,
+        surface=lambda s, t: [s, 0.5 * s, t],
+        num_lines=11,
+        iterator=range(8, 27, 2),
+        executor=executor,
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    """
+    Runs the benchmarks and prints the results.
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--num-bands", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+    logging.getLogger("z2pack").setLevel(logging.WARNING)
+    sizes = dict(num_bands=args.num_bands, delay=args.delay)
+
+    with tempfile.TemporaryDirectory() as build_dir:
+        print(f"serial:          {run_surface(build_dir, **sizes):.2f} s")
+    with tempfile.TemporaryDirectory() as build_dir:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            elapsed = run_surface(build_dir, executor=executor, num_build_folders=4, **sizes)
+        print(f"4 build folders: {elapsed:.2f} s")
+    with tempfile.TemporaryDirectory() as build_dir:
+        elapsed = run_surface(
+            build_dir, kpt_fct_batch=z2pack.fp.kpoint.wannier90_full_batch, **sizes
+        )
+        print(f"batch:           {elapsed:.2f} s")
+    with tempfile.TemporaryDirectory() as build_dir:
+        cache_folder = os.path.join(build_dir, "cache")
+        run_surface(build_dir, cache_folder=cache_folder, **sizes)
+        elapsed = run_surface(build_dir, cache_folder=cache_folder, **sizes)
+        print(f"cached re-run:   {elapsed:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark of the .mmn parser against the previous, line-by-line parser.
+
+The sample files in ``tests/samples/mmn`` are parsed, as well as a generated file with a larger number of bands. Run with ``python benchmark_read_mmn.py``.
+"""
+
+import os
+import re
+import tempfile
+import timeit
+
+import numpy as np
+import z2pack
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples", "mmn")
+
+
+def legacy_get_m(mmn_file):
+    """
+    The previous parser, which reads the file line by line using regular expressions.
+    """
+    with open(mmn_file, encoding="utf-8") as f:
+        f.readline()
+        re_int = re.compile(r"[\d]+")
+        num_bands, num_kpts, _ = (int(i) for i in re.findall(re_int, f.readline()))
+        lines = (line for line in f if line)
+        step = num_bands * num_bands + 1
+        blocks = zip(*[iter(lines)] * step)
+        overlap_matrices = []
+        re_float = re.compile(r"[0-9.\-E]+")
+        for block in blocks:
+            block = iter(block)
+            idx = [int(el) for el in re.findall(re_int, next(block))]
+            if idx[0] % num_kpts - idx[1] != -1:
+                continue
+
+            def to_complex(blockline):
+                real_part, imag_part = re.findall(re_float, blockline)
+                return float(real_part) + 1j * float(imag_part)
+
+            overlap_matrices.append(
+                np.array(
+                    [[to_complex(next(block)) for _ in range(num_bands)] for _ in range(num_bands)]
+                ).T
+            )
+    return overlap_matrices
+
+
+def write_mmn(path, *, num_bands, num_kpts, num_neighbours=2, seed=0):
+    """
+    Writes a random .mmn file, where each k-point has the given number of neighbours.
+    """
+    rng = np.random.default_rng(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Created for benchmarking\n")
+        f.write(f"{num_bands:>12}{num_kpts:>12}{num_neighbours:>12}\n")
+        for k in range(num_kpts):
+            for shift in [1, -1][:num_neighbours]:
+                values = rng.normal(size=(num_bands * num_bands, 2))
+                f.write(f"{k + 1:>5}{(k + shift) % num_kpts + 1:>5}    0    0    0\n")
+                f.write("".join(f"{re:>18.12f}{im:>18.12f}\n" for re, im in values))
+
+
+def benchmark(mmn_file, number):
+    """
+    Prints the time needed by the previous and the current parser, after checking that they give the same result.
+    """
+    reference = legacy_get_m(mmn_file)
+    result = z2pack.fp._read_mmn.get_m(mmn_file)  # pylint: disable=protected-access
+    assert len(result) == len(reference)
+    assert all(np.array_equal(m, m_ref) for m, m_ref in zip(result, reference))
+    time_legacy = timeit.timeit(lambda: legacy_get_m(mmn_file), number=number) / number
+    time_new = timeit.timeit(
+        lambda: z2pack.fp._read_mmn.get_m(mmn_file),  # pylint: disable=protected-access
+        number=number,
+    )
+    time_new /= number
+    print(
+        f"{os.path.basename(mmn_file)}: previous {time_legacy * 1e3:.2f} ms, "
+        f"current {time_new * 1e3:.2f} ms, speedup {time_legacy / time_new:.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    for name in sorted(os.listdir(SAMPLES_DIR)):
+        benchmark(os.path.join(SAMPLES_DIR, name), number=200)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generated_file = os.path.join(tmp_dir, "generated.mmn")
+        write_mmn(generated_file, num_bands=100, num_kpts=20)
+        benchmark(generated_file, number=3)
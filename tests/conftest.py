@@ -80,9 +80,13 @@ def compare_data(request, test_name, scope="session"):
                 json.dump(data, out_f, default=z2pack.io._encoding.encode)
             raise ValueError("Reference data does not exist.")
         with open(test_file, encoding="utf-8") as in_f:
-            val = json.load(in_f)
+            val = json.load(in_f, object_hook=z2pack.io._encoding.decode)
         assert compare_fct(
-            val, json.loads(json.dumps(data, default=z2pack.io._encoding.encode))
+            val,
+            json.loads(
+                json.dumps(data, default=z2pack.io._encoding.encode),
+                object_hook=z2pack.io._encoding.decode,
+            ),
         )  # get rid of json-specific quirks
 
     return inner
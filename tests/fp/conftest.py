@@ -0,0 +1,50 @@
+"""
+Fixtures for first-principles calculations which just copy an .mmn file.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import os
+
+import pytest
+import z2pack
+
+
+@pytest.fixture
+def mmn_system(sample):
+    """
+    Create a first-principles system whose input .mmn file (by default the sample 'bi.mmn') is copied to 'wannier90.mmn' by the command. The build folder is 'build' inside the given directory, and the remaining keyword arguments select the feature under test.
+    """
+
+    def inner(
+        tmp_dir, *, mmn_file=None, input_files=(), command="cp bi.mmn wannier90.mmn", **kwargs
+    ):
+        if mmn_file is None:
+            mmn_file = sample("mmn/bi.mmn")
+        kwargs.setdefault("kpt_fct", z2pack.fp.kpoint.wannier90_full)
+        kwargs.setdefault("kpt_path", "wannier90.win")
+        return z2pack.fp.System(
+            input_files=[mmn_file, *input_files],
+            file_names=["bi.mmn"] + [os.path.basename(path) for path in input_files],
+            command=command,
+            build_folder=os.path.join(tmp_dir, "build"),
+            **kwargs,
+        )
+
+    return inner
+
+
+@pytest.fixture
+def num_calls():
+    """
+    Return a function which counts how often a command has run, where the command appends a line to the 'count' file in the given directory.
+    """
+
+    def inner(tmp_dir):
+        try:
+            with open(os.path.join(tmp_dir, "count"), encoding="utf-8") as f:
+                return len(f.readlines())
+        except FileNotFoundError:
+            return 0
+
+    return inner
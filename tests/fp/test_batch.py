@@ -0,0 +1,135 @@
+"""
+Tests for computing several k-point strings in a single first-principles calculation.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+
+NUM_BANDS = 3
+
+
+def _write_mmn(path, overlap_blocks, num_kpts):
+    """
+    Write the given ((k1, k2), matrix) blocks to an .mmn file.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Created for testing\n")
+        f.write(f"{NUM_BANDS:>12}{num_kpts:>12}{2:>12}\n")
+        for (k1, k2), matrix in overlap_blocks:
+            f.write(f"{k1:>5}{k2:>5}    0    0    0\n")
+            # the .mmn file is in column-major order
+            for value in matrix.T.flatten():
+                f.write(f"{value.real:>18.12f}{value.imag:>18.12f}\n")
+
+
+@pytest.fixture
+def batch_system(mmn_system):
+    """
+    Create a first-principles system with a batch k-point function, whose .mmn file contains the overlaps of two strings with 4 and 2 k-points.
+    """
+    rng = np.random.default_rng(0)
+    matrices = [
+        rng.normal(size=(NUM_BANDS, NUM_BANDS)) + 1j * rng.normal(size=(NUM_BANDS, NUM_BANDS))
+        for _ in range(6)
+    ]
+    pairs = [(1, 2), (2, 3), (3, 4), (4, 1), (5, 6), (6, 5)]
+    # blocks which do not belong to the strings must be ignored
+    extra_blocks = [((2, 1), np.eye(NUM_BANDS)), ((1, 5), np.eye(NUM_BANDS))]
+
+    def inner(build_dir, blocks=None, **kwargs):
+        if blocks is None:
+            blocks = list(zip(pairs, matrices)) + extra_blocks
+        mmn_path = os.path.join(build_dir, "batch.mmn")
+        _write_mmn(mmn_path, blocks, num_kpts=6)
+        return mmn_system(
+            build_dir,
+            mmn_file=mmn_path,
+            kpt_fct_batch=z2pack.fp.kpoint.wannier90_full_batch,
+            **kwargs,
+        )
+
+    return inner, matrices
+
+
+KPT_LIST = [
+    [np.array([0, 0, t]) for t in np.linspace(0, 1, 5)],
+    [np.array([0.5, 0, t]) for t in np.linspace(0, 1, 3)],
+]
+
+
+def test_get_mmn_batch(batch_system):
+    """
+    Test that the overlaps of each string are split out of the single .mmn file.
+    """
+    create_system, matrices = batch_system
+    with tempfile.TemporaryDirectory() as build_dir:
+        system = create_system(build_dir, num_wcc=NUM_BANDS)
+        result = system.get_mmn_batch(KPT_LIST)
+        with open(os.path.join(build_dir, "build", "wannier90.win"), encoding="utf-8") as f:
+            assert f.read() == z2pack.fp.kpoint.wannier90_full_batch(KPT_LIST)
+    assert [len(overlaps) for overlaps in result] == [4, 2]
+    for overlaps, overlaps_ref in zip(result[0] + result[1], matrices):
+        assert np.allclose(overlaps, overlaps_ref, atol=1e-10)
+
+
+def test_get_mmn_batch_cached(batch_system):
+    """
+    Test that cached strings are not computed again, and that only the missing strings are passed to the batch calculation.
+    """
+    create_system, matrices = batch_system
+    with tempfile.TemporaryDirectory() as build_dir:
+        system = create_system(build_dir, cache_folder=os.path.join(build_dir, "cache"))
+        system.get_mmn_batch(KPT_LIST)
+        shutil.rmtree(os.path.join(build_dir, "build"))
+        result = system.get_mmn_batch(KPT_LIST)
+        assert not os.path.exists(os.path.join(build_dir, "build"))
+        system.get_mmn_batch(KPT_LIST[:1] + [[np.array([0.2, 0, t]) for t in np.linspace(0, 1, 3)]])
+        with open(os.path.join(build_dir, "build", "wannier90.win"), encoding="utf-8") as f:
+            assert "mp_grid: 2 1 1" in f.read()
+    for overlaps, overlaps_ref in zip(result[0] + result[1], matrices):
+        assert np.allclose(overlaps, overlaps_ref, atol=1e-10)
+
+
+def test_missing_overlaps(batch_system):
+    """
+    Test that an error is raised when the overlaps of a string are missing.
+    """
+    create_system, matrices = batch_system
+    with tempfile.TemporaryDirectory() as build_dir:
+        system = create_system(build_dir, blocks=[((1, 2), matrices[0]), ((2, 3), matrices[1])])
+        with pytest.raises(ValueError):
+            system.get_mmn_batch(KPT_LIST)
+
+
+def test_no_batch_fct(mmn_system, sample):
+    """
+    Test that the batch method is not used if no batch k-point function is given, such that the lines of a surface are computed (and saved) one by one.
+    """
+    with tempfile.TemporaryDirectory() as build_dir:
+        system = mmn_system(build_dir)
+        assert not system.supports_batch
+        assert z2pack.line._run._get_batch_fct(system) is None  # pylint: disable=protected-access
+        kpt = [np.array([0, 0, t]) for t in np.linspace(0, 1, 10)]
+        with pytest.raises(ValueError):
+            system.get_mmn_batch([kpt])
+        result = system.get_mmn(kpt)
+    reference = z2pack.fp._read_mmn.get_m(sample("mmn/bi.mmn"))  # pylint: disable=protected-access
+    assert all(np.allclose(m, m_ref) for m, m_ref in zip(result, reference))
+
+
+def test_invalid_kpt_fct_batch():
+    with pytest.raises(ValueError):
+        z2pack.fp.System(
+            input_files=[],
+            kpt_fct=z2pack.fp.kpoint.wannier90_full,
+            kpt_fct_batch=[z2pack.fp.kpoint.wannier90_full_batch] * 2,
+            kpt_path="wannier90.win",
+            command="true",
+        )
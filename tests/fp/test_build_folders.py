@@ -0,0 +1,91 @@
+"""
+Tests for running first-principles calculations in a pool of build folders.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import concurrent.futures
+import os
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+
+
+@pytest.fixture
+def cores_system(mmn_system):
+    """
+    Create a first-principles system whose command also writes the number of cores to a file.
+    """
+
+    def inner(tmp_dir, **kwargs):
+        return mmn_system(
+            tmp_dir,
+            command="cp bi.mmn wannier90.mmn; echo $Z2PACK_NUM_CORES > num_cores; sleep 0.2",
+            **kwargs,
+        )
+
+    return inner
+
+
+def _line(t):
+    return [0, 0, t]
+
+
+def test_build_folders(cores_system, sample):
+    """
+    Test that concurrent calculations run in separate build folders, and that the number of cores is passed to the command.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = cores_system(tmp_dir, num_build_folders=3, num_cores=4)
+        kpt = [np.array(_line(t)) for t in np.linspace(0, 1, 10)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(system.get_mmn, [kpt] * 3))
+        build_dir = os.path.join(tmp_dir, "build")
+        assert sorted(os.listdir(build_dir)) == ["0", "1", "2"]
+        for i in range(3):
+            with open(os.path.join(build_dir, str(i), "num_cores"), encoding="utf-8") as f:
+                assert f.read().strip() == "4"
+    reference = z2pack.fp._read_mmn.get_m(sample("mmn/bi.mmn"))  # pylint: disable=protected-access
+    for result in results:
+        assert all(np.allclose(m, m_ref) for m, m_ref in zip(result, reference))
+
+
+def test_single_build_folder(cores_system):
+    """
+    Test that a single build folder is used directly.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = cores_system(tmp_dir)
+        result = z2pack.line.run(system=system, line=_line, iterator=[10], pos_tol=None)
+        build_dir = os.path.join(tmp_dir, "build")
+        assert "wannier90.mmn" in os.listdir(build_dir)
+        with open(os.path.join(build_dir, "num_cores"), encoding="utf-8") as f:
+            assert f.read().strip() == ""
+    assert len(result.wcc) == 10
+
+
+def test_surface_executor(cores_system):
+    """
+    Test that a surface calculation with an executor gives the same result as without.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = cores_system(tmp_dir, num_build_folders=4)
+        kwargs = dict(
+            surface=lambda s, t: [s, 0, t],
+            iterator=[10],
+            pos_tol=None,
+            gap_tol=None,
+            move_tol=None,
+            num_lines=4,
+        )
+        result_ref = z2pack.surface.run(system=system, **kwargs)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            result = z2pack.surface.run(system=system, executor=executor, **kwargs)
+    assert result.wcc == result_ref.wcc
+
+
+def test_invalid_num_build_folders(cores_system):
+    with pytest.raises(ValueError):
+        cores_system("build", num_build_folders=0)
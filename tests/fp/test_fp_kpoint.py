@@ -118,3 +118,45 @@ def test_lines(kpt, fct, line, compare_equal):
             line_mapping["fct"](kpt)
     else:
         raise ValueError("missing test for this line and function")
+
+
+BATCH_FCTS = {
+    z2pack.fp.kpoint.qe_explicit_batch: z2pack.fp.kpoint.qe_explicit,
+    z2pack.fp.kpoint.wannier90_batch: z2pack.fp.kpoint.wannier90,
+    z2pack.fp.kpoint.wannier90_nnkpts_batch: z2pack.fp.kpoint.wannier90_nnkpts,
+    z2pack.fp.kpoint.wannier90_full_batch: z2pack.fp.kpoint.wannier90_full,
+}
+
+
+@pytest.mark.parametrize("batch_fct", BATCH_FCTS.keys(), ids=lambda fct: fct.__name__)
+@pytest.mark.parametrize("line", ALL_VALID)
+def test_batch_single(kpt, batch_fct, line):  # pylint: disable=unused-argument
+    """
+    Test that the batch k-point functions give the same result as the single-string version for a single string.
+    """
+    assert batch_fct([kpt]) == BATCH_FCTS[batch_fct](kpt)
+
+
+@pytest.mark.parametrize("batch_fct", BATCH_FCTS.keys(), ids=lambda fct: fct.__name__)
+@pytest.mark.parametrize("line", INVALID)
+def test_batch_invalid(kpt, batch_fct, line):  # pylint: disable=unused-argument
+    """
+    Test that the batch k-point functions raise ValueError if any of the strings is invalid.
+    """
+    valid_kpt = [np.array([0, 0, t]) for t in np.linspace(0, 1, 5)]
+    with pytest.raises(ValueError):
+        batch_fct([valid_kpt, kpt])
+
+
+def test_wannier90_nnkpts_batch(compare_equal):
+    """
+    Test the nnkpts input for several k-point strings.
+    """
+    compare_equal(
+        z2pack.fp.kpoint.wannier90_full_batch(
+            [
+                [np.array([0, 0, t]) for t in np.linspace(0, 1, 5)],
+                [np.array([0.5, t, 0]) for t in np.linspace(0, 2, 4)],
+            ]
+        )
+    )
@@ -0,0 +1,132 @@
+"""
+Tests for re-using the build folder with linked input files.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+
+
+@pytest.fixture(params=["hard", "symbolic"])
+def link_inputs(request):
+    return request.param
+
+
+@pytest.fixture
+def linked_system(sample, mmn_system, link_inputs):
+    """
+    Create a first-principles system with a re-used build folder, where the k-points are appended to a copy of the 'wannier90.win' input file.
+    """
+
+    def inner(tmp_dir, **kwargs):
+        win_file = os.path.join(tmp_dir, "wannier90.win")
+        with open(win_file, "w", encoding="utf-8") as f:
+            f.write("num_wann = 10\n")
+        mmn_file = os.path.join(tmp_dir, "bi.mmn")
+        shutil.copyfile(sample("mmn/bi.mmn"), mmn_file)
+        return mmn_system(
+            tmp_dir,
+            mmn_file=mmn_file,
+            input_files=[win_file],
+            link_inputs=link_inputs,
+            **kwargs,
+        )
+
+    return inner
+
+
+KPT = [np.array([0, 0, t]) for t in np.linspace(0, 1, 10)]
+
+
+def test_reuse(linked_system, link_inputs, sample):
+    """
+    Test that the build folder is kept between calculations, the input files are linked, and the k-points are written to a fresh copy of the input file.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = linked_system(tmp_dir, command="cp bi.mmn wannier90.mmn; echo >> output")
+        system.get_mmn(KPT)
+        result = system.get_mmn(KPT)
+        build_dir = os.path.join(tmp_dir, "build")
+        with open(os.path.join(build_dir, "output"), encoding="utf-8") as f:
+            assert len(f.readlines()) == 2
+        mmn_file = os.path.join(build_dir, "bi.mmn")
+        if link_inputs == "symbolic":
+            assert os.path.islink(mmn_file)
+        assert os.path.samefile(mmn_file, os.path.join(tmp_dir, "bi.mmn"))
+        with open(os.path.join(build_dir, "wannier90.win"), encoding="utf-8") as f:
+            assert f.read().count("begin kpoints") == 1
+        with open(os.path.join(tmp_dir, "wannier90.win"), encoding="utf-8") as f:
+            assert f.read() == "num_wann = 10\n"
+    reference = z2pack.fp._read_mmn.get_m(sample("mmn/bi.mmn"))  # pylint: disable=protected-access
+    assert all(np.allclose(m, m_ref) for m, m_ref in zip(result, reference))
+
+
+def test_stale_mmn(linked_system):
+    """
+    Test that the .mmn file of the previous calculation is not read again.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = linked_system(
+            tmp_dir, command="[ -e done ] || cp bi.mmn wannier90.mmn; touch done"
+        )
+        system.get_mmn(KPT)
+        with pytest.raises(OSError):
+            system.get_mmn(KPT)
+
+
+def test_removed_input(linked_system):
+    """
+    Test that input files which were removed from the build folder are linked again.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = linked_system(tmp_dir)
+        system.get_mmn(KPT)
+        os.remove(os.path.join(tmp_dir, "build", "bi.mmn"))
+        system.get_mmn(KPT)
+
+
+def test_copy_inputs(linked_system):
+    """
+    Test that input files listed in 'copy_inputs' are copied for each calculation, such that the original file is not modified when the command rewrites them in place.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = linked_system(
+            tmp_dir,
+            command="cp bi.mmn wannier90.mmn; echo modified >> bi.mmn",
+            copy_inputs=["bi.mmn"],
+        )
+        system.get_mmn(KPT)
+        system.get_mmn(KPT)
+        mmn_file = os.path.join(tmp_dir, "build", "bi.mmn")
+        assert not os.path.islink(mmn_file)
+        assert not os.path.samefile(mmn_file, os.path.join(tmp_dir, "bi.mmn"))
+        with open(mmn_file, encoding="utf-8") as f:
+            assert f.read().count("modified") == 1
+        with open(os.path.join(tmp_dir, "bi.mmn"), encoding="utf-8") as f:
+            assert "modified" not in f.read()
+
+
+def test_invalid_copy_inputs(linked_system):
+    """
+    Test that 'copy_inputs' which are not among the input files raise.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with pytest.raises(ValueError):
+            linked_system(tmp_dir, copy_inputs=["CHGCAR"])
+
+
+def test_invalid_link_inputs(sample):
+    with pytest.raises(ValueError):
+        z2pack.fp.System(
+            input_files=[sample("mmn/bi.mmn")],
+            kpt_fct=z2pack.fp.kpoint.wannier90_full,
+            kpt_path="wannier90.win",
+            command="true",
+            link_inputs="copy",
+        )
@@ -0,0 +1,151 @@
+"""
+Tests for the on-disk cache of overlap matrices.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+
+
+@pytest.fixture
+def cached_system(mmn_system):
+    """
+    Create a first-principles system with an overlap cache, whose command counts how often it was called.
+    """
+
+    def inner(tmp_dir, **kwargs):
+        return mmn_system(
+            tmp_dir,
+            command=f"cp bi.mmn wannier90.mmn; echo >> {os.path.join(tmp_dir, 'count')}",
+            cache_folder=os.path.join(tmp_dir, "cache"),
+            **kwargs,
+        )
+
+    return inner
+
+
+def _kpt(s):
+    return [np.array([s, 0, t]) for t in np.linspace(0, 1, 10)]
+
+
+def test_cache_hit(cached_system, num_calls):
+    """
+    Test that the overlaps are re-used for the same k-points, also by a new system instance.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = cached_system(tmp_dir).get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 1
+        result_cached = cached_system(tmp_dir).get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 1
+        cached_system(tmp_dir).get_mmn(_kpt(0.5))
+        assert num_calls(tmp_dir) == 2
+    assert len(result_cached) == len(result)
+    assert all(np.array_equal(m, m_ref) for m, m_ref in zip(result_cached, result))
+
+
+def test_changed_input(cached_system, sample, num_calls):
+    """
+    Test that the cached overlaps are not used if the content of an input file changes.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        input_file = os.path.join(tmp_dir, "input.mmn")
+        shutil.copyfile(sample("mmn/bi.mmn"), input_file)
+        cached_system(tmp_dir, mmn_file=input_file).get_mmn(_kpt(0))
+        with open(input_file, "a", encoding="utf-8") as f:
+            f.write("\n")
+        cached_system(tmp_dir, mmn_file=input_file).get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+
+
+@pytest.mark.parametrize(
+    "kpt_kwargs",
+    [
+        dict(kpt_path="kpoints.win"),
+        dict(kpt_fct=lambda kpt: z2pack.fp.kpoint.wannier90_full(kpt) + "\n"),
+    ],
+)
+def test_changed_kpt_input(cached_system, num_calls, kpt_kwargs):
+    """
+    Test that the cached overlaps are not used if the k-points are written differently.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cached_system(tmp_dir).get_mmn(_kpt(0))
+        cached_system(tmp_dir, **kpt_kwargs).get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+        cached_system(tmp_dir, **kpt_kwargs).get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+
+
+def test_hash_inputs_once(cached_system, monkeypatch):
+    """
+    Test that each input file is hashed only once, although both the cache and the stages depend on it.
+    """
+    hashed_files = []
+    file_digest = z2pack.fp._first_principles._file_digest  # pylint: disable=protected-access
+
+    def _counting_file_digest(path):
+        hashed_files.append(path)
+        return file_digest(path)
+
+    monkeypatch.setattr(z2pack.fp._first_principles, "_file_digest", _counting_file_digest)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cached_system(
+            tmp_dir,
+            stages=[z2pack.fp.Stage(command="true", outputs=[])],
+            stage_folder=os.path.join(tmp_dir, "stages"),
+        )
+    assert len(hashed_files) == 1
+
+
+def test_surface_restart(cached_system, num_calls):
+    """
+    Test that re-running a surface calculation does not call the command again.
+    """
+    kwargs = dict(
+        surface=lambda s, t: [s, 0, t],
+        iterator=[10],
+        pos_tol=None,
+        gap_tol=None,
+        move_tol=None,
+        num_lines=3,
+    )
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        result = z2pack.surface.run(system=cached_system(tmp_dir), **kwargs)
+        assert num_calls(tmp_dir) == 3
+        result_cached = z2pack.surface.run(system=cached_system(tmp_dir), **kwargs)
+        assert num_calls(tmp_dir) == 3
+    assert result.wcc == result_cached.wcc
+
+
+def test_eviction(cached_system, num_calls):
+    """
+    Test that the least recently used overlaps are removed when the cache is too large.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = cached_system(tmp_dir)
+        system.get_mmn(_kpt(0))
+        entry_size = os.path.getsize(
+            os.path.join(tmp_dir, "cache", os.listdir(os.path.join(tmp_dir, "cache"))[0])
+        )
+        system = cached_system(tmp_dir, cache_max_size=2 * entry_size)
+        for s in [0.1, 0.2, 0.3]:
+            system.get_mmn(_kpt(s))
+        assert len(os.listdir(os.path.join(tmp_dir, "cache"))) == 2
+        assert num_calls(tmp_dir) == 4
+        # the most recently used overlaps are kept
+        system.get_mmn(_kpt(0.3))
+        assert num_calls(tmp_dir) == 4
+        system.get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 5
+
+
+def test_invalid_cache_max_size(cached_system):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with pytest.raises(ValueError):
+            cached_system(tmp_dir, cache_max_size=-1)
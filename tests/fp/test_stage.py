@@ -0,0 +1,124 @@
+"""
+Tests for pre-processing stages whose outputs are re-used between first-principles calculations.
+"""
+
+# pylint: disable=redefined-outer-name
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+
+
+@pytest.fixture
+def staged_system(mmn_system):
+    """
+    Create a first-principles system with a stage which counts how often it was called, and whose output is copied by the command.
+    """
+
+    def inner(
+        tmp_dir,
+        *,
+        link_inputs=None,
+        stage_command="mkdir pre; head -n 3 wannier90.win > pre/pre.out",
+        **stage_kwargs,
+    ):
+        stage_kwargs.setdefault("outputs", ["pre/pre.out"])
+        return mmn_system(
+            tmp_dir,
+            command="cp bi.mmn wannier90.mmn; cp pre/pre.out pre.used",
+            stages=[
+                z2pack.fp.Stage(
+                    command=f"echo >> {os.path.join(tmp_dir, 'count')}; {stage_command}",
+                    **stage_kwargs,
+                )
+            ],
+            stage_folder=os.path.join(tmp_dir, "stages"),
+            link_inputs=link_inputs,
+        )
+
+    return inner
+
+
+def _kpt(s, num_kpt=10):
+    return [np.array([s, 0, t]) for t in np.linspace(0, 1, num_kpt)]
+
+
+def test_stage_key(staged_system, num_calls):
+    """
+    Test that the stage output is re-used for calculations with the same key.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = staged_system(tmp_dir, key=lambda kpt: str(len(kpt)))
+        system.get_mmn(_kpt(0))
+        system.get_mmn(_kpt(0.5))
+        assert num_calls(tmp_dir) == 1
+        with open(os.path.join(tmp_dir, "build", "pre.used"), encoding="utf-8") as f:
+            # the output from the first calculation is used
+            assert f.read().split("\n") == z2pack.fp.kpoint.wannier90_full(_kpt(0)).split("\n")[
+                :3
+            ] + [""]
+        # the sample .mmn file does not match the number of k-points
+        with pytest.raises(ValueError):
+            system.get_mmn(_kpt(0, num_kpt=12))
+        assert num_calls(tmp_dir) == 2
+
+
+def test_default_key(staged_system, num_calls):
+    """
+    Test that by default, the stage output is re-used only for the same k-points.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = staged_system(tmp_dir)
+        system.get_mmn(_kpt(0))
+        system.get_mmn(_kpt(0.5))
+        assert num_calls(tmp_dir) == 2
+        system.get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+
+
+def test_missing_output(staged_system, num_calls):
+    """
+    Test that the stage is run again if it did not produce all outputs.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = staged_system(
+            tmp_dir, outputs=["pre/pre.out", "missing.out"], key=lambda kpt: str(len(kpt))
+        )
+        system.get_mmn(_kpt(0))
+        system.get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+
+
+def test_failed_stage(staged_system, num_calls):
+    """
+    Test that the outputs of a stage which failed are not stored.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = staged_system(
+            tmp_dir,
+            stage_command="mkdir pre; echo > pre/pre.out; false",
+            key=lambda kpt: str(len(kpt)),
+        )
+        system.get_mmn(_kpt(0))
+        system.get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 2
+        assert not os.path.exists(os.path.join(tmp_dir, "stages"))
+
+
+def test_stale_output(staged_system, num_calls):
+    """
+    Test that outputs left in the build folder by a previous calculation are not stored if the stage does not produce them again.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        system = staged_system(tmp_dir, link_inputs="symbolic", key=lambda kpt: str(len(kpt)))
+        system.get_mmn(_kpt(0))
+        assert num_calls(tmp_dir) == 1
+        # the stage output is now left in the build folder; a stage which
+        # does not produce it must not store it under the new key
+        system._stages[0].command = "true"  # pylint: disable=protected-access
+        system.get_mmn(_kpt(0.5))
+        assert not os.path.exists(os.path.join(tmp_dir, "build", "pre", "pre.out"))
+        assert len(os.listdir(os.path.join(tmp_dir, "stages"))) == 1
@@ -0,0 +1,97 @@
+"""
+Tests for the stand-in first-principles calculation.
+"""
+
+# pylint: disable=redefined-outer-name,protected-access
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+import z2pack
+from z2pack.fp import stand_in
+
+
+@pytest.fixture
+def stand_in_system():
+    """
+    Create a first-principles system which uses the stand-in calculation.
+    """
+
+    def inner(build_dir, **kwargs):
+        return z2pack.fp.System(
+            input_files=[],
+            kpt_fct=z2pack.fp.kpoint.wannier90_full,
+            kpt_path="wannier90.win",
+            command=f"{sys.executable} {z2pack.fp.stand_in.__file__} --num-bands 2 --seed 1",
+            build_folder=build_dir,
+            num_wcc=2,
+            **kwargs,
+        )
+
+    return inner
+
+
+@pytest.fixture
+def hm_reference():
+    """
+    Create the hm System with the same model as the stand-in calculation.
+    """
+    return z2pack.hm.System(stand_in.create_hamilton(num_bands=2, seed=1), bands=2)
+
+
+def _assert_wcc_equal(result, result_ref):
+    assert all(
+        z2pack._utils._get_max_move(wcc, wcc_ref) < 1e-8
+        for wcc, wcc_ref in zip(result.wcc, result_ref.wcc)
+    )
+
+
+def test_line(stand_in_system, hm_reference):
+    """
+    Test that the stand-in gives the same WCC as computing the model directly.
+    """
+    line = lambda t: [0.1, 0.2, t]
+    with tempfile.TemporaryDirectory() as build_dir:
+        result = z2pack.line.run(system=stand_in_system(build_dir), line=line, iterator=[9])
+    result_ref = z2pack.line.run(system=hm_reference, line=line, iterator=[9])
+    assert z2pack._utils._get_max_move(result.wcc, result_ref.wcc) < 1e-8
+
+
+def test_surface_batch(stand_in_system, hm_reference):
+    """
+    Test a surface calculation where the lines of each iteration are computed by a single stand-in calculation.
+    """
+    kwargs = dict(surface=lambda s, t: [s, 0.5 * s, t], num_lines=5, iterator=range(8, 15, 2))
+    with tempfile.TemporaryDirectory() as build_dir:
+        result = z2pack.surface.run(
+            system=stand_in_system(build_dir, kpt_fct_batch=z2pack.fp.kpoint.wannier90_full_batch),
+            **kwargs,
+        )
+    result_ref = z2pack.surface.run(system=hm_reference, **kwargs)
+    assert result.t == result_ref.t
+    _assert_wcc_equal(result, result_ref)
+
+
+def test_missing_nnkpts():
+    """
+    Test that the stand-in raises an error if the neighbours are not given explicitly.
+    """
+    with tempfile.TemporaryDirectory() as build_dir:
+        win_file = os.path.join(build_dir, "wannier90.win")
+        with open(win_file, "w", encoding="utf-8") as f:
+            f.write(z2pack.fp.kpoint.wannier90([np.array([0, 0, t]) for t in [0, 0.5, 1]]))
+        with pytest.raises(ValueError):
+            stand_in.main(["--win", win_file, "--mmn", os.path.join(build_dir, "out.mmn")])
+
+
+def test_gap():
+    """
+    Test that the occupied bands of the model are separated by a gap.
+    """
+    hamilton = stand_in.create_hamilton(num_bands=5, seed=3)
+    for k in np.random.default_rng(0).uniform(size=(20, 3)):
+        eigvals = np.linalg.eigvalsh(hamilton(k))
+        assert eigvals[4] < -0.1 < 0.1 < eigvals[5]
@@ -0,0 +1,133 @@
+"""Tests for the eigenstate cache."""
+
+# pylint: disable=redefined-outer-name,unused-wildcard-import
+
+import concurrent.futures
+import pickle
+
+import numpy as np
+import pytest
+import z2pack
+
+from hm_systems import *
+from tb_systems import *
+
+
+def test_tb_surface(tb_system, tb_surface):
+    """
+    Test that a surface calculation with cached eigenstates gives the same result as without caching, and that the equivalent lines at s=0 and s=1 are re-used.
+    """
+    system = z2pack.cache.EigenstateCache(tb_system)
+    result = z2pack.surface.run(system=system, surface=tb_surface)
+    result_ref = z2pack.surface.run(system=tb_system, surface=tb_surface)
+    assert all(
+        z2pack._utils._get_max_move(wcc, wcc_ref) < 1e-8  # pylint: disable=protected-access
+        for wcc, wcc_ref in zip(result.wcc, result_ref.wcc)
+    )
+    assert system.hits > 0
+    assert system.misses == len(system)
+
+
+def test_phase(tb_system):
+    """
+    Test that the eigenstates at k-points shifted by an inverse lattice vector have the correct phase.
+    """
+    system = z2pack.cache.EigenstateCache(tb_system)
+    kpt = [np.array([0.3, t, 0]) for t in np.linspace(0, 1, 6)]
+    kpt_shifted = [k + np.array([1, -1, 0]) for k in kpt]
+    system.get_eig(kpt)
+    assert system.misses == 5
+    eigs = system.get_eig(kpt_shifted)
+    assert system.misses == 5
+    eigs_ref = tb_system.get_eig(kpt_shifted)
+    for eig, eig_ref in zip(eigs, eigs_ref):
+        # compare the (gauge-invariant) projectors onto the occupied states
+        eig, eig_ref = np.array(eig), np.array(eig_ref)
+        assert np.allclose(eig.T @ eig.conj(), eig_ref.T @ eig_ref.conj())
+
+
+def test_max_size(weyl_line):
+    """
+    Test that the least recently used k-points are removed from a full cache.
+    """
+    system = z2pack.cache.EigenstateCache(
+        z2pack.hm.System(lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]])),
+        max_size=4,
+    )
+    result = z2pack.line.run(system=system, line=weyl_line)
+    assert len(system) == 4
+    assert result.wcc
+
+
+def test_invalid_max_size(simple_system):
+    with pytest.raises(ValueError):
+        z2pack.cache.EigenstateCache(simple_system, max_size=0)
+
+
+def test_get_eig_batch(tb_system):
+    """
+    Test that the missing k-points of several strings are computed in a single call to the wrapped system.
+    """
+    calls = []
+
+    class _CountingSystem(z2pack.system.EigenstateSystem):
+        independent_kpoints = True
+
+        def get_eig(self, kpt):
+            calls.append(len(kpt))
+            return tb_system.get_eig(kpt)
+
+    system = z2pack.cache.EigenstateCache(_CountingSystem(), pos=tb_system.pos)
+    assert system.independent_kpoints
+    kpt_list = [[np.array([s, t, 0]) for t in np.linspace(0, 1, 6)] for s in [0.1, 0.2, 0.3]]
+    eigs_batch = system.get_eig_batch(kpt_list)
+    # 5 new k-points per string, plus the k-point closing the string
+    assert calls == [16]
+    for kpt, eigs in zip(kpt_list, eigs_batch):
+        for eig, eig_ref in zip(eigs, tb_system.get_eig(kpt)):
+            eig, eig_ref = np.array(eig), np.array(eig_ref)
+            assert np.allclose(eig.T @ eig.conj(), eig_ref.T @ eig_ref.conj())
+
+
+def test_full_strings(tb_system):
+    """
+    Test that a wrapped system which does not declare ``independent_kpoints`` is called only with full k-point strings.
+    """
+    calls = []
+
+    class _StringSystem(z2pack.system.EigenstateSystem):
+        def get_eig(self, kpt):
+            calls.append(kpt)
+            return tb_system.get_eig(kpt)
+
+    system = z2pack.cache.EigenstateCache(_StringSystem(), pos=tb_system.pos)
+    assert not system.independent_kpoints
+    kpt_list = [[np.array([s, t, 0]) for t in np.linspace(0, 1, 6)] for s in [0.1, 0.2]]
+    system.get_eig(kpt_list[0])
+    # the shifted string is equivalent to the first one, and is not computed again
+    kpt_shifted = [k + np.array([1, 0, 0]) for k in kpt_list[0]]
+    eigs_batch = system.get_eig_batch([kpt_shifted, kpt_list[1]])
+    assert len(calls) == 2
+    assert all(np.allclose(k, k_ref) for k, k_ref in zip(calls[1], kpt_list[1]))
+    for kpt, eigs in zip([kpt_shifted, kpt_list[1]], eigs_batch):
+        for eig, eig_ref in zip(eigs, tb_system.get_eig(kpt)):
+            eig, eig_ref = np.array(eig), np.array(eig_ref)
+            assert np.allclose(eig.T @ eig.conj(), eig_ref.T @ eig_ref.conj())
+
+
+def test_threaded(tb_system, tb_surface):
+    """
+    Test that a cache which is shared between lines computed in concurrent threads stays consistent, and can be pickled.
+    """
+    system = z2pack.cache.EigenstateCache(tb_system, max_size=50)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        result = z2pack.surface.run(system=system, surface=tb_surface, executor=executor)
+    result_ref = z2pack.surface.run(system=tb_system, surface=tb_surface)
+    assert all(
+        z2pack._utils._get_max_move(wcc, wcc_ref) < 1e-8  # pylint: disable=protected-access
+        for wcc, wcc_ref in zip(result.wcc, result_ref.wcc)
+    )
+    assert len(system) == 50
+    system_copy = pickle.loads(pickle.dumps(system))
+    assert len(system_copy) == 50
+    assert system_copy.hits == system.hits
@@ -4,6 +4,7 @@
 
 import json
 
+import msgpack
 import numpy as np
 import pytest
 import z2pack
@@ -45,3 +46,41 @@ def test_invalid():
 
     with pytest.raises(TypeError):
         json.dumps(Bla(2), default=z2pack.io._encoding.encode)
+
+
+@pytest.mark.parametrize(
+    "obj",
+    [
+        np.array([1.0, 2.5, -3.0]),
+        np.array([[1 + 2j, 3 - 4j], [0, 1j]]),
+        np.arange(6, dtype=np.int32).reshape(2, 3, 1),
+        np.array([True, False]),
+        np.array(1 + 1j),
+        np.zeros((0, 3), dtype=complex),
+    ],
+)
+@pytest.mark.parametrize("serializer", [json, msgpack])
+def test_consistency_array(obj, serializer):
+    """
+    Test that numpy arrays are stored as a single block, and loaded with the same dtype, shape and values.
+    """
+    encoded = z2pack.io._encoding.encode(obj)
+    assert encoded["__ndarray__"]
+    res = serializer.loads(
+        serializer.dumps(obj, default=z2pack.io._encoding.encode),
+        object_hook=z2pack.io._encoding.decode,
+    )
+    assert res.dtype == obj.dtype
+    assert res.shape == obj.shape
+    assert np.all(res == obj)
+    # the loaded array can be changed
+    res[...] = 0
+
+
+def test_legacy_array():
+    """
+    Test that arrays saved as nested lists of complex numbers by older versions can still be loaded.
+    """
+    legacy = '[[{"__complex__": true, "real": 1.0, "imag": 2.0}, 3.0]]'
+    res = json.loads(legacy, object_hook=z2pack.io._encoding.decode)
+    assert np.allclose(res, [[1 + 2j, 3]])
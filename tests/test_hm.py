@@ -4,6 +4,8 @@
 
 import numpy as np
 import pytest
+import scipy.linalg as la
+import scipy.sparse
 import z2pack
 
 from hm_systems import weyl_surface  # pylint: disable=unused-import
@@ -50,3 +52,319 @@ def test_invalid_pos():
     """
     with pytest.raises(ValueError):
         z2pack.hm.System(hamilton=lambda k: np.array([[0]]), pos=[[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]])
+
+
+def _weyl_hamilton_batch(k):
+    """
+    Vectorized Weyl point Hamiltonian, taking an array of k-points.
+    """
+    k = np.asarray(k)
+    res = np.empty((len(k), 2, 2), dtype=complex)
+    res[:, 0, 0] = k[:, 2]
+    res[:, 0, 1] = k[:, 0] - 1j * k[:, 1]
+    res[:, 1, 0] = k[:, 0] + 1j * k[:, 1]
+    res[:, 1, 1] = -k[:, 2]
+    return res
+
+
+def test_hamilton_batch(weyl_surface, compare_wcc):
+    """
+    Test that the vectorized Hamiltonian evaluation gives the same result as the regular one.
+    """
+    system = z2pack.hm.System(_weyl_hamilton_batch, hamilton_batch=True)
+    res = z2pack.surface.run(system=system, surface=weyl_surface)
+    compare_wcc(res.wcc)
+
+
+def test_hamilton_batch_eigenstates():
+    """
+    Test that the eigenstates produced with the vectorized Hamiltonian match the regular ones, including the position-dependent phases.
+    """
+    pos = [[0.0, 0.0, 0.0], [0.5, 0.2, 0.1]]
+    kpt = [np.array([0.1, 0.2, t]) for t in np.linspace(0, 1, 7)]
+    system = z2pack.hm.System(
+        lambda k: _weyl_hamilton_batch([k])[0] + np.diag([1, -1]),
+        pos=pos,
+    )
+    system_batch = z2pack.hm.System(
+        lambda k: _weyl_hamilton_batch(k) + np.diag([1, -1]),
+        pos=pos,
+        hamilton_batch=True,
+    )
+    eigs = system.get_eig(kpt)
+    eigs_batch = system_batch.get_eig(kpt)
+    for eig, eig_batch in zip(eigs, eigs_batch):
+        # eigenstates are equal up to a phase
+        overlap = np.dot(np.conjugate(eig), np.array(eig_batch).T)
+        assert np.allclose(np.abs(overlap), np.eye(len(eig)))
+
+
+@pytest.mark.parametrize("hamilton_batch", [False, True])
+def test_get_eig_batch(hamilton_batch):
+    """
+    Test that computing several k-point strings at once gives the same eigenstates as computing them one by one, including the phase of the last eigenstate of each string.
+    """
+    system = z2pack.hm.System(
+        _weyl_hamilton_batch if hamilton_batch else lambda k: _weyl_hamilton_batch([k])[0],
+        pos=[[0.0, 0.0, 0.0], [0.5, 0.2, 0.1]],
+        hamilton_batch=hamilton_batch,
+    )
+    kpt_list = [
+        [np.array([0.1, 0.2, t]) for t in np.linspace(0, 1, 7)],
+        [np.array([0.3, t, 0.4]) for t in np.linspace(0, 1, 4)],
+    ]
+    assert system.supports_batch == hamilton_batch
+    eigs_batch = system.get_eig_batch(kpt_list)
+    assert len(eigs_batch) == 2
+    for kpt, eigs in zip(kpt_list, eigs_batch):
+        assert np.allclose(eigs, system.get_eig(kpt))
+
+
+@pytest.mark.parametrize("hamilton_batch", [False, True])
+def test_basis_overlap(hamilton_batch):
+    """
+    Test that a Hamiltonian given w.r.t. a non-orthogonal basis gives the same eigenstates as the equivalent Hamiltonian in the symmetrically orthogonalized basis.
+    """
+    ovl = np.array([[1.0, 0.3 - 0.1j], [0.3 + 0.1j, 1.2]])
+    ovl_sqrt = la.sqrtm(ovl)
+    ham_ortho = lambda k: _weyl_hamilton_batch(k) + np.diag([0.5, -0.5])
+    if hamilton_batch:
+        system = z2pack.hm.System(
+            lambda k: ovl_sqrt @ ham_ortho(k) @ ovl_sqrt,
+            basis_overlap=lambda k: np.array([ovl] * len(k)),
+            hamilton_batch=True,
+        )
+    else:
+        system = z2pack.hm.System(
+            lambda k: ovl_sqrt @ ham_ortho([k])[0] @ ovl_sqrt,
+            basis_overlap=lambda k: ovl,
+        )
+    system_ortho = z2pack.hm.System(ham_ortho, hamilton_batch=True)
+
+    kpt = [np.array([0.1, 0.2, t]) for t in np.linspace(0, 1, 5)]
+    for eig, eig_ortho in zip(system.get_eig(kpt), system_ortho.get_eig(kpt)):
+        # compare the (gauge-invariant) projectors onto the occupied states
+        eig, eig_ortho = np.array(eig), np.array(eig_ortho)
+        assert np.allclose(eig.T @ eig.conj(), eig_ortho.T @ eig_ortho.conj())
+
+
+def test_overlap_not_positive_definite():
+    """
+    Test that an overlap matrix which is not positive definite raises.
+    """
+    system = z2pack.hm.System(
+        lambda k: np.diag([1.0, -1.0]), basis_overlap=lambda k: np.diag([1.0, -1.0])
+    )
+    with pytest.raises(ValueError):
+        system.get_eig([np.array([0, 0, t]) for t in np.linspace(0, 1, 5)])
+
+
+@pytest.mark.parametrize("sparse_sigma", [None, 3.0])
+def test_sparse(sparse_sigma):
+    """
+    Test that a sparse Hamiltonian gives the same eigenstates as the equivalent dense Hamiltonian.
+    """
+    ham = lambda k: np.kron(np.diag([1.0, 4.0, 8.0]), _weyl_hamilton_batch([k])[0]) + np.kron(
+        np.diag([0.0, 10.0, 20.0]), np.eye(2)
+    )
+    system = z2pack.hm.System(ham, bands=[0, 1])
+    system_sparse = z2pack.hm.System(
+        lambda k: scipy.sparse.csr_matrix(ham(k)),
+        bands=[0, 1],
+        sparse_min_size=1,
+        sparse_sigma=sparse_sigma,
+    )
+    kpt = [np.array([0.1, 0.2, t]) for t in np.linspace(0, 1, 5)]
+    for eig, eig_sparse in zip(system.get_eig(kpt), system_sparse.get_eig(kpt)):
+        # compare the (gauge-invariant) projectors onto the selected states
+        eig, eig_sparse = np.array(eig), np.array(eig_sparse)
+        assert np.allclose(eig.T @ eig.conj(), eig_sparse.T @ eig_sparse.conj())
+
+
+def test_sparse_sigma_too_low():
+    """
+    Test that a sparse_sigma below the selected bands raises.
+    """
+    system = z2pack.hm.System(
+        lambda k: scipy.sparse.diags([-1.0, 1.0, 2.0, 3.0]).tocsr(),
+        bands=2,
+        sparse_min_size=1,
+        sparse_sigma=0.0,
+    )
+    with pytest.raises(ValueError):
+        system.get_eig([np.array([0, 0, t]) for t in np.linspace(0, 1, 5)])
+
+
+def _chain_hamilton(k, size=60):
+    """
+    Sparse Hamiltonian of a chain with on-site energies which depend on k, such that a band crosses into the lowest states along the line.
+    """
+    on_site = np.linspace(-1, 1, size)
+    on_site[-1] = -0.7 + 0.4 * np.cos(2 * np.pi * k[2])
+    hop = 0.05 * np.exp(2j * np.pi * k[2]) * np.ones(size - 1)
+    return scipy.sparse.diags([on_site, hop, hop.conj()], [0, 1, -1]).tocsr()
+
+
+@pytest.mark.parametrize("sparse_solver", ["arpack", "lobpcg"])
+def test_sparse_solver(sparse_solver):
+    """
+    Test that the sparse solvers give the same eigenstates as the dense solver, also when bands cross into the selected states along the line.
+    """
+    system = z2pack.hm.System(lambda k: _chain_hamilton(k).toarray(), bands=5)
+    system_sparse = z2pack.hm.System(
+        _chain_hamilton, bands=5, sparse_min_size=1, sparse_solver=sparse_solver
+    )
+    kpt = [np.array([0, 0, t]) for t in np.linspace(0, 1, 81)]
+    for eig, eig_sparse in zip(system.get_eig(kpt), system_sparse.get_eig(kpt)):
+        # compare the (gauge-invariant) projectors onto the selected states,
+        # up to the tolerance of the iterative solver
+        eig, eig_sparse = np.array(eig), np.array(eig_sparse)
+        assert np.allclose(eig.T @ eig.conj(), eig_sparse.T @ eig_sparse.conj(), atol=1e-7)
+
+
+def _supercell_hamilton(k, size=(10, 18)):
+    """
+    Sparse Hamiltonian of a two-band Chern insulator with on-site disorder, on a supercell with 360 orbitals.
+    """
+    num_x, num_y = size
+    num_sites = num_x * num_y
+    x_idx, y_idx = np.divmod(np.arange(num_sites), num_y)
+    on_site = -1 + 0.5 * (np.random.default_rng(0).random(num_sites) - 0.5)
+    pauli_x = np.array([[0, 1], [1, 0]])
+    pauli_y = np.array([[0, -1j], [1j, 0]])
+    pauli_z = np.array([[1, 0], [0, -1]])
+    # hoppings across the supercell boundary pick up the Bloch phase
+    phase_x = np.where(x_idx == num_x - 1, np.exp(2j * np.pi * k[0]), 1)
+    phase_y = np.where(y_idx == num_y - 1, np.exp(2j * np.pi * k[1]), 1)
+    neighbour_x = ((x_idx + 1) % num_x) * num_y + y_idx
+    neighbour_y = x_idx * num_y + (y_idx + 1) % num_y
+    ham = scipy.sparse.kron(scipy.sparse.diags(on_site), pauli_z)
+    for neighbour, phase, pauli in [
+        (neighbour_x, phase_x, pauli_x),
+        (neighbour_y, phase_y, pauli_y),
+    ]:
+        hop = scipy.sparse.csr_matrix(
+            (phase, (neighbour, np.arange(num_sites))), shape=(num_sites, num_sites)
+        )
+        hop = scipy.sparse.kron(hop, (pauli_z - 1j * pauli) / 2)
+        ham = ham + hop + hop.conj().T
+    return ham.tocsr()
+
+
+def test_lobpcg_supercell(monkeypatch):
+    """
+    Test that the 'lobpcg' solver converges on a realistically sized model, such that only the first k-point is computed with ARPACK.
+    """
+    arpack_calls = []
+    solve_arpack = z2pack.hm.System._solve_arpack  # pylint: disable=protected-access
+
+    def _counting_solve_arpack(self, ham, *, num_states):
+        arpack_calls.append(ham)
+        return solve_arpack(self, ham, num_states=num_states)
+
+    monkeypatch.setattr(z2pack.hm.System, "_solve_arpack", _counting_solve_arpack)
+
+    system = z2pack.hm.System(lambda k: _supercell_hamilton(k).toarray(), bands=8)
+    system_sparse = z2pack.hm.System(_supercell_hamilton, bands=8, sparse_solver="lobpcg")
+    kpt = [np.array([0.3, t, 0]) for t in np.linspace(0, 1, 21)]
+    for eig, eig_sparse in zip(system.get_eig(kpt), system_sparse.get_eig(kpt)):
+        eig, eig_sparse = np.array(eig), np.array(eig_sparse)
+        assert np.allclose(eig.T @ eig.conj(), eig_sparse.T @ eig_sparse.conj(), atol=1e-7)
+    assert len(arpack_calls) == 1
+
+
+def test_lobpcg_fallback(monkeypatch):
+    """
+    Test that a k-point where the 'lobpcg' solver fails is computed with ARPACK, while the solver is still used for the following k-points.
+    """
+    lobpcg_hams = []
+    arpack_hams = []
+    solve_lobpcg = z2pack.hm.System._solve_lobpcg  # pylint: disable=protected-access
+    solve_arpack = z2pack.hm.System._solve_arpack  # pylint: disable=protected-access
+
+    def _failing_solve_lobpcg(self, ham, guess, *, num_states, precondition):
+        if not any(ham is other for other in lobpcg_hams):
+            lobpcg_hams.append(ham)
+        # the solver fails at the third k-point, also with a new factorization
+        if len(lobpcg_hams) > 2 and ham is lobpcg_hams[2]:
+            return None, 0
+        return solve_lobpcg(self, ham, guess, num_states=num_states, precondition=precondition)
+
+    def _counting_solve_arpack(self, ham, *, num_states):
+        arpack_hams.append(ham)
+        return solve_arpack(self, ham, num_states=num_states)
+
+    monkeypatch.setattr(z2pack.hm.System, "_solve_lobpcg", _failing_solve_lobpcg)
+    monkeypatch.setattr(z2pack.hm.System, "_solve_arpack", _counting_solve_arpack)
+
+    system = z2pack.hm.System(lambda k: _chain_hamilton(k).toarray(), bands=5)
+    system_sparse = z2pack.hm.System(
+        _chain_hamilton, bands=5, sparse_min_size=1, sparse_solver="lobpcg"
+    )
+    kpt = [np.array([0, 0, t]) for t in np.linspace(0, 1, 21)]
+    for eig, eig_sparse in zip(system.get_eig(kpt), system_sparse.get_eig(kpt)):
+        eig, eig_sparse = np.array(eig), np.array(eig_sparse)
+        assert np.allclose(eig.T @ eig.conj(), eig_sparse.T @ eig_sparse.conj(), atol=1e-7)
+    assert len(lobpcg_hams) == 19
+    assert any(ham is lobpcg_hams[2] for ham in arpack_hams)
+
+
+def test_lobpcg_preconditioner():
+    """
+    Test that the shift-invert preconditioner reduces the number of LOBPCG iterations, also when its factorization is reused from the previous k-point.
+    """
+    system = z2pack.hm.System(
+        _supercell_hamilton, bands=8, sparse_solver="lobpcg", lobpcg_maxiter=1000
+    )
+    ham_previous, ham = (_supercell_hamilton([0.3, t, 0]) for t in (0, 0.05))
+    _, guess = scipy.sparse.linalg.eigsh(ham_previous, k=10, which="SA")
+    num_iter = {}
+    for name, precondition in [
+        ("none", lambda vectors: vectors),
+        ("reused", z2pack.hm._ShiftInvertPreconditioner(ham_previous, guess)),
+        ("new", z2pack.hm._ShiftInvertPreconditioner(ham, guess)),
+    ]:
+        # pylint: disable=protected-access
+        eigvecs, num_iter[name] = system._solve_lobpcg(
+            ham, guess, num_states=8, precondition=precondition
+        )
+        assert eigvecs is not None
+    assert num_iter["new"] <= num_iter["reused"] < num_iter["none"]
+
+
+@pytest.mark.parametrize("factorization_time", [0.0, np.inf])
+def test_lobpcg_reuse_factorization(monkeypatch, factorization_time):
+    """
+    Test that the factorization of the preconditioner is reused for the following k-points only if that takes less time than factorizing again.
+    """
+    preconditioners = []
+    init = z2pack.hm._ShiftInvertPreconditioner.__init__  # pylint: disable=protected-access
+
+    def _timed_init(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._factorization_time = factorization_time  # pylint: disable=protected-access
+        preconditioners.append(self)
+
+    monkeypatch.setattr(z2pack.hm._ShiftInvertPreconditioner, "__init__", _timed_init)
+
+    system = z2pack.hm.System(_supercell_hamilton, bands=8, sparse_solver="lobpcg")
+    system.get_eig([np.array([0.3, t, 0]) for t in np.linspace(0, 1, 21)])
+    if factorization_time == 0:
+        # all k-points except the first (computed with ARPACK) are factorized
+        assert len(preconditioners) == 19
+    else:
+        assert len(preconditioners) < 19
+
+
+def test_invalid_sparse_solver():
+    """
+    Test that invalid values or combinations for the sparse solver raise.
+    """
+    with pytest.raises(ValueError):
+        z2pack.hm.System(_chain_hamilton, sparse_solver="invalid")
+    with pytest.raises(ValueError):
+        z2pack.hm.System(_chain_hamilton, sparse_solver="lobpcg", sparse_sigma=0.0)
+    with pytest.raises(ValueError):
+        z2pack.hm.System(_chain_hamilton, sparse_solver="lobpcg", lobpcg_tol=0)
+    with pytest.raises(ValueError):
+        z2pack.hm.System(_chain_hamilton, sparse_solver="lobpcg", lobpcg_maxiter=0)
@@ -5,6 +5,7 @@
 import json
 import tempfile
 
+import msgpack
 import numpy as np
 import pytest
 import z2pack
@@ -222,3 +223,339 @@ def test_invalid_path(simple_system, simple_line):
     """
     with pytest.raises(ValueError):
         z2pack.line.run(system=simple_system, line=simple_line, save_file="invalid/path/file.json")
+
+
+def test_nested_iterator():
+    """Test the k-point numbers created by the nested iterator."""
+    assert z2pack.line.nested_iterator(start=9, stop=65) == [9, 17, 33, 65]
+    assert z2pack.line.nested_iterator(start=3, stop=10) == [3, 5, 9]
+    with pytest.raises(ValueError):
+        z2pack.line.nested_iterator(start=1)
+
+
+class CountingSystem(z2pack.system.EigenstateSystem):
+    """
+    EigenstateSystem which counts the number of calculated k-points.
+    """
+
+    independent_kpoints = True
+
+    def __init__(self, system):
+        self.system = system
+        self.num_kpt = 0
+
+    def get_eig(self, kpt):
+        self.num_kpt += len(kpt) - 1
+        return self.system.get_eig(kpt)
+
+
+def test_nested_reuse():
+    """
+    Test that the eigenstates are re-used when the k-point strings are nested.
+    """
+    system = CountingSystem(
+        z2pack.hm.System(lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]]))
+    )
+    result = z2pack.line.run(
+        system=system,
+        line=weyl_line_creator(0.1),
+        iterator=z2pack.line.nested_iterator(start=9, stop=65),
+        pos_tol=1e-12,
+    )
+    assert result.ctrl_states["StepCounter"] == 65
+    assert system.num_kpt == 64
+    result_direct = z2pack.line.run(
+        system=system.system, line=weyl_line_creator(0.1), iterator=[65], pos_tol=None
+    )
+    assert _get_max_move(result.wcc, result_direct.wcc) < 1e-8
+
+
+def test_nested_no_reuse():
+    """
+    Test that the eigenstates are not re-used for systems which do not compute the k-points independently, such that they are called only with full k-point strings.
+    """
+    calls = []
+
+    class StringSystem(z2pack.system.EigenstateSystem):
+        """
+        EigenstateSystem which records the k-point strings it is called with.
+        """
+
+        def __init__(self, system):
+            self.system = system
+
+        def get_eig(self, kpt):
+            calls.append(len(kpt))
+            return self.system.get_eig(kpt)
+
+    z2pack.line.run(
+        system=StringSystem(
+            z2pack.hm.System(
+                lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]])
+            )
+        ),
+        line=weyl_line_creator(0.1),
+        iterator=z2pack.line.nested_iterator(start=9, stop=33),
+        pos_tol=1e-12,
+    )
+    assert calls == [9, 17, 33]
+
+
+def test_evaluate_batch():
+    """
+    Test that the lines computed in lock-step are returned in order, each as soon as it and the ones before it have finished.
+    """
+
+    def steps(num_steps):
+        for _ in range(num_steps):
+            yield [num_steps]
+        return num_steps
+
+    batch_sizes = []
+
+    def batch_fct(kpt_list):
+        batch_sizes.append(len(kpt_list))
+        return kpt_list
+
+    results = z2pack.line._run._evaluate_batch(  # pylint: disable=protected-access
+        [steps(1), steps(3), steps(2), steps(0)], batch_fct
+    )
+    assert next(results) == 1
+    assert batch_sizes == [3]
+    assert list(results) == [3, 2, 0]
+    assert batch_sizes == [3, 2, 1]
+
+
+def test_tb_sparse(tb_system, tb_model, tb_line):
+    """
+    Test that the sparse tight-binding calculation gives the same result as the dense one.
+    """
+    result = z2pack.line.run(system=tb_system, line=tb_line)
+    result_sparse = z2pack.line.run(
+        system=z2pack.tb.System(tb_model, sparse=True, sparse_min_size=1), line=tb_line
+    )
+    assert _get_max_move(result.wcc, result_sparse.wcc) < 1e-8
+
+
+def test_tb_batch(tb_model, tb_line):
+    """
+    Test that the tight-binding Hamiltonian is evaluated for all k-points of a line at once, and gives the same result as evaluating it separately for each k-point.
+    """
+    system = z2pack.tb.System(tb_model)
+    assert system._hamilton_batch  # pylint: disable=protected-access
+    result = z2pack.line.run(system=system, line=tb_line)
+    result_single = z2pack.line.run(
+        system=z2pack.tb.System(tb_model, hamilton_batch=False), line=tb_line
+    )
+    assert _get_max_move(result.wcc, result_single.wcc) < 1e-8
+
+
+def test_tb_no_batch(tb_model):
+    """
+    Test that the Hamiltonian is evaluated for each k-point separately if the tight-binding model does not support arrays of k-points.
+    """
+
+    class SingleKModel:  # pylint: disable=too-few-public-methods
+        """Wraps a tight-binding model, allowing only a single k-point in the Hamiltonian."""
+
+        def __init__(self, model):
+            self.pos = model.pos
+            self.occ = model.occ
+            self.dim = model.dim
+            self.size = model.size
+            self._model = model
+
+        def hamilton(self, k):
+            if np.ndim(k) != 1:
+                raise ValueError("Only a single k-point is supported.")
+            return self._model.hamilton(k)
+
+    system = z2pack.tb.System(SingleKModel(tb_model))
+    assert not system._hamilton_batch  # pylint: disable=protected-access
+    assert system.get_eig([np.array([0, 0, t]) for t in np.linspace(0, 1, 5)])
+
+
+def test_streaming(weyl_system, weyl_line):
+    """
+    Test that the streaming mode gives the same result as keeping the eigenstates / overlaps, and that the result can be saved and loaded.
+    """
+    result_ref = z2pack.line.run(system=weyl_system, line=weyl_line)
+    with tempfile.NamedTemporaryFile() as temp_file:
+        result = z2pack.line.run(
+            system=weyl_system, line=weyl_line, streaming=True, save_file=temp_file.name
+        )
+        result_loaded = z2pack.io.load(temp_file.name, serializer=json)
+    assert isinstance(result.data, z2pack.line.WilsonLineData)
+    assert np.allclose(result.wilson, result_ref.wilson)
+    assert _get_max_move(result.wcc, result_ref.wcc) < 1e-12
+    assert_res_equal(result, result_loaded)
+    with pytest.raises(AttributeError):
+        result.eigenstates  # pylint: disable=pointless-statement
+    with pytest.raises(AttributeError):
+        result.overlaps  # pylint: disable=pointless-statement
+
+
+@pytest.mark.parametrize("independent_kpoints", [True, False])
+def test_streaming_chunks(weyl_line, independent_kpoints):
+    """
+    Test that the streaming mode requests the eigenstates in chunks if the system computes the k-points independently, and the full k-point strings otherwise.
+    """
+    calls = []
+
+    class RecordingSystem(z2pack.system.EigenstateSystem):
+        """
+        EigenstateSystem which records the number of k-points it is called with.
+        """
+
+        def __init__(self, system):
+            self.system = system
+            self.independent_kpoints = independent_kpoints
+
+        def get_eig(self, kpt):
+            calls.append(len(kpt))
+            return self.system.get_eig(kpt)
+
+    system = z2pack.hm.System(
+        lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]])
+    )
+    result = z2pack.line.run(
+        system=RecordingSystem(system), line=weyl_line, streaming=True, iterator=[41], pos_tol=None
+    )
+    result_ref = z2pack.line.run(system=system, line=weyl_line, iterator=[41], pos_tol=None)
+    assert np.allclose(result.wilson, result_ref.wilson)
+    if independent_kpoints:
+        chunk_size = z2pack.line._run._STREAMING_CHUNK_SIZE  # pylint: disable=protected-access
+        assert max(calls) == chunk_size + 1
+        assert sum(calls) == 40 + len(calls)
+    else:
+        assert calls == [41]
+
+
+def test_from_eigenstates(weyl_line):
+    """
+    Test that the Wilson loop created from the eigenstates is the same as the one created from their overlap matrices.
+    """
+    system = z2pack.hm.System(
+        lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]])
+    )
+    eigenstates = system.get_eig([np.array(weyl_line(t)) for t in np.linspace(0, 1, 11)])
+    overlaps = z2pack.line.EigenstateLineData(eigenstates).overlaps
+    for unitarize in [False, True]:
+        assert np.allclose(
+            z2pack.line.WilsonLineData.from_eigenstates(eigenstates, unitarize=unitarize).wilson,
+            z2pack.line.WilsonLineData.from_overlaps(overlaps, unitarize=unitarize).wilson,
+            rtol=0,
+            atol=1e-14,
+        )
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_unitarize(weyl_system, weyl_line, streaming):
+    """
+    Test that the Wilson loop is unitary when the overlap matrices are unitarized, and that the WCC are consistent with the plain product of overlap matrices.
+    """
+    result = z2pack.line.run(
+        system=weyl_system, line=weyl_line, unitarize=True, streaming=streaming
+    )
+    result_ref = z2pack.line.run(system=weyl_system, line=weyl_line, streaming=streaming)
+    wilson = np.array(result.wilson)
+    assert np.allclose(wilson @ wilson.conj().T, np.eye(len(wilson)))
+    assert _get_max_move(result.wcc, result_ref.wcc) < 1e-2
+    with tempfile.NamedTemporaryFile() as temp_file:
+        z2pack.io.save(result, temp_file.name, serializer=json)
+        result_loaded = z2pack.io.load(temp_file.name, serializer=json)
+    assert np.allclose(result_loaded.wilson, result.wilson)
+
+
+@pytest.mark.parametrize(
+    "keep_data, data_type",
+    [("wcc", z2pack.line.WccLineData), ("wilson", z2pack.line.WilsonLineData)],
+)
+def test_keep_data(weyl_system, weyl_line, keep_data, data_type):
+    """
+    Test that the data of the converged line is reduced according to the 'keep_data' policy, without changing the WCC, and that the saved result contains only the reduced data.
+    """
+    result_ref = z2pack.line.run(system=weyl_system, line=weyl_line)
+    with tempfile.NamedTemporaryFile() as temp_file:
+        result = z2pack.line.run(
+            system=weyl_system, line=weyl_line, keep_data=keep_data, save_file=temp_file.name
+        )
+        result_loaded = z2pack.io.load(temp_file.name, serializer=json)
+    assert type(result.data) is data_type  # pylint: disable=unidiomatic-typecheck
+    assert type(result_loaded.data) is data_type  # pylint: disable=unidiomatic-typecheck
+    assert _get_max_move(result.wcc, result_ref.wcc) < 1e-12
+    assert result.gap_pos == result_ref.gap_pos
+    assert result.convergence_report == result_ref.convergence_report
+    assert_res_equal(result, result_loaded)
+    with pytest.raises(AttributeError):
+        result.overlaps  # pylint: disable=pointless-statement
+
+
+def test_reduced_precision(weyl_system, weyl_line):
+    """
+    Test that the Wilson loop is kept in single precision, also when saving and loading the result.
+    """
+    result_ref = z2pack.line.run(system=weyl_system, line=weyl_line)
+    result = z2pack.line.run(
+        system=weyl_system, line=weyl_line, keep_data="wilson", reduced_precision=True
+    )
+    assert result.wilson.dtype == np.complex64
+    assert _get_max_move(result.wcc, result_ref.wcc) < 1e-6
+    with tempfile.NamedTemporaryFile() as temp_file:
+        z2pack.io.save(result, temp_file.name, serializer=msgpack)
+        result_loaded = z2pack.io.load(temp_file.name, serializer=msgpack)
+    assert result_loaded.wilson.dtype == np.complex64
+    assert np.all(result_loaded.wilson == result.wilson)
+
+
+@pytest.mark.parametrize(
+    "keep_data, reduced_precision", [("eigenstates", False), ("all", True), ("wcc", True)]
+)
+def test_invalid_keep_data(simple_system, simple_line, keep_data, reduced_precision):
+    """
+    Test that invalid 'keep_data' values, or 'reduced_precision' without keep_data='wilson', raise an error.
+    """
+    with pytest.raises(ValueError):
+        z2pack.line.run(
+            system=simple_system,
+            line=simple_line,
+            keep_data=keep_data,
+            reduced_precision=reduced_precision,
+        )
+
+
+def test_tree_product():
+    """
+    Test that the tree-structured product of matrices is the same as the sequential product.
+    """
+    matrices = np.random.default_rng(0).normal(size=(11, 3, 3))
+    for num in range(1, 12):
+        assert np.allclose(
+            z2pack.line._data._tree_product(matrices[:num]),  # pylint: disable=protected-access
+            np.linalg.multi_dot([np.eye(3)] + list(matrices[:num])),
+        )
+
+
+def test_extrapolate():
+    """
+    Test that extrapolating the WCC converges with fewer k-points than comparing consecutive iterations.
+    """
+    system = CountingSystem(
+        z2pack.hm.System(lambda k: np.array([[k[2], k[0] - 1j * k[1]], [k[0] + 1j * k[1], -k[2]]]))
+    )
+    result = z2pack.line.run(
+        system=system,
+        line=weyl_line_creator(0.5),
+        pos_tol=1e-4,
+        iterator=range(8, 200, 2),
+        extrapolate=True,
+    )
+    assert "ExtrapolationCheck" in result.convergence_report
+    assert all(result.convergence_report.values())
+    num_kpt = system.num_kpt
+    system.num_kpt = 0
+    result_ref = z2pack.line.run(
+        system=system, line=weyl_line_creator(0.5), pos_tol=1e-4, iterator=range(8, 200, 2)
+    )
+    assert num_kpt < system.num_kpt
+    assert _get_max_move(result.wcc, result_ref.wcc) < 1e-3
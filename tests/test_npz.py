@@ -0,0 +1,154 @@
+"""Tests for saving and loading results in the binary 'npz' format."""
+
+# pylint: disable=redefined-outer-name,unused-wildcard-import
+
+import concurrent.futures
+import os
+import pickle
+
+import numpy as np
+import pytest
+import z2pack
+
+from hm_systems import *
+
+
+def assert_res_equal(result1, result2):
+    """
+    Checks that two results are equal.
+    """
+    assert result1.wcc == result2.wcc
+    assert np.allclose(result1.wilson, result2.wilson)
+    assert result1.gap_size == result2.gap_size
+    assert result1.gap_pos == result2.gap_pos
+    assert result1.ctrl_states == result2.ctrl_states
+    assert result1.convergence_report == result2.convergence_report
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_surface(weyl_system, weyl_surface, streaming, tmp_path):
+    """
+    Test saving and loading a surface result.
+    """
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, streaming=streaming)
+    z2pack.io.save(result, str(tmp_path / "result.npz"))
+    result_loaded = z2pack.io.load(str(tmp_path / "result.npz"))
+    assert isinstance(result_loaded, z2pack.surface.SurfaceResult)
+    assert result_loaded.t == result.t
+    assert_res_equal(result, result_loaded)
+    if not streaming:
+        for line, line_loaded in zip(result.lines, result_loaded.lines):
+            assert np.allclose(line.overlaps, line_loaded.overlaps)
+
+
+def test_line(weyl_system, weyl_line, tmp_path):
+    """
+    Test saving and loading a line result with an explicitly given serializer.
+    """
+    result = z2pack.line.run(system=weyl_system, line=weyl_line)
+    z2pack.io.save(result, str(tmp_path / "result"), serializer="npz")
+    assert_res_equal(result, z2pack.io.load(str(tmp_path / "result"), serializer="npz"))
+
+
+def test_volume_restart(simple_system, simple_volume, tmp_path):
+    """
+    Test a volume calculation which is saved in the 'npz' format, and restarted from it.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    kwargs = dict(volume=simple_volume, save_file=str(tmp_path / "result.npz"))
+    result = z2pack.volume.run(system=simple_system, **kwargs)
+    result_loaded = z2pack.volume.run(system=Mock(), load=True, load_quiet=False, **kwargs)
+    assert result_loaded.s == result.s
+    assert_res_equal(result, result_loaded)
+
+
+def test_lazy(weyl_system, weyl_surface, tmp_path):
+    """
+    Test that the eigenstates or overlaps are not loaded when only the WCC are needed, but can still be accessed after the file is replaced or the result is pickled.
+    """
+    file_path = str(tmp_path / "result.npz")
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface)
+    z2pack.io.save(result, file_path)
+    result_loaded = z2pack.io.load(file_path)
+    z2pack.invariant.chern(result_loaded)
+    assert result_loaded.gap_size == result.gap_size
+    for line in result_loaded.lines:
+        assert not {"eigenstates", "overlaps"} & set(vars(line.result.data))
+
+    os.remove(file_path)
+    assert np.allclose(result_loaded.lines[0].overlaps, result.lines[0].overlaps)
+
+    z2pack.io.save(result, file_path)
+    result_loaded = pickle.loads(pickle.dumps(z2pack.io.load(file_path)))
+    assert np.allclose(result_loaded.lines[1].overlaps, result.lines[1].overlaps)
+
+
+def _is_open(file_path):
+    """
+    Checks whether the file is opened by the current process.
+    """
+    if not os.path.isdir("/proc/self/fd"):
+        pytest.skip("Open files can not be listed on this platform.")
+    fd_dir = "/proc/self/fd"
+    return any(
+        os.path.realpath(os.path.join(fd_dir, fd)) == os.path.realpath(file_path)
+        for fd in os.listdir(fd_dir)
+    )
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_close(weyl_system, weyl_surface, streaming, tmp_path):
+    """
+    Test that the file is closed once all lazily loaded arrays have been read, or immediately if there are none.
+    """
+    file_path = str(tmp_path / "result.npz")
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, streaming=streaming)
+    z2pack.io.save(result, file_path)
+    result_loaded = z2pack.io.load(file_path)
+    assert _is_open(file_path) != streaming
+    for line in result_loaded.lines:
+        line.wilson  # pylint: disable=pointless-statement
+    assert not _is_open(file_path)
+    assert_res_equal(result, result_loaded)
+
+
+def test_replaced_after_close(weyl_system, weyl_surface, tmp_path):
+    """
+    Test that reading from a closed (here: pickled) result raises if the file has been replaced, instead of mixing data from two files.
+    """
+    file_path = str(tmp_path / "result.npz")
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface)
+    z2pack.io.save(result, file_path)
+    result_loaded = pickle.loads(pickle.dumps(z2pack.io.load(file_path)))
+    assert np.allclose(result_loaded.lines[0].overlaps, result.lines[0].overlaps)
+    z2pack.io.save(z2pack.surface.run(system=weyl_system, surface=weyl_surface), file_path)
+    with pytest.raises(ValueError):
+        result_loaded.lines[1].overlaps  # pylint: disable=pointless-statement
+
+
+def test_threads(weyl_system, weyl_surface, tmp_path):
+    """
+    Test that the lazily loaded arrays can be read from several threads at once, while the file is closed after the last one.
+    """
+    file_path = str(tmp_path / "result.npz")
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface)
+    z2pack.io.save(result, file_path)
+    result_loaded = z2pack.io.load(file_path)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        overlaps = list(executor.map(lambda line: line.overlaps, result_loaded.lines))
+    for overlaps_loaded, line in zip(overlaps, result.lines):
+        assert np.allclose(overlaps_loaded, line.overlaps)
+    assert not _is_open(file_path)
+
+
+def test_invalid_type(tmp_path):
+    """
+    Test that saving an object which is not a result raises an error.
+    """
+    with pytest.raises(TypeError):
+        z2pack.io.save([1, 2, 3], str(tmp_path / "result.npz"))
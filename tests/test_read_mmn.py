@@ -17,3 +17,39 @@ def test_read(compare_data, sample):
 def test_false_path():
     with pytest.raises(IOError):
         z2pack.fp._read_mmn.get_m("invalid_path")
+
+
+def test_shape(sample):
+    """
+    Test that the overlap matrices are returned as one contiguous array.
+    """
+    overlaps = z2pack.fp._read_mmn.get_m(sample("mmn/bi.mmn"))
+    assert overlaps.shape == (9, 10, 10)
+    assert overlaps.flags["C_CONTIGUOUS"]
+
+
+def test_skip_blocks(tmp_path):
+    """
+    Test that only the blocks between neighbouring k-points are read, also when the inverse lattice vectors are negative.
+    """
+    num_bands = 2
+    rng = np.random.default_rng(0)
+    blocks = {
+        (1, 2): rng.normal(size=(2, 2)) + 1j * rng.normal(size=(2, 2)),
+        (2, 1): np.eye(2),
+        (2, 3): rng.normal(size=(2, 2)) + 1j * rng.normal(size=(2, 2)),
+        (3, 1): rng.normal(size=(2, 2)) + 1j * rng.normal(size=(2, 2)),
+        (3, 2): np.eye(2),
+    }
+    mmn_file = tmp_path / "test.mmn"
+    with open(mmn_file, "w", encoding="utf-8") as f:
+        f.write("Created for testing\n")
+        f.write(f"{num_bands:>12}{3:>12}{2:>12}\n")
+        for (k1, k2), matrix in blocks.items():
+            f.write(f"{k1:>5}{k2:>5}    0   -1    0\n")
+            for value in matrix.T.flatten():
+                f.write(f"{value.real:>18.12f}{value.imag:>18.12f}\n")
+    overlaps = z2pack.fp._read_mmn.get_m(str(mmn_file))
+    assert overlaps.shape == (3, 2, 2)
+    for overlap, key in zip(overlaps, [(1, 2), (2, 3), (3, 1)]):
+        assert np.allclose(overlap, blocks[key], atol=1e-11)
@@ -53,3 +53,18 @@ def test_stopiteration(num_steps):
             i = next(step_counter)["num_steps"]
             assert step_counter.state == i
     assert i == int((3 * num_steps - 1) / 2) * 2
+
+
+def test_skip_to():
+    """
+    Test that values smaller than the one given to skip_to are skipped, and that the last value is used if the iterator stops before.
+    """
+    step_counter = StepCounter(iterator=range(0, 20, 2))
+    assert next(step_counter)["num_steps"] == 2
+    step_counter.skip_to(9)
+    assert next(step_counter)["num_steps"] == 10
+    assert next(step_counter)["num_steps"] == 12
+    step_counter.skip_to(100)
+    assert next(step_counter)["num_steps"] == 18
+    with pytest.raises(StopIteration):
+        next(step_counter)
@@ -2,6 +2,8 @@
 
 # pylint: disable=redefined-outer-name,unused-wildcard-import,too-many-arguments
 
+import concurrent.futures
+import copy
 import json
 import os
 import pickle
@@ -121,6 +123,129 @@ def test_tb(
 
 
 # saving tests
+def _tb_surface(s, t):
+    """
+    Surface for the tight-binding tests, defined at module level such that it can be pickled.
+    """
+    return [s, t, 0]
+
+
+@pytest.mark.parametrize(
+    "executor_type",
+    [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor],
+)
+def test_executor(tb_system, executor_type):
+    """
+    Test that computing the lines with an executor gives the same result as computing them one after another.
+    """
+    result_ref = z2pack.surface.run(system=tb_system, surface=_tb_surface, num_lines=5)
+    with executor_type(max_workers=2) as executor:
+        result = z2pack.surface.run(
+            system=tb_system, surface=_tb_surface, num_lines=5, executor=executor
+        )
+    assert_res_equal(result, result_ref)
+
+
+class _PerLineSystem(z2pack.system.EigenstateSystem):
+    """
+    Forwards the eigenstates of a system, without computing several lines at once.
+    """
+
+    def __init__(self, system):
+        self._system = system
+
+    def get_eig(self, kpt):
+        return self._system.get_eig(kpt)
+
+
+class _BatchSystem(z2pack.system.EigenstateSystem):
+    """
+    Forwards the eigenstates of a system, counting the calls with several lines.
+    """
+
+    supports_batch = True
+
+    def __init__(self, system):
+        self._system = system
+        self.batch_sizes = []
+
+    def get_eig(self, kpt):
+        raise AssertionError("The eigenstates should be computed for several lines at once.")
+
+    def get_eig_batch(self, kpt_list):
+        self.batch_sizes.append(len(kpt_list))
+        return [self._system.get_eig(kpt) for kpt in kpt_list]
+
+
+class _OverlapBatchSystem(z2pack.system.OverlapSystem):
+    """
+    Computes the overlap matrices from the eigenstates of a system, for several lines at once.
+    """
+
+    supports_batch = True
+
+    def __init__(self, system):
+        self._system = system
+        self.batch_sizes = []
+
+    def get_mmn(self, kpt):
+        raise AssertionError("The overlaps should be computed for several lines at once.")
+
+    def get_mmn_batch(self, kpt_list):
+        self.batch_sizes.append(len(kpt_list))
+        return [
+            z2pack.line.EigenstateLineData(self._system.get_eig(kpt)).overlaps for kpt in kpt_list
+        ]
+
+
+@pytest.mark.parametrize("batch_system_type", [_BatchSystem, _OverlapBatchSystem])
+def test_batch(tb_system, tb_surface, batch_system_type):
+    """
+    Test that systems which compute several lines at once are used for all lines of each iteration, and give the same result as computing the lines one by one.
+    """
+    result_ref = z2pack.surface.run(system=_PerLineSystem(tb_system), surface=tb_surface)
+    system = batch_system_type(tb_system)
+    result = z2pack.surface.run(system=system, surface=tb_surface)
+    assert result.t == result_ref.t
+    assert all(
+        z2pack._utils._get_max_move(wcc, wcc_ref) < 1e-8  # pylint: disable=protected-access
+        for wcc, wcc_ref in zip(result.wcc, result_ref.wcc)
+    )
+    # the first iteration computes all initial lines together
+    assert system.batch_sizes[0] == 11
+    assert sum(system.batch_sizes) > len(system.batch_sizes)
+
+
+def test_no_batch(tb_system, tb_surface):
+    """
+    Test that systems which implement the batch method, but do not declare ``supports_batch``, are called once per line.
+    """
+
+    class _UndeclaredBatchSystem(_BatchSystem):
+        supports_batch = False
+
+        def get_eig(self, kpt):
+            return self._system.get_eig(kpt)
+
+    system = _UndeclaredBatchSystem(tb_system)
+    z2pack.surface.run(system=system, surface=tb_surface)
+    assert not system.batch_sizes
+
+
+def test_weyl_streaming(weyl_system, weyl_surface):
+    """
+    Test that the streaming mode gives the same result for a surface calculation.
+    """
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, streaming=True)
+    result_ref = z2pack.surface.run(system=weyl_system, surface=weyl_surface)
+    assert result.t == result_ref.t
+    assert all(
+        z2pack._utils._get_max_move(wcc, wcc_ref) < 1e-12  # pylint: disable=protected-access
+        for wcc, wcc_ref in zip(result.wcc, result_ref.wcc)
+    )
+    assert all(isinstance(line.result.data, z2pack.line.WilsonLineData) for line in result.lines)
+
+
 def test_simple_save(num_lines, simple_system, simple_surface):
     """
     Test saving to a file during a simple surface calculation.
@@ -206,6 +331,75 @@ def test_restart_2(weyl_system, weyl_surface):
     assert_res_equal(result1, result2)
 
 
+def test_restart_unchanged(weyl_system, weyl_surface):
+    """
+    Test that restarting from a result does not change it.
+    """
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, num_lines=6)
+    t_values = result.t
+    line_results = [line.result for line in result.lines]
+    z2pack.surface.run(system=weyl_system, surface=weyl_surface, init_result=result)
+    assert result.t == t_values
+    assert all(line.result is res for line, res in zip(result.lines, line_results))
+
+
+def test_copy(simple_system, simple_surface):
+    """
+    Test that a copy of the result shares the line results, but is not affected by adding lines to the original.
+    """
+    result = z2pack.surface.run(system=simple_system, surface=simple_surface)
+    result_copy = copy.copy(result)
+    assert result_copy.t == result.t
+    assert all(
+        line_copy.result is line.result for line_copy, line in zip(result_copy.lines, result.lines)
+    )
+    assert result_copy.ctrl_convergence == result.ctrl_convergence
+    result.data.add_line(0.05, result.lines[0].result)
+    assert len(result_copy.lines) == len(result.lines) - 1
+
+
+@pytest.mark.parametrize("keep_data", ["wcc", "wilson"])
+def test_keep_data(weyl_system, weyl_surface, keep_data):
+    """
+    Test that the surface calculation with reduced line data gives the same result, and that the restart from it works without re-computing the lines.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    result_ref = z2pack.surface.run(system=weyl_system, surface=weyl_surface)
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, keep_data=keep_data)
+    assert result.t == result_ref.t
+    assert result.gap_pos == result_ref.gap_pos
+    assert result.convergence_report == result_ref.convergence_report
+    data_type = {"wcc": z2pack.line.WccLineData, "wilson": z2pack.line.WilsonLineData}[keep_data]
+    assert {type(line.data) for line in result.lines} == {data_type}
+    result_restart = z2pack.surface.run(
+        system=Mock(), surface=weyl_surface, init_result=result, keep_data=keep_data
+    )
+    assert_res_equal(result, result_restart)
+
+
+def test_keep_data_restart_reduced(weyl_system, weyl_surface):
+    """
+    Test that a restart with keep_data='wilson' from a result computed with keep_data='wcc' keeps the reduced line data as it is.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    result = z2pack.surface.run(system=weyl_system, surface=weyl_surface, keep_data="wcc")
+    result_restart = z2pack.surface.run(
+        system=Mock(), surface=weyl_surface, init_result=result, keep_data="wilson"
+    )
+    assert_res_equal(result, result_restart)
+    assert {type(line.data) for line in result_restart.lines} == {z2pack.line.WccLineData}
+
+
 def test_invalid_restart(simple_system, simple_surface):
     """
     Test that you cannot pass the initial result explicitly and load from a file at the same time.
@@ -231,6 +425,72 @@ def test_file_restart(simple_system, simple_surface, serializer):
     assert_res_equal(result1, result2)
 
 
+def test_journal_restart(simple_system, simple_surface):
+    """
+    Test that a surface saved as a journal can be loaded, and that restarting from it does not re-compute anything.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    with tempfile.NamedTemporaryFile() as temp_file:
+        kwargs = dict(surface=simple_surface, save_file=temp_file.name, journal=True)
+        result1 = z2pack.surface.run(system=simple_system, **kwargs)
+        assert_res_equal(result1, z2pack.io.load_journal(temp_file.name))
+        result2 = z2pack.surface.run(system=Mock(), load=True, load_quiet=False, **kwargs)
+        assert_res_equal(result1, result2)
+        assert_res_equal(result1, z2pack.io.load_journal(temp_file.name))
+
+
+@pytest.mark.parametrize("suffix", [".msgpack", ".json", ".p", ".npz"])
+def test_journal_load_regular(simple_system, simple_surface, suffix):
+    """
+    Test that a result which was not saved as a journal is loaded with 'journal=True', and then replaced by a journal.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    with tempfile.NamedTemporaryFile(suffix=suffix) as temp_file:
+        kwargs = dict(surface=simple_surface, save_file=temp_file.name)
+        result1 = z2pack.surface.run(system=simple_system, **kwargs)
+        assert not z2pack.io._journal.is_journal(temp_file.name)  # pylint: disable=protected-access
+        result2 = z2pack.surface.run(
+            system=Mock(), load=True, load_quiet=False, journal=True, **kwargs
+        )
+        assert_res_equal(result1, result2)
+        assert_res_equal(result1, z2pack.io.load_journal(temp_file.name))
+
+
+def test_journal_truncated(simple_system, simple_surface):
+    """
+    Test that an incomplete record at the end of a journal is ignored.
+    """
+    with tempfile.NamedTemporaryFile() as temp_file:
+        result = z2pack.surface.run(
+            system=simple_system, surface=simple_surface, save_file=temp_file.name, journal=True
+        )
+        size = os.path.getsize(temp_file.name)
+        with open(temp_file.name, "r+b") as f:
+            f.truncate(size - 10)
+        result_truncated = z2pack.io.load_journal(temp_file.name)
+    assert len(result_truncated.lines) == len(result.lines) - 1
+
+
+def test_journal_invalid(simple_system, simple_surface):
+    """
+    Test that loading a file which is not a journal raises an error.
+    """
+    with tempfile.NamedTemporaryFile(suffix=".msgpack") as temp_file:
+        z2pack.surface.run(system=simple_system, surface=simple_surface, save_file=temp_file.name)
+        with pytest.raises(ValueError):
+            z2pack.io.load_journal(temp_file.name)
+
+
 def test_load_inexisting(simple_system, simple_surface):
     """Test that trying to load from an inexisting file raises when load_quiet=False."""
     with pytest.raises(IOError):
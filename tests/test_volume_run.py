@@ -2,6 +2,7 @@
 
 # pylint: disable=redefined-outer-name,unused-wildcard-import
 
+import concurrent.futures
 import json
 import os
 import pickle
@@ -69,6 +70,33 @@ def test_simple(simple_system, simple_volume, num_surfaces, num_lines):
     assert not result.ctrl_states
 
 
+def _tb_volume(s, t1, t2):
+    """
+    Volume for the tight-binding tests, defined at module level such that it can be pickled.
+    """
+    return [0.5 * s, t1, t2]
+
+
+@pytest.mark.parametrize(
+    "executor_type",
+    [concurrent.futures.ThreadPoolExecutor, concurrent.futures.ProcessPoolExecutor],
+)
+def test_executor(tb_system, executor_type):
+    """
+    Test that computing the surfaces and lines with an executor gives the same result as computing them one after another.
+    """
+    result_ref = z2pack.volume.run(system=tb_system, volume=_tb_volume, num_surfaces=3, num_lines=4)
+    with executor_type(max_workers=3) as executor:
+        result = z2pack.volume.run(
+            system=tb_system,
+            volume=_tb_volume,
+            num_surfaces=3,
+            num_lines=4,
+            executor=executor,
+        )
+    assert_res_equal(result, result_ref)
+
+
 # saving tests
 def test_simple_save(num_lines, simple_system, simple_volume):
     """
@@ -131,6 +159,24 @@ def test_file_restart(simple_system, simple_volume, serializer):
     assert_res_equal(result1, result2)
 
 
+def test_journal_restart(simple_system, simple_volume):
+    """
+    Test that a volume saved as a journal can be loaded, and that restarting from it does not re-compute anything.
+    """
+
+    class Mock:
+        @staticmethod
+        def get_eig(*args, **kwargs):
+            raise ValueError("This restart should not re-compute anything!")
+
+    with tempfile.NamedTemporaryFile() as temp_file:
+        kwargs = dict(volume=simple_volume, save_file=temp_file.name, journal=True)
+        result1 = z2pack.volume.run(system=simple_system, **kwargs)
+        assert_res_equal(result1, z2pack.io.load_journal(temp_file.name))
+        result2 = z2pack.volume.run(system=Mock(), load=True, load_quiet=False, **kwargs)
+        assert_res_equal(result1, result2)
+
+
 def test_load_inexisting(simple_system, simple_volume):
     """Test that trying to load from an inexisting file raises when load_quiet=False."""
     with pytest.raises(IOError):
@@ -0,0 +1,71 @@
+"""Test the LineData control which checks WCC convergence by extrapolation."""
+
+# pylint: disable=redefined-outer-name
+
+import pytest
+import z2pack
+from z2pack.line import WccLineData
+from z2pack.line._control import ExtrapolationCheck, StepCounter
+
+
+def test_base(test_ctrl_base):
+    test_ctrl_base(ExtrapolationCheck)
+    assert issubclass(
+        ExtrapolationCheck, z2pack._control.LineControl  # pylint: disable=protected-access
+    )
+
+
+@pytest.fixture
+def step_counter():
+    return StepCounter(iterator=[9, 11, 17, 33, 41, 65])
+
+
+def test_one_step(step_counter):
+    """
+    Test that ExtrapolationCheck does not converge with just a single step.
+    """
+    extrapolation_check = ExtrapolationCheck(pos_tol=0.5, step_counter=step_counter)
+    next(step_counter)
+    extrapolation_check.update(WccLineData([0.1]))
+    assert not extrapolation_check.converged
+
+
+@pytest.mark.parametrize("move", [0.001, 0.01, 0.02])
+def test_two_step(step_counter, move):
+    """
+    Test the error estimate after two steps. For 9 and 17 k-points, the distance to the extrapolated WCC is a third of the movement.
+    """
+    extrapolation_check = ExtrapolationCheck(pos_tol=0.005, step_counter=step_counter)
+    step_counter.state = 8
+    next(step_counter)
+    extrapolation_check.update(WccLineData([0.1]))
+    step_counter.state = 16
+    next(step_counter)
+    extrapolation_check.update(WccLineData([0.1 + move]))
+    assert extrapolation_check.error_estimate == pytest.approx(move / 3)
+    assert extrapolation_check.converged == (move / 3 < 0.005)
+    assert extrapolation_check.state["last_num_steps"] == 17
+
+
+def test_skip(step_counter):
+    """
+    Test that the values of the iterator which are predicted to be insufficient are skipped.
+    """
+    extrapolation_check = ExtrapolationCheck(pos_tol=0.001, step_counter=step_counter)
+    next(step_counter)
+    extrapolation_check.update(WccLineData([0.1]))
+    next(step_counter)
+    extrapolation_check.update(WccLineData([0.105]))
+    assert not extrapolation_check.converged
+    # the error estimate is 0.005 * 8**2 / (10**2 - 8**2) = 0.0089, such that
+    # 32 steps (33 k-points) are needed to reach 90% of the tolerance
+    assert next(step_counter)["num_steps"] == 33
+
+
+@pytest.mark.parametrize("invalid_pos_tol", [-1, 0, 1.2, 9])
+def test_pos_tol_raise(step_counter, invalid_pos_tol):
+    """
+    Test that a ValueError is raised if pos_tol is an invalid value.
+    """
+    with pytest.raises(ValueError):
+        ExtrapolationCheck(pos_tol=invalid_pos_tol, step_counter=step_counter)